@@ -0,0 +1,348 @@
+"""
+DERIVED AGGREGATE CACHE
+Season averages, home/away splits and leaderboards are recomputed from the
+lake on every request, although their inputs only change when a scrape lands.
+This cache stores each result as Parquet under a key built from
+
+    aggregate name | parameters | versions of the lake partitions it reads
+
+where a partition version is its source fingerprint in lake/manifest.json. A
+new box score changes one season's fingerprint, so only the aggregates over
+that season miss; everything else keeps hitting. The cache is bounded in size
+(AGGREGATE_CACHE_MB) and evicts the least recently used entries. Hits, misses,
+evictions and compute time are counted per aggregate.
+
+    player_season_averages   season=            per-player per-game means (team_basic)
+    team_splits              season=            home/away record, points, pace (four_factors, line_scores)
+    leaderboard              season= stat= n= min_games=   top players by a per-game stat
+
+Usage:
+    python aggregate_cache.py --get leaderboard season=2023 stat=ast
+    python aggregate_cache.py --refresh     # recompute entries whose inputs changed (after lake.py)
+    python aggregate_cache.py --stats
+    python aggregate_cache.py --clear
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from config import AGGREGATE_CACHE_DIR, AGGREGATE_CACHE_MB, LAKE_DIR
+from loaders import NON_PLAYER_ROWS
+
+# =========================
+# CONFIGURATION
+# =========================
+INDEX_DB = AGGREGATE_CACHE_DIR / "index.sqlite"
+MANIFEST_FILE = LAKE_DIR / "manifest.json"
+MAX_BYTES = AGGREGATE_CACHE_MB * 1_000_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    params TEXT NOT NULL,
+    versions TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_entries_access ON entries (last_access);
+CREATE INDEX IF NOT EXISTS idx_entries_name ON entries (name, params);
+CREATE TABLE IF NOT EXISTS metrics (
+    name TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    evictions INTEGER NOT NULL DEFAULT 0,
+    invalidations INTEGER NOT NULL DEFAULT 0,
+    compute_seconds REAL NOT NULL DEFAULT 0
+);
+"""
+
+PLAYER_STATS = ["mp", "pts", "trb", "ast", "stl", "blk", "tov", "fg", "fga", "fg3", "fg3a", "ft", "fta",
+                "plus_minus", "game_score"]
+
+
+# =========================
+# AGGREGATES
+# =========================
+def player_season_averages(season: int) -> pd.DataFrame:
+    """Per-game means for every player who got minutes; team is the latest one"""
+    from lake import read
+    box = read("team_basic", columns=["game_date", "game_id", "team", "player"] + PLAYER_STATS,
+               seasons=[season])
+    box = box[~box["player"].isin(NON_PLAYER_ROWS) & (box["mp"] > 0)].sort_values("game_date")
+    grouped = box.groupby("player")
+    out = grouped[[c for c in PLAYER_STATS if c in box.columns]].mean().round(2)
+    out.insert(0, "games", grouped.size())
+    out.insert(0, "team", grouped["team"].last())
+    out = out.reset_index()
+    out["season"] = season
+    return out
+
+
+def team_splits(season: int) -> pd.DataFrame:
+    """Home/away record and scoring per team (home team = code at the end of the game id)"""
+    from lake import read
+    factors = read("four_factors", columns=["game_id", "team", "pace", "ORtg"], seasons=[season])
+    scores = read("line_scores", columns=["game_id", "team", "TOTAL"], seasons=[season])
+    games = factors.merge(scores, on=["game_id", "team"], how="left")
+    games = games.merge(games[["game_id", "team", "TOTAL"]].rename(columns={"team": "opponent",
+                                                                           "TOTAL": "opp_points"}),
+                        on="game_id")
+    games = games[games["team"] != games["opponent"]]
+    games["venue"] = (games["team"] == games["game_id"].str[-3:]).map({True: "home", False: "away"})
+    games["won"] = games["TOTAL"] > games["opp_points"]
+    out = games.groupby(["team", "venue"]).agg(games=("game_id", "nunique"), wins=("won", "sum"),
+                                                points=("TOTAL", "mean"), opp_points=("opp_points", "mean"),
+                                                pace=("pace", "mean"), off_rtg=("ORtg", "mean"))
+    out["win_pct"] = (out["wins"] / out["games"]).round(3)
+    out = out.round(2).reset_index()
+    out["season"] = season
+    return out
+
+
+def leaderboard(season: int, stat: str = "pts", n: int = 10, min_games: int = 20) -> pd.DataFrame:
+    """Top n players by a per-game stat, built on the cached season averages"""
+    averages = get("player_season_averages", season=season)
+    if stat not in averages.columns:
+        raise ValueError(f"Unknown stat {stat!r}; choose from {', '.join(PLAYER_STATS)}")
+    top = averages[averages["games"] >= min_games].nlargest(n, stat)
+    return top[["player", "team", "games", stat, "season"]].reset_index(drop=True)
+
+
+# name -> (function, lake partitions it reads for the given params)
+AGGREGATES: Dict[str, Tuple[Callable[..., pd.DataFrame], Callable[..., List[str]]]] = {
+    "player_season_averages": (player_season_averages, lambda season: [f"nba/team_basic/{season}"]),
+    "team_splits": (team_splits, lambda season: [f"nba/four_factors/{season}", f"nba/line_scores/{season}"]),
+    "leaderboard": (leaderboard, lambda season, **_: [f"nba/team_basic/{season}"]),
+}
+
+
+# =========================
+# CACHE
+# =========================
+def _canonical(params: Dict) -> str:
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def _locked(method):
+    """Run a method holding the cache's lock: the daemon calls one instance from many threads"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class AggregateCache:
+    """Parquet results indexed in SQLite; one instance per process is enough, shared by its threads"""
+
+    def __init__(self, directory: Path = AGGREGATE_CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(self.directory / INDEX_DB.name, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    # ----- keys -----
+    def versions(self, name: str, params: Dict) -> str:
+        """Fingerprints of the input partitions, from the lake manifest"""
+        if not MANIFEST_FILE.exists():
+            raise FileNotFoundError(f"No lake manifest at {MANIFEST_FILE}; run lake.py first")
+        manifest = json.loads(MANIFEST_FILE.read_text())
+        inputs = AGGREGATES[name][1](**params)
+        missing = [p for p in inputs if p not in manifest]
+        if missing:
+            raise KeyError(f"{name}: lake has no partition {', '.join(missing)}")
+        return _canonical({p: manifest[p] for p in inputs})
+
+    @staticmethod
+    def key(name: str, params: str, versions: str) -> str:
+        return hashlib.sha1("|".join([name, params, versions]).encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.parquet"
+
+    def _count(self, name: str, column: str, amount: float = 1):
+        self.conn.execute(f"INSERT INTO metrics (name, {column}) VALUES (?, ?) "
+                          f"ON CONFLICT (name) DO UPDATE SET {column} = {column} + excluded.{column}",
+                          (name, amount))
+
+    # ----- lookups -----
+    @_locked
+    def get(self, name: str, **params) -> pd.DataFrame:
+        """Cached result, computing and storing it on a miss"""
+        if name not in AGGREGATES:
+            raise KeyError(f"Unknown aggregate {name!r}; choose from {', '.join(AGGREGATES)}")
+        canonical = _canonical(params)
+        versions = self.versions(name, params)
+        key = self.key(name, canonical, versions)
+        path = self._path(key)
+
+        if path.exists() and self.conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone():
+            self.conn.execute("UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                              (time.time(), key))
+            self._count(name, "hits")
+            self.conn.commit()
+            return pd.read_parquet(path)
+
+        start = time.time()
+        df = AGGREGATES[name][0](**params)
+        elapsed = time.time() - start
+        tmp = path.with_suffix(".tmp")
+        df.to_parquet(tmp, index=False)
+        tmp.replace(path)
+
+        now = time.time()
+        self.conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                          (key, name, canonical, versions, path.stat().st_size, now, now))
+        self._count(name, "misses")
+        self._count(name, "compute_seconds", elapsed)
+        # Older versions of the same aggregate can never hit again
+        stale = [k for (k,) in self.conn.execute(
+            "SELECT key FROM entries WHERE name = ? AND params = ? AND key <> ?", (name, canonical, key))]
+        self._drop(stale)
+        self._count(name, "invalidations", len(stale))
+        self.conn.commit()
+        self.evict()
+        return df
+
+    def _drop(self, keys: List[str]):
+        for key in keys:
+            self._path(key).unlink(missing_ok=True)
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in keys])
+
+    @_locked
+    def evict(self) -> int:
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+        evicted = 0
+        for key, name, size in self.conn.execute(
+                "SELECT key, name, bytes FROM entries ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._drop([key])
+            self._count(name, "evictions")
+            total -= size
+            evicted += 1
+        self.conn.commit()
+        return evicted
+
+    @_locked
+    def refresh(self) -> int:
+        """Recompute the cached aggregates whose input partitions changed; returns how many"""
+        recomputed = 0
+        for key, name, params in self.conn.execute("SELECT key, name, params FROM entries").fetchall():
+            if name not in AGGREGATES:
+                self._drop([key])
+                continue
+            params = json.loads(params)
+            try:
+                current = self.key(name, _canonical(params), self.versions(name, params))
+            except KeyError:
+                # partition no longer in the lake
+                self._drop([key])
+                self._count(name, "invalidations")
+                continue
+            # a dependent aggregate may already have recomputed this one
+            if current != key and not self.conn.execute("SELECT 1 FROM entries WHERE key = ?",
+                                                        (current,)).fetchone():
+                start = time.time()
+                self.get(name, **params)
+                recomputed += 1
+                print(f"  {name} {_canonical(params)}: recomputed ({time.time() - start:.1f}s)")
+        self.conn.commit()
+        return recomputed
+
+    @_locked
+    def stats(self) -> pd.DataFrame:
+        """Hit/miss counters with the current entry count and size per aggregate"""
+        return pd.read_sql_query(
+            "SELECT m.name, m.hits, m.misses, ROUND(1.0 * m.hits / MAX(m.hits + m.misses, 1), 3) AS hit_rate, "
+            "m.evictions, m.invalidations, ROUND(m.compute_seconds, 1) AS compute_seconds, "
+            "COUNT(e.key) AS entries, COALESCE(SUM(e.bytes), 0) AS bytes "
+            "FROM metrics m LEFT JOIN entries e ON e.name = m.name GROUP BY m.name ORDER BY m.name", self.conn)
+
+    @_locked
+    def clear(self):
+        self._drop([k for (k,) in self.conn.execute("SELECT key FROM entries").fetchall()])
+        self.conn.execute("DELETE FROM metrics")
+        self.conn.commit()
+
+    @_locked
+    def close(self):
+        self.conn.close()
+
+
+_shared: Optional[AggregateCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared() -> AggregateCache:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = AggregateCache()
+        return _shared
+
+
+def get(name: str, **params) -> pd.DataFrame:
+    """Module-level get on a shared AggregateCache instance"""
+    return shared().get(name, **params)
+
+
+def refresh() -> int:
+    return shared().refresh()
+
+
+# =========================
+# CLI
+# =========================
+def _parse_params(pairs: List[str]) -> Dict:
+    params = {}
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        params[name] = int(value) if value.lstrip("-").isdigit() else value
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached season aggregates keyed by lake partition versions")
+    parser.add_argument("--get", nargs="+", metavar=("NAME", "PARAM"), help="e.g. --get team_splits season=2023")
+    parser.add_argument("--refresh", action="store_true", help="recompute entries whose inputs changed")
+    parser.add_argument("--stats", action="store_true", help="hit/miss counters per aggregate")
+    parser.add_argument("--clear", action="store_true", help="drop every entry and counter")
+    args = parser.parse_args()
+
+    cache = shared()
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {AGGREGATE_CACHE_DIR}")
+    if args.refresh:
+        start = time.time()
+        print(f"{cache.refresh()} aggregates recomputed in {time.time() - start:.1f}s")
+    if args.get:
+        start = time.time()
+        df = cache.get(args.get[0], **_parse_params(args.get[1:]))
+        with pd.option_context("display.max_rows", 50, "display.width", 200):
+            print(df.to_string(index=False))
+        print(f"{len(df):,} rows in {time.time() - start:.2f}s")
+    if args.stats:
+        print(cache.stats().to_string(index=False))
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+LOADER BENCHMARKS
+How long loading a season of box scores, line scores or team stats takes, and
+how that changes with the storage format and the way files are read.
+
+A synthetic fixture recreates the shape of the scraped tree, so the numbers do
+not depend on what happens to be scraped:
+
+    nba_data/nba_boxscores/<table>_<game_id>.csv        team_basic, team_advanced, four_factors, line_scores
+    nba_data/nba_team_stats_YYYY/<TEAM>/<TEAM>_<table>_YYYY.csv
+    + a <file>:Zone.Identifier next to every file, as in the Windows downloads
+
+and is written once per format:
+
+    csv       as scraped
+    zstd      <name>.csv.zst, with the trained dictionaries when there are any (zstd_codec.py)
+    parquet   one Parquet file per scraped file
+    lake      one Parquet file per table, as lake.py partitions a season
+
+Every (dataset, format, mode) is timed with a cold OS cache (pages dropped with
+posix_fadvise) and again warm, each in a fresh forked process so peak memory is
+that load's alone. Listing the folder is part of the timing, Zone.Identifier
+noise included.
+
+    serial    one reader in-process
+    thread    MAX_WORKERS reader threads
+    process   a process pool, one chunk of files per core
+
+Usage:
+    python bench_loaders.py                                   # one season, every combination
+    python bench_loaders.py --games 400 --formats csv zstd --modes serial thread
+    python bench_loaders.py --root /tmp/loader_bench --keep --out bench.csv
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import MAX_WORKERS
+from loaders import ESPN_TEAM_CODES, csv_files, read_csvs
+from zstd_codec import SUFFIX, _evict, compress
+
+# =========================
+# CONFIGURATION
+# =========================
+GAMES = 1230  # one regular season
+SEASON = 2024
+SEED = 7
+TEAMS = sorted(set(ESPN_TEAM_CODES.values()))
+PLAYERS_PER_TEAM = 13
+ZONE_IDENTIFIER = b"[ZoneTransfer]\r\nZoneId=3\x00"
+BOX_URL = "https://www.basketball-reference.com/boxscores/{}.html"
+
+BASIC_STATS = ["fg", "fga", "fg_pct", "fg3", "fg3a", "fg3_pct", "ft", "fta", "ft_pct", "orb", "drb", "trb",
+               "ast", "stl", "blk", "tov", "pf", "pts", "game_score", "plus_minus"]
+ADVANCED_STATS = ["ts_pct", "efg_pct", "fg3a_per_fga_pct", "fta_per_fga_pct", "orb_pct", "drb_pct", "trb_pct",
+                  "ast_pct", "stl_pct", "blk_pct", "tov_pct", "usg_pct", "off_rtg", "def_rtg", "bpm"]
+FACTORS = ["pace", "eFG%", "TOV%", "ORB%", "FT/FGA", "ORtg"]
+TEAM_STAT_TABLES = {
+    "per_game_stats": ["Age", "G", "GS", "MP", "FG", "FGA", "FG%", "3P", "3PA", "3P%", "2P", "2PA", "2P%",
+                       "eFG%", "FT", "FTA", "FT%", "ORB", "DRB", "TRB", "AST", "STL", "BLK", "TOV", "PF", "PTS"],
+    "totals_stats": ["Age", "G", "GS", "MP", "FG", "FGA", "3P", "3PA", "FT", "FTA", "TRB", "AST", "PTS"],
+    "advanced": ["Age", "G", "MP", "PER", "TS%", "3PAr", "FTr", "USG%", "OWS", "DWS", "WS", "WS/48", "BPM", "VORP"],
+    "per_minute_stats": ["Age", "G", "MP", "FG", "FGA", "3P", "3PA", "FT", "FTA", "TRB", "AST", "PTS"],
+    "per_poss": ["Age", "G", "MP", "FG", "FGA", "3P", "3PA", "FT", "FTA", "TRB", "AST", "PTS", "ORtg", "DRtg"],
+    "shooting": ["Age", "G", "MP", "FG%", "Dist.", "2P", "0-3", "3-10", "10-16", "16-3P", "3P"],
+}
+FORMATS = ["csv", "zstd", "parquet", "lake"]
+MODES = ["serial", "thread", "process"]
+DATASETS = ["box_scores", "line_scores", "team_stats"]
+
+
+# =========================
+# FIXTURE
+# =========================
+def _box_score(rng, game_date: str, game_id: str, teams, stats: List[str]) -> pd.DataFrame:
+    rows = []
+    for team in teams:
+        for k in range(PLAYERS_PER_TEAM):
+            rows.append([game_date, game_id, team, f"{team} Player {k}", BOX_URL.format(game_id),
+                         round(float(rng.uniform(0, 42)), 2)])
+    df = pd.DataFrame(rows, columns=["game_date", "game_id", "team", "player", "url", "mp"])
+    for stat in stats:
+        pct = stat.endswith(("_pct", "_rtg")) or stat in ("game_score", "bpm")
+        df[stat] = rng.uniform(0, 1.2, len(df)).round(3) if pct else rng.integers(0, 12, len(df))
+    return df
+
+
+def _team_rows(rng, game_date: str, game_id: str, teams, columns: List[str], integer: bool) -> pd.DataFrame:
+    df = pd.DataFrame({"game_date": game_date, "game_id": game_id, "team": list(teams),
+                       "url": BOX_URL.format(game_id)})
+    for column in columns:
+        df[column] = rng.integers(15, 40, len(df)) if integer else rng.uniform(0.1, 110, len(df)).round(3)
+    return df
+
+
+def fixture_frames(games: int = GAMES, seed: int = SEED):
+    """(relative path, table family, DataFrame) for every file of the synthetic tree"""
+    rng = np.random.default_rng(seed)
+    opening = date(SEASON, 10, 24)
+    for i in range(games):
+        game_date = (opening + timedelta(days=i * 170 // games)).isoformat()
+        home, away = rng.choice(TEAMS, 2, replace=False)
+        game_id = f"{game_date.replace('-', '')}0{home}"
+        teams = (away, home)
+        line = _team_rows(rng, game_date, game_id, teams, ["Q1", "Q2", "Q3", "Q4"], integer=True)
+        line["TOTAL"] = line[["Q1", "Q2", "Q3", "Q4"]].sum(axis=1)
+        for table, df in (("team_basic", _box_score(rng, game_date, game_id, teams, BASIC_STATS)),
+                          ("team_advanced", _box_score(rng, game_date, game_id, teams, ADVANCED_STATS)),
+                          ("four_factors", _team_rows(rng, game_date, game_id, teams, FACTORS, integer=False)),
+                          ("line_scores", line)):
+            yield f"nba_data/nba_boxscores/{table}_{game_id}.csv", f"nba_boxscores/{table}", df
+
+    year = SEASON + 1  # folders are named by the season's end year
+    for team in TEAMS:
+        for table, columns in TEAM_STAT_TABLES.items():
+            df = pd.DataFrame({"Rk": range(1, 18), "Player": [f"{team} Player {k}" for k in range(17)]})
+            for column in columns:
+                df[column] = rng.uniform(0, 40, len(df)).round(1)
+            yield (f"nba_data/nba_team_stats_{year}/{team}/{team}_{table}_{year}.csv",
+                   f"nba_team_stats/{table}", df)
+
+
+def _table_of(relative: str) -> str:
+    name = Path(relative).name
+    if "nba_team_stats_" in relative:
+        return "team_stats_" + name.split("_", 1)[1].rsplit("_", 1)[0]
+    return name.rsplit("_", 1)[0]
+
+
+def build_fixture(root: Path, games: int = GAMES, seed: int = SEED) -> Dict:
+    """Write the fixture in every format under root (reused when it already matches)"""
+    stamp = {"games": games, "seed": seed, "season": SEASON}
+    stamp_file = root / "fixture.json"
+    if stamp_file.exists() and json.loads(stamp_file.read_text()) == stamp:
+        print(f"Reusing fixture in {root}")
+        return stamp
+    shutil.rmtree(root, ignore_errors=True)
+
+    start = time.time()
+    tables: Dict[str, List[pd.DataFrame]] = {}
+    for relative, family, df in fixture_frames(games, seed):
+        data = df.to_csv(index=False).encode()
+        for fmt, name, payload in (("csv", relative, data),
+                                   ("zstd", relative + SUFFIX, compress(data, family)),
+                                   ("parquet", relative[:-len(".csv")] + ".parquet", None)):
+            path = root / fmt / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if payload is None:
+                pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+            else:
+                path.write_bytes(payload)
+            Path(f"{path}:Zone.Identifier").write_bytes(ZONE_IDENTIFIER)
+        tables.setdefault(_table_of(relative), []).append(df)
+
+    (root / "lake").mkdir(parents=True, exist_ok=True)
+    for table, frames in tables.items():
+        df = pd.concat(frames, ignore_index=True).sort_values(["game_date", "team"] if "team" in frames[0] else
+                                                              ["Player"])
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), root / "lake" / f"{table}.parquet")
+
+    os.sync()  # dirty pages cannot be dropped, so cold runs need them on disk
+    stamp_file.write_text(json.dumps(stamp))
+    print(f"Fixture: {games:,} games in {time.time() - start:.1f}s -> {root}")
+    return stamp
+
+
+# =========================
+# LOADERS
+# =========================
+def list_files(root: Path, dataset: str, fmt: str) -> List[Path]:
+    """Files of one dataset, listed the way the loaders list the scraped tree"""
+    if fmt == "lake":
+        names = {"box_scores": ["team_basic"], "line_scores": ["line_scores"],
+                 "team_stats": [f"team_stats_{t}" for t in TEAM_STAT_TABLES]}[dataset]
+        return [root / "lake" / f"{name}.parquet" for name in names]
+
+    base = root / fmt / "nba_data"
+    pattern = {"box_scores": "nba_boxscores/team_basic_*.csv", "line_scores": "nba_boxscores/line_scores_*.csv",
+               "team_stats": f"nba_team_stats_{SEASON + 1}/*/*.csv"}[dataset]
+    if fmt == "parquet":
+        return sorted(base.glob(pattern[:-len(".csv")] + ".parquet"))
+    return csv_files(base, pattern)
+
+
+def _read_parquet(paths: List[Path], use_threads: bool = False) -> pd.DataFrame:
+    tables = [pq.read_table(p, use_threads=use_threads) for p in paths]
+    return pa.concat_tables(tables, promote_options="permissive").to_pandas()
+
+
+def _read_csv_chunk(paths: List[Path]) -> pd.DataFrame:
+    return read_csvs(paths, max_workers=1)
+
+
+def _reader(fmt: str) -> Callable[[List[Path]], pd.DataFrame]:
+    return _read_parquet if fmt in ("parquet", "lake") else _read_csv_chunk
+
+
+def _chunks(paths: List[Path], n: int) -> List[List[Path]]:
+    return [chunk for chunk in (paths[i::n] for i in range(n)) if chunk]
+
+
+def load(paths: List[Path], fmt: str, mode: str) -> pd.DataFrame:
+    """Read a dataset's files in one format and mode"""
+    reader = _reader(fmt)
+    if mode == "serial":
+        return reader(paths)
+    if mode == "thread":
+        if fmt == "lake":
+            return _read_parquet(paths, use_threads=True)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            frames = list(pool.map(reader, _chunks(paths, MAX_WORKERS)))
+    else:
+        workers = os.cpu_count() or 1
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(reader, _chunks(paths, workers)))
+    return pd.concat(frames, ignore_index=True)
+
+
+# =========================
+# MEASUREMENT
+# =========================
+def _status_kb(field: str) -> Optional[int]:
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak() -> bool:
+    """Reset the process' peak RSS (Linux); False where that is not possible"""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def _trial(root: Path, dataset: str, fmt: str, mode: str, cold: bool, results):
+    paths = list_files(root, dataset, fmt)
+    if cold:
+        for path in paths:
+            _evict(path)
+    baseline = _status_kb("VmRSS") if _reset_peak() else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    paths = list_files(root, dataset, fmt)
+    df = load(paths, fmt, mode)
+    elapsed = time.perf_counter() - start
+
+    peak = (_status_kb("VmHWM") or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) - baseline
+    if mode == "process":
+        peak += resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss  # largest worker
+    size = sum(p.stat().st_size for p in paths)
+    results.put({"files": len(paths), "mb": size / 1e6, "rows": len(df), "seconds": elapsed,
+                 "peak_mb": peak / 1024})
+
+
+def measure(root: Path, dataset: str, fmt: str, mode: str, cold: bool) -> Dict:
+    """One timed load in a fresh forked process"""
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    process = ctx.Process(target=_trial, args=(root, dataset, fmt, mode, cold, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def run(root: Path, datasets: List[str] = DATASETS, formats: List[str] = FORMATS,
+        modes: List[str] = MODES) -> pd.DataFrame:
+    rows = []
+    for dataset in datasets:
+        for fmt in formats:
+            for mode in modes:
+                if fmt == "lake" and mode == "process":
+                    continue  # a handful of files: nothing to spread over processes
+                for cache in ("cold", "warm"):
+                    result = measure(root, dataset, fmt, mode, cold=cache == "cold")
+                    row = {"dataset": dataset, "format": fmt, "mode": mode, "cache": cache, **result,
+                           "mb_s": result["mb"] / result["seconds"], "files_s": result["files"] / result["seconds"]}
+                    rows.append(row)
+                    print(f"  {dataset:<11} {fmt:<7} {mode:<7} {cache:<4} {row['seconds']:7.2f}s "
+                          f"{row['mb_s']:8.1f} MB/s {row['files_s']:9.0f} files/s {row['peak_mb']:7.1f} MB peak")
+    return pd.DataFrame(rows).round(3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the loaders across storage formats and parallelism")
+    parser.add_argument("--games", type=int, default=GAMES, help="games in the fixture (default: one season)")
+    parser.add_argument("--datasets", nargs="+", choices=DATASETS, default=DATASETS)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--root", type=Path, help="fixture folder (default: a temporary folder)")
+    parser.add_argument("--keep", action="store_true", help="keep the fixture for the next run")
+    parser.add_argument("--out", help="write the results to CSV")
+    args = parser.parse_args()
+
+    root = args.root or Path(tempfile.mkdtemp(prefix="loader_bench_"))
+    try:
+        build_fixture(root, args.games)
+        results = run(root, args.datasets, args.formats, args.modes)
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.out:
+        results.to_csv(args.out, index=False)
+        print(f"{len(results)} results -> {args.out}")
+    summary = results.pivot_table(index=["dataset", "format", "mode"], columns="cache", values=["seconds", "mb_s"])
+    print(summary.round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
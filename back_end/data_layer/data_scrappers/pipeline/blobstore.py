@@ -0,0 +1,367 @@
+"""
+CONTENT-ADDRESSED BLOB STORE
+Stores each distinct scraped file once under blobs/objects/<ab>/<key> and keeps
+the existing paths as references in blobs/index.sqlite (path -> content key).
+
+The content key is the sha1 of the file, except for CSVs with volatile columns
+(scraped_at): those are hashed without them, so the same box score scraped into
+nba_2025_26_boxscores and nba_data/nba_2025_26_boxscores at different times has
+one key, and re-scraping an unchanged page is a no-op in write_file(). zstd
+CSVs (zstd_codec.py) are keyed by their decompressed content.
+
+A run without --link only indexes: it stores a blob for every file, so until
+the tree is linked its contents are on disk twice. --link replaces every path
+whose bytes equal its blob with a hard link to it (including the 53k identical
+Zone.Identifier files, repeated team stat tables and roster copies), then drops
+the blobs no path is linked to, so the tree keeps its layout while each content
+is stored once. Files that are appended to in place (APPEND_NAMES, APPEND_DIRS:
+scrape checkpoints, the unified tables, Elo history) are never linked and get
+no blob.
+
+Blobs are read-only (0444), and so is every path linked to one: the files
+write_file() saves for the scrapers and everything --link touched. Opening one
+for writing fails; rewrite it with write_file() or another tmp + rename write,
+never in place.
+
+Usage:
+    python blobstore.py               # index/migrate the tree (incremental) + report
+    python blobstore.py --link        # also hard-link paths to their blob, drop unlinked blobs
+    python blobstore.py --verify      # re-hash every blob
+    python blobstore.py --gc          # drop refs to deleted paths and unreferenced blobs
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from catalog import catalog_path, resolve, scan
+from config import BLOB_DIR, DATA_DIR, ELO_HISTORY_DIR, MAX_WORKERS, UNIFIED_DIR
+from zstd_codec import SUFFIX, decompress
+
+# =========================
+# CONFIGURATION
+# =========================
+OBJECTS_DIR = BLOB_DIR / "objects"
+BLOB_INDEX = BLOB_DIR / "index.sqlite"
+
+# Columns that change on every scrape without the page changing
+VOLATILE_COLUMNS = {"scraped_at"}
+
+# Files written with mode="a" (nba_scapper / scrape_quarters_and_advanced checkpoints, compact.py,
+# elo_incremental.py); --link leaves them alone
+APPEND_NAMES = {"checkpoint.csv", "completed_games.csv"}
+APPEND_DIRS = [UNIFIED_DIR, ELO_HISTORY_DIR]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    key TEXT PRIMARY KEY,
+    raw_hash TEXT NOT NULL,
+    byte_size INTEGER NOT NULL,
+    stored_at TEXT
+);
+CREATE TABLE IF NOT EXISTS refs (
+    path TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    raw_hash TEXT NOT NULL,
+    byte_size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    linked INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_refs_key ON refs (key);
+"""
+
+
+def connect(db_path: Path = BLOB_INDEX) -> sqlite3.Connection:
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# =========================
+# CONTENT KEYS
+# =========================
+def content_key(data: bytes, suffix: str = "") -> str:
+    """sha1 of the content, ignoring VOLATILE_COLUMNS in CSVs"""
+    if suffix == SUFFIX:
+        data, suffix = decompress(data), ".csv"
+    if suffix == ".csv":
+        header = data.split(b"\n", 1)[0].decode("utf-8", errors="replace")
+        header_fields = next(csv.reader([header.rstrip("\r")]), [])
+        drop = [i for i, name in enumerate(header_fields) if name in VOLATILE_COLUMNS]
+        if drop:
+            h = hashlib.sha1()
+            for row in csv.reader(io.StringIO(data.decode("utf-8", errors="replace"), newline="")):
+                h.update("\x1f".join(v for i, v in enumerate(row) if i not in drop).encode())
+                h.update(b"\n")
+            return h.hexdigest()
+    return hashlib.sha1(data).hexdigest()
+
+
+def blob_path(key: str) -> Path:
+    return OBJECTS_DIR / key[:2] / key[2:]
+
+
+# =========================
+# STORE
+# =========================
+def _tmp_name(path: Path) -> Path:
+    return path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+
+def _write_blob(key: str, data: bytes) -> bool:
+    """Write the read-only blob file for key unless it exists; True if written"""
+    blob = blob_path(key)
+    if blob.exists():
+        return False
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_name(blob)
+    tmp.write_bytes(data)
+    os.chmod(tmp, 0o444)
+    tmp.replace(blob)
+    return True
+
+
+def _insert_blob(conn: sqlite3.Connection, key: str, raw_hash: str, size: int):
+    conn.execute("INSERT OR IGNORE INTO blobs (key, raw_hash, byte_size, stored_at) VALUES (?, ?, ?, ?)",
+                 (key, raw_hash, size, datetime.now().isoformat(timespec="seconds")))
+
+
+def store_blob(conn: sqlite3.Connection, key: str, data: bytes) -> Path:
+    """Store data under key unless it is already stored; returns the blob path"""
+    _write_blob(key, data)
+    _insert_blob(conn, key, hashlib.sha1(data).hexdigest(), len(data))
+    return blob_path(key)
+
+
+def link_to_blob(path: Path, blob: Path) -> bool:
+    """Atomically replace path with a hard link to blob (False across filesystems)"""
+    tmp = _tmp_name(path)
+    try:
+        os.link(blob, tmp)
+    except OSError:
+        return False
+    tmp.replace(path)
+    return True
+
+
+def _upsert_ref(conn: sqlite3.Connection, path: Path, key: str, raw_hash: str, linked: bool):
+    st = path.stat()
+    conn.execute("INSERT OR REPLACE INTO refs (path, key, raw_hash, byte_size, mtime_ns, linked) "
+                 "VALUES (?, ?, ?, ?, ?, ?)", (catalog_path(path), key, raw_hash, st.st_size, st.st_mtime_ns,
+                                               int(linked)))
+
+
+def write_file(path, data: bytes, db_path: Path = BLOB_INDEX) -> bool:
+    """Scraper hook: write data to path through the store
+
+    Returns False (and writes nothing) when path already holds the same content
+    key. New content is stored as a blob and path becomes a read-only hard link
+    to it; if the store is unavailable the file is written directly.
+    """
+    path = Path(path)
+    key = content_key(data, path.suffix)
+    try:
+        conn = connect(db_path)
+        with conn:
+            current = _current_key(conn, path)
+            if current != key:
+                raw_hash = hashlib.sha1(data).hexdigest()
+                blob = store_blob(conn, key, data)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                stored = conn.execute("SELECT raw_hash FROM blobs WHERE key = ?", (key,)).fetchone()[0]
+                linked = stored == raw_hash and link_to_blob(path, blob)
+                if not linked:
+                    tmp = _tmp_name(path)
+                    tmp.write_bytes(data)
+                    tmp.replace(path)
+                _upsert_ref(conn, path, key, raw_hash, linked)
+        conn.close()
+        return current != key
+    except (OSError, sqlite3.Error) as e:
+        print(f"Blob store write failed for {path}: {e}")
+        # path may be a link to a read-only blob: replace it, never write through it
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_name(path)
+        tmp.write_bytes(data)
+        tmp.replace(path)
+        return True
+
+
+def _current_key(conn: sqlite3.Connection, path: Path) -> Optional[str]:
+    """Content key of what path holds now (indexing it if the store has not seen it)"""
+    if not path.exists():
+        return None
+    row = conn.execute("SELECT key, byte_size, mtime_ns FROM refs WHERE path = ?", (catalog_path(path),)).fetchone()
+    st = path.stat()
+    if row is not None and (st.st_size, st.st_mtime_ns) == (row[1], row[2]):
+        return row[0]
+    data = path.read_bytes()
+    key, raw_hash = content_key(data, path.suffix), hashlib.sha1(data).hexdigest()
+    _write_blob(key, data)
+    _insert_blob(conn, key, raw_hash, len(data))
+    _upsert_ref(conn, path, key, raw_hash, linked=False)
+    return key
+
+
+# =========================
+# MIGRATION
+# =========================
+_APPEND_PREFIXES = tuple(f"{d}{os.sep}" for d in APPEND_DIRS)
+
+
+def _appended(path: Path) -> bool:
+    """Whether path is a file written in append mode (see APPEND_NAMES)"""
+    return path.name in APPEND_NAMES or str(path).startswith(_APPEND_PREFIXES)
+
+
+def _ingest_if_changed(args) -> Optional[Tuple[Path, str, str, int, bool]]:
+    """Worker: hash one file and write its blob (none for appended files); None if unchanged since the last run"""
+    path, known = args
+    st = path.stat()
+    if known is not None and known == (st.st_size, st.st_mtime_ns):
+        return None
+    data = path.read_bytes()
+    key = content_key(data, path.suffix)
+    written = not _appended(path) and _write_blob(key, data)
+    return path, key, hashlib.sha1(data).hexdigest(), len(data), written
+
+
+def migrate(root: Path = DATA_DIR, link: bool = False, db_path: Path = BLOB_INDEX) -> Dict[str, int]:
+    """Store every file under root once and index its path; optionally hard-link paths to their blobs
+
+    With link, every path but the appended-to files becomes a link to its blob
+    and blobs left without a linked path are dropped.
+    """
+    conn = connect(db_path)
+    known = {p: (s, m) for p, s, m in conn.execute("SELECT path, byte_size, mtime_ns FROM refs")}
+    paths = scan(root, side_files=True)
+    counts = {"indexed": 0, "stored": 0, "linked": 0, "unlinked": 0, "dropped": 0}
+
+    # An appended-to file linked by an earlier --link gets a private, writable copy back (re-indexed below)
+    for path in paths:
+        if _appended(path) and path.stat().st_nlink > 1:
+            tmp = _tmp_name(path)
+            tmp.write_bytes(path.read_bytes())
+            os.chmod(tmp, 0o644)
+            tmp.replace(path)
+            counts["unlinked"] += 1
+
+    jobs = [(p, known.get(catalog_path(p))) for p in paths]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool, conn:
+        for result in pool.map(_ingest_if_changed, jobs, chunksize=256):
+            if result is None:
+                continue
+            path, key, raw_hash, size, written = result
+            if not _appended(path):
+                _insert_blob(conn, key, raw_hash, size)
+            _upsert_ref(conn, path, key, raw_hash, linked=False)
+            counts["indexed"] += 1
+            counts["stored"] += written
+
+    if link:
+        rows = conn.execute("SELECT r.path, r.key, r.raw_hash FROM refs r JOIN blobs b ON b.key = r.key "
+                            "WHERE r.linked = 0 AND r.raw_hash = b.raw_hash").fetchall()
+        with conn:
+            for rel, key, raw_hash in rows:
+                path = resolve(rel)
+                if _appended(path):
+                    continue
+                if path.exists() and link_to_blob(path, blob_path(key)):
+                    _upsert_ref(conn, path, key, raw_hash, linked=True)
+                    counts["linked"] += 1
+
+        # A blob no path links to (appended files, other filesystems, contents left in the tree since) would
+        # be a second copy of what the tree holds
+        unlinked = [k for (k,) in conn.execute("SELECT key FROM blobs b WHERE NOT EXISTS "
+                                               "(SELECT 1 FROM refs r WHERE r.key = b.key AND r.linked = 1)")]
+        with conn:
+            conn.executemany("DELETE FROM blobs WHERE key = ?", [(k,) for k in unlinked])
+        for key in unlinked:
+            blob_path(key).unlink(missing_ok=True)
+        counts["dropped"] = len(unlinked)
+    conn.close()
+    return counts
+
+
+def verify(db_path: Path = BLOB_INDEX) -> List[str]:
+    """Keys whose blob is missing or no longer hashes to its recorded raw hash"""
+    conn = connect(db_path)
+    rows = conn.execute("SELECT key, raw_hash FROM blobs").fetchall()
+    conn.close()
+
+    def _bad(row):
+        key, raw_hash = row
+        blob = blob_path(key)
+        return key if not blob.exists() or hashlib.sha1(blob.read_bytes()).hexdigest() != raw_hash else None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        return [k for k in pool.map(_bad, rows, chunksize=256) if k is not None]
+
+
+def gc(db_path: Path = BLOB_INDEX) -> Tuple[int, int]:
+    """Remove refs to deleted paths, then blobs nothing refers to"""
+    conn = connect(db_path)
+    gone = [(p,) for (p,) in conn.execute("SELECT path FROM refs") if not resolve(p).exists()]
+    with conn:
+        conn.executemany("DELETE FROM refs WHERE path = ?", gone)
+        orphans = [k for (k,) in conn.execute("SELECT key FROM blobs WHERE key NOT IN (SELECT key FROM refs)")]
+        conn.executemany("DELETE FROM blobs WHERE key = ?", [(k,) for k in orphans])
+    conn.close()
+    for key in orphans:
+        blob_path(key).unlink(missing_ok=True)
+    return len(gone), len(orphans)
+
+
+def report(db_path: Path = BLOB_INDEX):
+    conn = connect(db_path)
+    n_refs, ref_bytes, n_linked = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(byte_size), 0), COALESCE(SUM(linked), 0) FROM refs").fetchone()
+    n_blobs, blob_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(byte_size), 0) FROM blobs").fetchone()
+    near = conn.execute("SELECT COUNT(*) FROM refs r JOIN blobs b ON b.key = r.key "
+                        "WHERE r.raw_hash != b.raw_hash").fetchone()[0]
+    top = conn.execute("SELECT key, COUNT(*) AS n, MIN(path) FROM refs GROUP BY key HAVING n > 1 "
+                       "ORDER BY n DESC LIMIT 5").fetchall()
+    conn.close()
+
+    print(f"{n_refs:,} paths -> {n_blobs:,} blobs ({n_refs - n_blobs:,} duplicate paths, "
+          f"{near:,} equal except for {', '.join(sorted(VOLATILE_COLUMNS))}); {n_linked:,} hard-linked")
+    print(f"{ref_bytes / 1e6:.1f} MB referenced, {blob_bytes / 1e6:.1f} MB stored")
+    for key, n, example in top:
+        print(f"  {n:>6,} x {key[:12]}  e.g. {example}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed store for the scraped files")
+    parser.add_argument("--link", action="store_true", help="replace paths with hard links to their blobs")
+    parser.add_argument("--verify", action="store_true", help="re-hash every blob")
+    parser.add_argument("--gc", action="store_true", help="drop refs to deleted paths and orphaned blobs")
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.verify:
+        bad = verify()
+        print(f"{len(bad)} corrupt or missing blobs" + (f": {bad[:10]}" if bad else ""))
+        return
+    if args.gc:
+        refs, blobs = gc()
+        print(f"Removed {refs:,} stale refs and {blobs:,} unreferenced blobs")
+        return
+
+    counts = migrate(link=args.link)
+    print(f"Blob store: {counts} in {time.time() - start:.1f}s -> {BLOB_DIR}")
+    report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+BOX-SCORE PAGE PARSING
+Turns a basketball-reference box-score page into the tables nba_scapper.py
+saves: one DataFrame per *-basic table (game, halves, quarters) with sanitized
+column names, the player uid, team, opponent, game_id and game_date.
+
+parse_game lives in an importable module rather than in the scraper script so
+scrape_engine.Engine can run it in worker processes under any multiprocessing
+start method: spawn and forkserver (macOS, Windows, Python 3.14's default)
+import the function's module in every worker.
+
+Usage:
+    from box_scores import parse_game
+    Engine().run(urls, functools.partial(parse_game, season=2026), on_result)
+    for table_id, df in parse_game(url, page.html, season=2026):
+        ...
+"""
+
+import hashlib
+import re
+import unicodedata
+from datetime import date, datetime
+from io import StringIO
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from fetch import Page
+from profiler import span
+
+
+# =========================
+# HELPERS
+# =========================
+def sanitize(col) -> str:
+    col = unicodedata.normalize("NFKD", str(col)).lower()
+    col = re.sub(r"\s+", "_", col)
+    col = re.sub(r"[^a-z0-9_]", "", col)
+    return col if not col[0].isdigit() else f"c_{col}"
+
+
+def extract_game_date_from_url(url: str) -> Optional[date]:
+    try:
+        return datetime.strptime(url.split("/")[-1][:8], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def extract_tables(page: Page) -> List[Tuple[str, str]]:
+    with span("parse", "extract_tables"):
+        return page.tables(prefix="box-")
+
+
+def extract_home_away_teams(page: Page) -> Tuple[str, str]:
+    """(away, home) from the order of the box tables"""
+    teams = []
+    for tid in page.table_ids():
+        m = re.match(r"box-([A-Z]{3})", tid)
+        if m and m.group(1) not in teams:
+            teams.append(m.group(1))
+    return tuple(teams[:2]) if len(teams) >= 2 else ("UNK", "UNK")
+
+
+def make_player_uid(player: str, team: str, season: int) -> str:
+    return hashlib.sha1(f"{player}_{team}_{season}".encode()).hexdigest()
+
+
+# =========================
+# TABLES
+# =========================
+def build_table(html: str, table_id: str, game_id: str, game_date, away: str, home: str,
+                season: int) -> Optional[pd.DataFrame]:
+    with span("parse", "read_html"):
+        df = pd.read_html(StringIO(html))[0]
+
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = ["_".join(filter(None, map(str, c))) for c in df.columns]
+
+    df.columns = [sanitize(c) for c in df.columns]
+
+    # the site heads the name column "Starters" (over a blank over-header): unnamed_0_level_0_starters
+    player_col = next((c for c in df.columns if "player" in c or "starters" in c), None)
+    if not player_col:
+        return None
+
+    df[player_col] = df[player_col].astype(str).str.replace(r"[*†‡§]", "", regex=True)
+    df = df[df[player_col].str.strip() != ""]
+
+    team = re.search(r"box-([A-Z]{3})", table_id).group(1)
+
+    df["player_uid"] = df[player_col].apply(lambda p: make_player_uid(p, team, season))
+    df["team"] = team
+    df["opponent"] = away if team == home else home
+    df["game_id"] = game_id
+    df["game_date"] = game_date
+    return df
+
+
+def parse_game(url: str, html: str, season: int) -> List[Tuple[str, pd.DataFrame]]:
+    """(table_id, DataFrame) of the basic box tables of one game page"""
+    page = Page(url, html, "http")
+    game_id = url.split("/")[-1].replace(".html", "")
+    game_date = extract_game_date_from_url(url)
+    away, home = extract_home_away_teams(page)
+
+    tables = []
+    for table_html, tid in extract_tables(page):
+        if "basic" in tid:
+            df = build_table(table_html, tid, game_id, game_date, away, home, season)
+            if df is not None:
+                tables.append((tid, df))
+    return tables
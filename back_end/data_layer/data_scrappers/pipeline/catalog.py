@@ -0,0 +1,314 @@
+"""
+SCRAPED FILE CATALOG
+SQLite index of every scraped artifact: source, table type, game_id, team,
+date, season, row count, byte size, content hash and mtime.
+
+Scrapers call record_file() after each write; rebuild() scans the existing tree
+in parallel and only re-hashes files whose size or mtime changed. Loaders and
+incremental jobs query the catalog (game_files(), query()) instead of walking
+directories with tens of thousands of entries and Zone.Identifier side files.
+
+Usage:
+    python catalog.py --rebuild        # scan DATA_DIR (incremental)
+    python catalog.py --full           # re-hash everything
+    python catalog.py                  # summary per source/table type
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from config import (CATALOG_DB, DATA_DIR, DERIVED_DIR, ELO_OUTPUT_DIR, MAX_WORKERS, SEASON_BOX_DIRS, UNIFIED_DIR,
+                    ZSTD_DICT_DIR)
+from loaders import (BOX_TABLE_PATTERN, FBREF_FILE_PATTERN, GAME_ID_PATTERN, espn_team_code,
+                     season_from_game_id, soccer_season)
+from zstd_codec import decompress, logical_path
+
+# =========================
+# CONFIGURATION
+# =========================
+# Pipeline outputs living inside the data tree are not scraped artifacts; segment
+# files (segments.py) are appended in place and have their own index
+SKIP_DIRS = [DERIVED_DIR, UNIFIED_DIR, ELO_OUTPUT_DIR, ZSTD_DICT_DIR] + [d / "segments" for d in SEASON_BOX_DIRS]
+SKIP_SUFFIXES = {".py", ".ipynb", ".sqlite", ".tmp"}
+SIDE_FILE_MARKER = ":Zone.Identifier"
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp"}
+_DATA_ROOT = DATA_DIR.resolve().as_posix()
+
+PER_GAME_PATTERN = re.compile(r"^(?P<table>[a-z_]+)_(?P<gid>\d{8}0[A-Z]{3})\.(csv|txt)$")
+GAME_PREFIX_PATTERN = re.compile(r"^(?P<gid>\d{8}0[A-Z]{3})_(?P<table>[A-Za-z0-9_-]+?)(_\d{4}-\d{2}-\d{2})?\.csv$")
+TEAM_STAT_PATTERN = re.compile(r"^(?P<team>[A-Z]{3})_(?P<table>.+)_(?P<year>\d{4})\.csv$")
+ROSTER_PATTERN = re.compile(r"^(?P<team>[A-Z]{3})_roster_(?P<year>\d{4})\.csv$")
+
+COLUMNS = ["path", "source", "table_type", "game_id", "team", "date", "season",
+           "row_count", "byte_size", "content_hash", "mtime_ns", "cataloged_at"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    table_type TEXT NOT NULL,
+    game_id TEXT,
+    team TEXT,
+    date TEXT,
+    season INTEGER,
+    row_count INTEGER,
+    byte_size INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    cataloged_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_files_table_game ON files (table_type, game_id);
+CREATE INDEX IF NOT EXISTS idx_files_source_season ON files (source, table_type, season);
+CREATE INDEX IF NOT EXISTS idx_files_team ON files (team, season);
+CREATE INDEX IF NOT EXISTS idx_files_date ON files (date);
+CREATE INDEX IF NOT EXISTS idx_files_hash ON files (content_hash);
+"""
+
+
+def connect(db_path: Path = CATALOG_DB) -> sqlite3.Connection:
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")  # scrapers may record from several threads
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# =========================
+# CLASSIFICATION
+# =========================
+def catalog_path(path: Path) -> str:
+    """Paths inside DATA_DIR are stored relative to it, others absolute"""
+    path = Path(os.path.abspath(path)).as_posix()
+    if path.startswith(_DATA_ROOT + "/"):
+        return path[len(_DATA_ROOT) + 1:]
+    return path
+
+
+def classify(path: Path) -> Dict[str, object]:
+    """source/table_type/game_id/team/date/season from the file's name and folder (.zst ignored)"""
+    path = logical_path(path)
+    name, parent = path.name, path.parent.name
+    info = {"source": None, "table_type": path.stem, "game_id": None, "team": None, "date": None, "season": None}
+
+    box = BOX_TABLE_PATTERN.match(parent)
+    per_game = PER_GAME_PATTERN.match(name)
+    prefixed = GAME_PREFIX_PATTERN.match(name)
+    fbref = FBREF_FILE_PATTERN.match(name)
+    team_stat = TEAM_STAT_PATTERN.match(name)
+    roster = ROSTER_PATTERN.match(name)
+
+    if box and GAME_ID_PATTERN.fullmatch(path.stem):
+        # nba_scapper.py: tables/box-<TEAM>-<kind>/<game_id>.csv
+        info.update(source="nba_2025_26", table_type=f"box-{box.group(2)}", game_id=path.stem, team=box.group(1))
+    elif per_game:
+        # scrape_quarters_and_advanced.py history: <table>_<game_id>.csv / summary_<game_id>.txt
+        info.update(source="nba_boxscores", table_type=per_game.group("table"), game_id=per_game.group("gid"))
+    elif prefixed:
+        # <game_id>_<table>[_<date>].csv from all_nba_scrapper.py / the requests scraper
+        info.update(source="nba_game_tables", table_type=prefixed.group("table"), game_id=prefixed.group("gid"))
+    elif fbref:
+        info.update(source="fbref", table_type=fbref.group("table"), date=fbref.group("date"),
+                    season=soccer_season(fbref.group("date")),
+                    team=None if fbref.group("table") == "league_stats" else fbref.group("team"))
+    elif roster:
+        info.update(source="team_data", table_type="roster", team=roster.group("team"),
+                    season=int(roster.group("year")) - 1)
+    elif team_stat and path.parent.parent.name.startswith("nba_team_stats_"):
+        info.update(source="nba_team_stats", table_type=team_stat.group("table"), team=team_stat.group("team"),
+                    season=int(team_stat.group("year")) - 1)
+    elif name == "roster_images.csv":
+        info.update(source="espn_rosters", table_type="roster_images", team=espn_team_code(parent))
+    elif path.suffix in IMAGE_SUFFIXES and path.parent.parent.name == "nba_rosters":
+        # scrape_player_images.py: nba_rosters/<team>/<player>.png
+        info.update(source="espn_rosters", table_type="player_image", team=espn_team_code(parent))
+
+    if info["game_id"]:
+        gid = info["game_id"]
+        info["date"] = f"{gid[:4]}-{gid[4:6]}-{gid[6:8]}"
+        info["season"] = season_from_game_id(gid)
+    if info["source"] is None:
+        info["source"] = "other"
+    return info
+
+
+def count_rows(data: bytes, suffix: str) -> Optional[int]:
+    """Data rows of a CSV (lines minus header rows); None for non-CSV files"""
+    if suffix != ".csv":
+        return None
+    lines = data.count(b"\n") + (0 if not data or data.endswith(b"\n") else 1)
+    header_rows = 2 if data.startswith(b"Unnamed: 0_level_0") else 1
+    return max(lines - header_rows, 0)
+
+
+def describe(path: Path, data: Optional[bytes] = None, rows: Optional[int] = None) -> Dict[str, object]:
+    """Full catalog row for one file (reads it unless data is given)"""
+    path = Path(path)
+    st = path.stat()
+    if data is None:
+        data = path.read_bytes()
+    row = classify(path)
+    row.update(
+        path=catalog_path(path),
+        row_count=rows if rows is not None else count_rows(decompress(data), logical_path(path).suffix),
+        byte_size=st.st_size,
+        content_hash=hashlib.sha1(data).hexdigest(),
+        mtime_ns=st.st_mtime_ns,
+        cataloged_at=datetime.now().isoformat(timespec="seconds"),
+    )
+    return row
+
+
+def _upsert(conn: sqlite3.Connection, rows: Iterable[Dict[str, object]]):
+    conn.executemany(
+        f"INSERT OR REPLACE INTO files ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+        [tuple(r[c] for c in COLUMNS) for r in rows])
+
+
+# =========================
+# SCRAPER HOOK
+# =========================
+def record_file(path, rows: Optional[int] = None, db_path: Path = CATALOG_DB) -> bool:
+    """Add/refresh one file right after a scraper wrote it
+
+    Never raises: a catalog problem must not stop a scrape, and rebuild() will
+    pick the file up later.
+    """
+    try:
+        row = describe(Path(path), rows=rows)
+        conn = connect(db_path)
+        with conn:
+            _upsert(conn, [row])
+        conn.close()
+        return True
+    except (OSError, sqlite3.Error) as e:
+        print(f"Catalog update failed for {path}: {e}")
+        return False
+
+
+# =========================
+# REBUILD
+# =========================
+def scan(root: Path = DATA_DIR, side_files: bool = False) -> List[Path]:
+    """Every scraped file under root, without pipeline outputs (and side files unless asked)"""
+    skip = {os.path.abspath(d) for d in SKIP_DIRS}
+    found = []
+    for dirpath, dirnames, filenames in os.walk(os.path.abspath(root)):
+        dirnames[:] = [d for d in dirnames
+                       if os.path.join(dirpath, d) not in skip and not d.startswith((".", "__"))]
+        for name in filenames:
+            if (SIDE_FILE_MARKER in name and not side_files) or Path(name).suffix in SKIP_SUFFIXES:
+                continue
+            found.append(Path(dirpath, name))
+    return found
+
+
+def _describe_if_changed(args):
+    path, known = args
+    st = path.stat()
+    if known is not None and known == (st.st_size, st.st_mtime_ns):
+        return None
+    return describe(path)
+
+
+def rebuild(full: bool = False, root: Path = DATA_DIR, db_path: Path = CATALOG_DB) -> Dict[str, int]:
+    """Bring the catalog in line with the tree; returns added/updated/removed counts"""
+    conn = connect(db_path)
+    known = {} if full else {p: (s, m) for p, s, m in conn.execute(
+        "SELECT path, byte_size, mtime_ns FROM files")}
+
+    paths = scan(root)
+    jobs = [(p, known.get(catalog_path(p))) for p in paths]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        rows = [r for r in pool.map(_describe_if_changed, jobs, chunksize=256) if r is not None]
+
+    present = {catalog_path(p) for p in paths}
+    in_root = catalog_path(root)
+    existing = [p for (p,) in conn.execute("SELECT path FROM files")]
+    removed = [p for p in existing if p not in present and (in_root == "." or p.startswith(in_root))]
+
+    with conn:
+        if full:
+            conn.execute("DELETE FROM files")
+        _upsert(conn, rows)
+        conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in removed])
+    conn.close()
+
+    updated = sum(1 for r in rows if r["path"] in known)
+    return {"added": len(rows) - updated, "updated": updated, "removed": len(removed)}
+
+
+# =========================
+# QUERIES
+# =========================
+def query(source: Optional[str] = None, table_type: Optional[str] = None,
+          game_ids: Optional[Iterable[str]] = None, team: Optional[str] = None,
+          season: Optional[int] = None, start: Optional[str] = None, end: Optional[str] = None,
+          db_path: Path = CATALOG_DB) -> pd.DataFrame:
+    """Catalog rows matching all given filters (each maps onto an index)"""
+    clauses, params = [], []
+    for column, value in (("source", source), ("table_type", table_type), ("team", team), ("season", season)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if start is not None:
+        clauses.append("date >= ?")
+        params.append(str(start))
+    if end is not None:
+        clauses.append("date <= ?")
+        params.append(str(end))
+    if game_ids is not None:
+        game_ids = list(game_ids)
+        clauses.append(f"game_id IN ({', '.join('?' * len(game_ids))})")
+        params.extend(game_ids)
+
+    sql = "SELECT * FROM files" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+    conn = connect(db_path)
+    df = pd.read_sql_query(sql + " ORDER BY path", conn, params=params)
+    conn.close()
+    return df
+
+
+def resolve(path: str) -> Path:
+    """Filesystem path for a catalog path"""
+    p = Path(path)
+    return p if p.is_absolute() else DATA_DIR / p
+
+
+def game_files(table: str, source: str = "nba_boxscores", db_path: Path = CATALOG_DB) -> Dict[str, Path]:
+    """Catalog-backed equivalent of loaders.list_game_files: game_id -> file"""
+    df = query(source=source, table_type=table, db_path=db_path)
+    return {gid: resolve(p) for gid, p in zip(df["game_id"], df["path"])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog of scraped files")
+    parser.add_argument("--rebuild", action="store_true", help="scan the data tree for new/changed files")
+    parser.add_argument("--full", action="store_true", help="re-hash every file")
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.rebuild or args.full:
+        counts = rebuild(full=args.full)
+        print(f"Catalog: {counts} in {time.time() - start:.1f}s -> {CATALOG_DB}")
+
+    conn = connect()
+    summary = pd.read_sql_query(
+        "SELECT source, table_type, COUNT(*) AS files, SUM(row_count) AS rows, "
+        "ROUND(SUM(byte_size) / 1e6, 1) AS mb, MIN(season) AS first_season, MAX(season) AS last_season "
+        "FROM files GROUP BY source, table_type ORDER BY source, files DESC", conn)
+    conn.close()
+    print(summary.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
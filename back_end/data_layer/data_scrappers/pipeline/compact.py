@@ -0,0 +1,250 @@
+"""
+UNIFIED ELO INPUT COMPACTION
+Builds the ./unified tables run_elo.py reads (basic_boxscore.csv,
+advanced_boxscore.csv, four_factors.csv, plus line_scores.csv and quarters.csv)
+from the per-game files, following the schema of unify.ipynb.
+
+Two raw layouts are normalized into one schema:
+- nba_boxscores/<table>_<game_id>.csv
+- nba_2025_26_boxscores/tables/box-<TEAM>-game-basic/<game_id>.csv (basic only),
+  or the same tables in segment files (segments.py)
+
+Only game_ids missing from unified/manifest.csv are read and appended, in
+parallel chunks on a process pool, so a nightly rebuild touches only new files.
+
+Usage:
+    python compact.py                 # append new games
+    python compact.py --rebuild       # rewrite every unified table
+    python compact.py --skip-quarantined
+"""
+
+import argparse
+import concurrent.futures
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from config import MAX_WORKERS, UNIFIED_DIR
+from loaders import NON_PLAYER_ROWS, list_game_files, list_team_box_files, read_csvs
+from profiler import timed
+from schemas import apply_schema
+
+# =========================
+# CONFIGURATION
+# =========================
+MANIFEST_FILE = UNIFIED_DIR / "manifest.csv"
+CHUNK_SIZE = 500          # games per worker task
+MIN_PARALLEL_GAMES = 200  # below this, reading in-process is faster than spawning workers
+
+BOX_URL = "https://www.basketball-reference.com/boxscores/{}.html"
+
+# unified table -> per-game table in nba_boxscores
+GAME_TABLES = {
+    "four_factors": "four_factors",
+    "line_scores": "line_scores",
+    "quarters": "quarters",
+    "basic_boxscore": "team_basic",
+    "advanced_boxscore": "team_advanced",
+}
+
+# team_basic_*.csv stat columns; the 2025-26 tables are mapped onto them by schemas.py
+BASIC_STATS = [
+    "mp", "fg", "fga", "fg_pct", "fg3", "fg3a", "fg3_pct", "ft", "fta", "ft_pct",
+    "orb", "drb", "trb", "ast", "stl", "blk", "tov", "pf", "pts", "game_score", "plus_minus",
+]
+KEY_COLUMNS = ["game_date", "game_id", "team", "home_team", "away_team", "game_key"]
+
+
+# =========================
+# NORMALIZATION
+# =========================
+def add_game_keys(df: pd.DataFrame) -> pd.DataFrame:
+    """home_team/away_team/game_key as in unify.ipynb (YYYY-MM-DD:YYYYAWAY@HOME)
+
+    The home team comes from the game id; games without exactly two teams are
+    partial scrapes and are dropped (they are picked up again on a later run).
+    """
+    df = df.drop(columns=["home_team", "away_team", "game_key"], errors="ignore")
+    teams = df.groupby("game_id")["team"].unique()
+    teams = teams[teams.map(len) == 2]
+    home = teams.index.str[-3:]
+    away = [t[0] if t[0] != h else t[1] for t, h in zip(teams, home)]
+    keys = pd.DataFrame({"game_id": teams.index, "home_team": home, "away_team": away})
+
+    df = df.merge(keys, on="game_id")
+    df["game_date"] = pd.to_datetime(df["game_id"].str[:8], format="%Y%m%d").dt.strftime("%Y-%m-%d")
+    df["game_key"] = df["game_date"] + ":" + df["game_date"].str[:4] + df["away_team"] + "@" + df["home_team"]
+    return df
+
+
+def normalize_season_basic(df: pd.DataFrame) -> pd.DataFrame:
+    """2025-26 per-team box table -> basic_boxscore schema"""
+    typed = apply_schema(df, "game-basic")
+    if "did_play" in typed.columns:
+        typed = typed[typed["did_play"].fillna(True)]
+    typed = typed[typed["player"].notna() & ~typed["player"].isin(NON_PLAYER_ROWS)]
+    typed = typed[typed["mp"].notna()]  # "Player Suspended" rows carry text instead of stats
+
+    stats = typed[[c for c in BASIC_STATS if c in typed.columns]].copy()
+    stats["mp"] = stats["mp"].astype("float64").round(2)
+    for col in ("player", "team", "game_id"):
+        stats[col] = typed[col].astype(str)
+    stats["url"] = stats["game_id"].map(BOX_URL.format)
+    return stats[["player", "team", "game_id", "url"] + list(stats.columns[:-4])]
+
+
+def _read_chunk(job: Tuple[str, List]) -> pd.DataFrame:
+    """Worker: read and normalize one chunk of files of one layout"""
+    layout, paths = job
+    df = read_csvs(paths, max_workers=4)
+    if df.empty:
+        return df
+    if layout == "season_basic":
+        df = normalize_season_basic(df)
+    return df
+
+
+@timed("parse")
+def read_parallel(layout: str, paths: List[Path], processes: bool) -> pd.DataFrame:
+    jobs = [(layout, paths[i:i + CHUNK_SIZE]) for i in range(0, len(paths), CHUNK_SIZE)]
+    if not jobs:
+        return pd.DataFrame()
+    if processes and len(paths) >= MIN_PARALLEL_GAMES:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(jobs))) as pool:
+            frames = list(pool.map(_read_chunk, jobs))
+    else:
+        frames = [_read_chunk(job) for job in jobs]
+    frames = [f for f in frames if not f.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+# =========================
+# MANIFEST
+# =========================
+def load_manifest() -> pd.DataFrame:
+    if MANIFEST_FILE.exists():
+        return pd.read_csv(MANIFEST_FILE, dtype={"game_id": str})
+    return pd.DataFrame(columns=["table", "game_id", "source", "rows", "compacted_at"])
+
+
+@timed("io")
+def append_table(name: str, df: pd.DataFrame) -> int:
+    """Append rows to unified/<name>.csv keeping the existing column order"""
+    path = UNIFIED_DIR / f"{name}.csv"
+    front = [c for c in KEY_COLUMNS if c in df.columns]
+    df = df[front + [c for c in df.columns if c not in front]]
+
+    if path.exists() and path.stat().st_size > 0:
+        existing = pd.read_csv(path, nrows=0).columns.tolist()
+        extra = [c for c in df.columns if c not in existing]
+        if extra:
+            # New columns (e.g. a first OT2 game): rewrite once with the wider header
+            full = pd.concat([pd.read_csv(path, dtype={"game_id": str}), df], ignore_index=True)
+            full[existing + extra].to_csv(path, index=False)
+        else:
+            df.reindex(columns=existing).to_csv(path, mode="a", header=False, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return len(df)
+
+
+# =========================
+# COMPACTION
+# =========================
+def plan(manifest: pd.DataFrame, exclude: set, use_catalog: bool = False) -> Dict[str, List[Tuple[str, str, Path]]]:
+    """Per unified table: (layout, game_id, path) of every game not compacted yet
+
+    use_catalog=True lists the per-game files from catalog.py instead of globbing
+    nba_boxscores.
+    """
+    done = manifest.groupby("table")["game_id"].agg(set).to_dict()
+    if use_catalog:
+        from catalog import game_files
+        files_by_table = {table: game_files(table) for table in GAME_TABLES.values()}
+    else:
+        files_by_table = {table: list_game_files(table) for table in GAME_TABLES.values()}
+    work = {}
+    for name, table in GAME_TABLES.items():
+        files = files_by_table[table]
+        skip = done.get(name, set()) | exclude
+        work[name] = [("game", gid, path) for gid, path in files.items() if gid not in skip]
+
+    # 2025-26 basic tables for games the per-game layout does not have
+    have = set(files_by_table["team_basic"]) | done.get("basic_boxscore", set()) | exclude
+    season = [("season_basic", gid, path) for (gid, _), path in sorted(list_team_box_files("game-basic").items())
+              if gid not in have]
+    work["basic_boxscore"] += season
+    return work
+
+
+def compact(rebuild: bool = False, skip_quarantined: bool = False, processes: bool = True,
+            use_catalog: bool = False) -> Dict[str, int]:
+    UNIFIED_DIR.mkdir(parents=True, exist_ok=True)
+    if rebuild:
+        for name in GAME_TABLES:
+            (UNIFIED_DIR / f"{name}.csv").unlink(missing_ok=True)
+        MANIFEST_FILE.unlink(missing_ok=True)
+
+    exclude = set()
+    if skip_quarantined:
+        from consistency import quarantined_game_ids
+        exclude = quarantined_game_ids()
+
+    manifest = load_manifest()
+    work = plan(manifest, exclude, use_catalog=use_catalog)
+    now = datetime.now().isoformat(timespec="seconds")
+    added, entries = {}, []
+
+    for name, items in work.items():
+        if not items:
+            continue
+        frames = []
+        for layout in ("game", "season_basic"):
+            paths = [p for lay, _, p in items if lay == layout]
+            if paths:
+                frames.append(read_parallel(layout, paths, processes))
+        df = pd.concat([f for f in frames if not f.empty], ignore_index=True) if frames else pd.DataFrame()
+        if df.empty:
+            continue
+
+        df["game_id"] = df["game_id"].astype(str)
+        df = add_game_keys(df)
+        added[name] = append_table(name, df)
+
+        counts = df.groupby("game_id").size()
+        sources = {gid: lay for lay, gid, _ in items}
+        entries.append(pd.DataFrame({
+            "table": name, "game_id": counts.index, "source": counts.index.map(sources),
+            "rows": counts.to_numpy(), "compacted_at": now,
+        }))
+
+    if entries:
+        manifest = pd.concat([manifest] + entries, ignore_index=True)
+        manifest.to_csv(MANIFEST_FILE, index=False)
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact per-game CSVs into the unified Elo inputs")
+    parser.add_argument("--rebuild", action="store_true", help="rewrite all unified tables")
+    parser.add_argument("--skip-quarantined", action="store_true",
+                        help="leave out games flagged by consistency.py")
+    parser.add_argument("--catalog", action="store_true", help="plan from catalog.py instead of globbing")
+    parser.add_argument("--serial", action="store_true", help="read in-process instead of a process pool")
+    args = parser.parse_args()
+
+    start = time.time()
+    added = compact(rebuild=args.rebuild, skip_quarantined=args.skip_quarantined, processes=not args.serial,
+                    use_catalog=args.catalog)
+    if not added:
+        print("Unified tables are up to date")
+    for name, rows in added.items():
+        print(f"  {name}: +{rows:,} rows")
+    print(f"Done in {time.time() - start:.1f}s -> {UNIFIED_DIR}")
+
+
+if __name__ == "__main__":
+    main()
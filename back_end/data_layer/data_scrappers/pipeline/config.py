@@ -0,0 +1,61 @@
+"""
+PIPELINE CONFIGURATION
+Shared locations of the scraped data and of the artifacts derived from it
+"""
+
+import os
+from pathlib import Path
+
+# =========================
+# SOURCE DATA
+# =========================
+ROOT_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(os.getenv("FORESIGHT_DATA_DIR", ROOT_DIR / "scrapped_data"))
+
+NBA_DIR = DATA_DIR / "nba_data"
+BOXSCORE_DIR = NBA_DIR / "nba_boxscores"
+TEAM_DATA_DIR = NBA_DIR / "team_data"
+ROSTERS_DIR = NBA_DIR / "nba_rosters"
+TEAM_STATS_GLOB = "nba_team_stats_*"  # one folder per season end year, then <TEAM>/
+
+# 2025-26 scrape (nba_scapper.py): tables/box-<TEAM>-game-basic/<game_id>.csv.
+# The tree exists twice with partially overlapping games; earlier entries win.
+SEASON_BOX_DIRS = [NBA_DIR / "nba_2025_26_boxscores", DATA_DIR / "nba_2025_26_boxscores"]
+
+# FBref team tables (premier_scapper.py): <team>_<table>_<YYYY-MM-DD>.csv
+FBREF_DIR = DATA_DIR / "primier_leaugue_stats"
+
+# Elo inputs/outputs used by run_elo.py
+UNIFIED_DIR = BOXSCORE_DIR / "unified"
+ELO_OUTPUT_DIR = BOXSCORE_DIR / "elo_output"
+ELO_HISTORY_DIR = ELO_OUTPUT_DIR / "history"
+
+# zstd dictionaries of the compressed scraped CSVs (zstd_codec.py); readers need them,
+# so they live with the data. Scrapers write <name>.csv.zst unless FORESIGHT_ZSTD=0.
+ZSTD_DICT_DIR = DATA_DIR / "zstd_dicts"
+WRITE_ZSTD = os.getenv("FORESIGHT_ZSTD", "1") != "0"
+
+# =========================
+# DERIVED DATA
+# =========================
+DERIVED_DIR = Path(os.getenv("FORESIGHT_DERIVED_DIR", NBA_DIR / "derived"))
+FEATURE_STORE_DIR = DERIVED_DIR / "feature_store"
+PERCENTILE_DIR = DERIVED_DIR / "percentiles"
+ROSTER_INDEX_DIR = DERIVED_DIR / "roster_index"
+QUALITY_DIR = DERIVED_DIR / "quality"
+ENTITY_DB = DERIVED_DIR / "entities.sqlite"
+LAKE_DIR = DERIVED_DIR / "lake"
+CATALOG_DB = DERIVED_DIR / "catalog.sqlite"
+MATRIX_DIR = DERIVED_DIR / "player_matrix"
+BLOB_DIR = DERIVED_DIR / "blobs"
+TEAM_CUBE_DIR = DERIVED_DIR / "team_cube"
+DIMENSIONS_DB = DERIVED_DIR / "dimensions.sqlite"
+AGGREGATE_CACHE_DIR = DERIVED_DIR / "aggregate_cache"
+AGGREGATE_CACHE_MB = int(os.getenv("FORESIGHT_AGGREGATE_CACHE_MB", 256))  # LRU size bound
+DAEMON_SOCKET = Path(os.getenv("FORESIGHT_SOCKET", DERIVED_DIR / "daemon.sock"))
+DAG_DIR = DERIVED_DIR / "dag"
+PROFILE_DIR = DERIVED_DIR / "profiles"
+HOST_RATES_FILE = DERIVED_DIR / "host_rates.json"  # adaptive per-host request rates, kept between runs
+
+# Parallelism for file scans
+MAX_WORKERS = int(os.getenv("FORESIGHT_MAX_WORKERS", min(32, (os.cpu_count() or 1) + 4)))
@@ -0,0 +1,211 @@
+"""
+BOX SCORE CONSISTENCY CHECKER
+Cross-table checks over the per-game files in nba_boxscores, run as one
+vectorized pass (load -> join on game_id/team -> compare).
+
+Checks per game:
+- line_scores has exactly two teams, including the home team from the game id
+- line_scores period columns (Q1..Q4, OT*) add up to TOTAL
+- quarters_*.csv player points per team and period match the line score
+- team_basic_*.csv player points per team match TOTAL
+- four_factors_*.csv has a row for both teams
+- every table type exists for the game; checks against the line score skip
+  games without one
+
+Inconsistent games are written to a quarantine list with one row per reason.
+Only games whose files are new or changed since the last run are re-checked.
+
+Usage:
+    python consistency.py          # check new/changed games
+    python consistency.py --all    # re-check the full history
+"""
+
+import argparse
+import re
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import pandas as pd
+
+from config import QUALITY_DIR
+from loaders import list_game_files, read_csvs
+
+# =========================
+# CONFIGURATION
+# =========================
+QUARANTINE_FILE = QUALITY_DIR / "quarantine.csv"
+CHECKED_FILE = QUALITY_DIR / "checked_games.csv"
+
+CHECKED_TABLES = ["line_scores", "quarters", "team_basic", "four_factors"]
+PERIOD_PATTERN = re.compile(r"^(Q[1-4]|OT\d+)$")
+QUARANTINE_COLUMNS = ["game_id", "reason", "team", "detail", "checked_at"]
+
+
+# =========================
+# HELPERS
+# =========================
+def _issues(df: pd.DataFrame, reason: str, detail) -> pd.DataFrame:
+    """Quarantine rows for every row of df (needs game_id, optional team)"""
+    if df.empty:
+        return pd.DataFrame(columns=["game_id", "reason", "team", "detail"])
+    out = pd.DataFrame({
+        "game_id": df["game_id"].to_numpy(),
+        "reason": reason,
+        "team": df["team"].to_numpy() if "team" in df else None,
+    })
+    out["detail"] = detail(df).to_numpy() if callable(detail) else detail
+    return out
+
+
+def file_versions(files: Dict[str, Dict[str, object]]) -> pd.DataFrame:
+    """game_id -> combined size/mtime stamp of all its files, for change detection"""
+    stamps = {}
+    for table, by_game in files.items():
+        for gid, path in by_game.items():
+            st = path.stat()
+            stamps[gid] = stamps.get(gid, 0) + st.st_size + st.st_mtime_ns
+    return pd.DataFrame({"game_id": list(stamps), "version": [str(v) for v in stamps.values()]})
+
+
+# =========================
+# CHECKS
+# =========================
+def check_games(files: Dict[str, Dict[str, object]], game_ids: List[str]) -> pd.DataFrame:
+    """Run every cross-table check for the given games in one pass"""
+    wanted = set(game_ids)
+    subset = {t: [p for g, p in files[t].items() if g in wanted] for t in CHECKED_TABLES}
+
+    lines = read_csvs(subset["line_scores"])
+    if lines.empty:
+        # the other tables of a game can land before its line score; those games are reported as missing_table
+        lines = pd.DataFrame(columns=["game_id", "team", "TOTAL"])
+    quarters = read_csvs(subset["quarters"], usecols=["game_id", "team", "quarter", "pts"])
+    box = read_csvs(subset["team_basic"], usecols=["game_id", "team", "pts"])
+    four = read_csvs(subset["four_factors"], usecols=["game_id", "team"])
+
+    issues = []
+
+    # Missing tables
+    for table in CHECKED_TABLES:
+        missing = pd.DataFrame({"game_id": sorted(wanted - set(files[table]))})
+        issues.append(_issues(missing, "missing_table", table))
+
+    # Line scores: two teams incl. the home team, periods add up
+    periods = [c for c in lines.columns if PERIOD_PATTERN.match(c)]
+    lines[periods + ["TOTAL"]] = lines[periods + ["TOTAL"]].apply(pd.to_numeric, errors="coerce")
+
+    n_teams = lines.groupby("game_id")["team"].nunique()
+    bad = n_teams[n_teams != 2].rename("n").reset_index()
+    issues.append(_issues(bad, "line_scores_not_two_teams", lambda d: d["n"].astype(str) + " teams"))
+
+    has_home = (lines["team"] == lines["game_id"].str[-3:]).groupby(lines["game_id"]).any()
+    no_home = has_home[~has_home].reset_index()
+    issues.append(_issues(no_home, "home_team_missing", lambda d: d["game_id"].str[-3:]))
+
+    period_sum = lines[periods].sum(axis=1, min_count=1)
+    # assigned before filtering: assigning a Series to an empty frame takes the Series' index
+    bad = lines.assign(period_sum=period_sum)[period_sum != lines["TOTAL"]]
+    issues.append(_issues(bad, "line_total_mismatch",
+                          lambda d: "periods=" + d["period_sum"].astype(str) + " TOTAL=" + d["TOTAL"].astype(str)))
+
+    totals = lines[["game_id", "team", "TOTAL"]]
+
+    # Quarters: per team total and per period
+    quarters["pts"] = pd.to_numeric(quarters["pts"], errors="coerce").fillna(0)
+    q_team = quarters.groupby(["game_id", "team"], as_index=False)["pts"].sum()
+    cmp = totals.merge(q_team, on=["game_id", "team"], how="outer")
+    cmp = cmp[cmp["game_id"].isin(set(quarters["game_id"])) & cmp["game_id"].isin(set(lines["game_id"]))]
+    bad = cmp[cmp["pts"].fillna(-1) != cmp["TOTAL"].fillna(-1)]
+    issues.append(_issues(bad, "quarters_pts_mismatch",
+                          lambda d: "quarters=" + d["pts"].astype(str) + " TOTAL=" + d["TOTAL"].astype(str)))
+
+    line_periods = lines.melt(id_vars=["game_id", "team"], value_vars=periods,
+                              var_name="quarter", value_name="line_pts").dropna(subset=["line_pts"])
+    q_period = quarters.groupby(["game_id", "team", "quarter"], as_index=False)["pts"].sum()
+    cmp = line_periods.merge(q_period, on=["game_id", "team", "quarter"], how="outer")
+    cmp = cmp[cmp["game_id"].isin(set(quarters["game_id"])) & cmp["game_id"].isin(set(lines["game_id"]))]
+    bad = cmp[cmp["pts"].fillna(0) != cmp["line_pts"].fillna(0)]
+    issues.append(_issues(bad, "period_pts_mismatch",
+                          lambda d: d["quarter"] + ": quarters=" + d["pts"].astype(str)
+                          + " line=" + d["line_pts"].astype(str)))
+
+    # Team box score points
+    box["pts"] = pd.to_numeric(box["pts"], errors="coerce").fillna(0)
+    b_team = box.groupby(["game_id", "team"], as_index=False)["pts"].sum()
+    cmp = totals.merge(b_team, on=["game_id", "team"], how="outer")
+    cmp = cmp[cmp["game_id"].isin(set(box["game_id"])) & cmp["game_id"].isin(set(lines["game_id"]))]
+    bad = cmp[cmp["pts"].fillna(-1) != cmp["TOTAL"].fillna(-1)]
+    issues.append(_issues(bad, "box_pts_mismatch",
+                          lambda d: "box=" + d["pts"].astype(str) + " TOTAL=" + d["TOTAL"].astype(str)))
+
+    # Four factors: both teams present
+    pairs = totals[["game_id", "team"]].drop_duplicates()
+    cmp = pairs.merge(four.drop_duplicates(), how="left", indicator=True)
+    cmp = cmp[cmp["game_id"].isin(set(four["game_id"]))]
+    bad = cmp[cmp["_merge"] == "left_only"]
+    issues.append(_issues(bad, "four_factors_missing_team", "no four factors row"))
+
+    result = pd.concat([i for i in issues if not i.empty], ignore_index=True) if any(
+        not i.empty for i in issues) else pd.DataFrame(columns=QUARANTINE_COLUMNS[:-1])
+    result["checked_at"] = datetime.now().isoformat(timespec="seconds")
+    return result.drop_duplicates(["game_id", "reason", "team"])[QUARANTINE_COLUMNS]
+
+
+# =========================
+# RUN
+# =========================
+def load_quarantine() -> pd.DataFrame:
+    if QUARANTINE_FILE.exists():
+        return pd.read_csv(QUARANTINE_FILE, dtype={"game_id": str})
+    return pd.DataFrame(columns=QUARANTINE_COLUMNS)
+
+
+def quarantined_game_ids() -> set:
+    """Games that currently fail a consistency check; consumers can exclude these"""
+    return set(load_quarantine()["game_id"])
+
+
+def run(check_all: bool = False) -> pd.DataFrame:
+    files = {table: list_game_files(table) for table in CHECKED_TABLES}
+    versions = file_versions(files)
+
+    previous = pd.read_csv(CHECKED_FILE, dtype=str) if CHECKED_FILE.exists() and not check_all else \
+        pd.DataFrame(columns=["game_id", "version"])
+    changed = versions.merge(previous, on=["game_id", "version"], how="left", indicator=True)
+    to_check = changed.loc[changed["_merge"] == "left_only", "game_id"].tolist()
+
+    if not to_check:
+        print("No new or changed games to check")
+        return load_quarantine()
+
+    print(f"Checking {len(to_check)} games...")
+    issues = check_games(files, to_check)
+
+    quarantine = load_quarantine()
+    quarantine = quarantine[~quarantine["game_id"].isin(set(to_check))]
+    quarantine = pd.concat([quarantine, issues], ignore_index=True).sort_values(["game_id", "reason"])
+
+    QUALITY_DIR.mkdir(parents=True, exist_ok=True)
+    quarantine.to_csv(QUARANTINE_FILE, index=False)
+    versions.to_csv(CHECKED_FILE, index=False)
+
+    print(f"{issues['game_id'].nunique()} of {len(to_check)} checked games inconsistent; "
+          f"{quarantine['game_id'].nunique()} quarantined in total -> {QUARANTINE_FILE}")
+    return quarantine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-table consistency checks for nba_boxscores")
+    parser.add_argument("--all", action="store_true", help="re-check every game")
+    args = parser.parse_args()
+
+    start = time.time()
+    quarantine = run(check_all=args.all)
+    if not quarantine.empty:
+        print(quarantine["reason"].value_counts().to_string())
+    print(f"Done in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
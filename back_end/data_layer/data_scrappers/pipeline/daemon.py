@@ -0,0 +1,279 @@
+"""
+WARM DATA DAEMON
+Every CLI run and notebook pays the same start-up cost: importing pandas and
+parsing the unified box-score CSVs again. This daemon loads them once into an
+in-process DuckDB, keeps them resident, and answers queries over a Unix domain
+socket, so a short analytical query costs a round trip instead of a reload.
+
+Resident tables (reloaded when their file changes, checked every RELOAD_SECONDS):
+    unified.basic_boxscore, unified.advanced_boxscore, unified.four_factors,
+    unified.line_scores, unified.quarters        compact.py outputs
+    elo.team, elo.player                          current ratings
+    elo.team_history, elo.player_history          rating after every game
+The lake views of sql.py (team_games, team_stats_*, fbref_*, ...) are
+registered as well and scan Parquet on demand.
+
+Protocol (one request per connection):
+    request    one JSON line: {"op": "sql", "sql": "...", "params": [...]}
+                              {"op": "aggregate", "name": "...", "params": {...}}   (aggregate_cache.py)
+                              {"op": "ping" | "reload" | "stop"}
+    response   4-byte big-endian header length, JSON header ({"status": "ok" | "error", ...}),
+               then the result as an Arrow IPC stream
+
+Clients only need pyarrow: query() maps the received bytes into a pyarrow
+Table without copying them again.
+
+Usage:
+    python daemon.py serve
+    python daemon.py query "SELECT team, elo FROM elo.team ORDER BY elo DESC LIMIT 5"
+    python daemon.py ping | reload | stop
+
+    from daemon import query
+    top = query("SELECT * FROM elo.player ORDER BY elo DESC LIMIT 20").to_pandas()
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pyarrow as pa
+
+from config import DAEMON_SOCKET, ELO_HISTORY_DIR, ELO_OUTPUT_DIR, UNIFIED_DIR
+
+# =========================
+# CONFIGURATION
+# =========================
+RELOAD_SECONDS = 30
+HEADER = struct.Struct(">I")
+
+# table -> (file, typed game_id column)
+RESIDENT = {
+    "unified.basic_boxscore": (UNIFIED_DIR / "basic_boxscore.csv", True),
+    "unified.advanced_boxscore": (UNIFIED_DIR / "advanced_boxscore.csv", True),
+    "unified.four_factors": (UNIFIED_DIR / "four_factors.csv", True),
+    "unified.line_scores": (UNIFIED_DIR / "line_scores.csv", True),
+    "unified.quarters": (UNIFIED_DIR / "quarters.csv", True),
+    "elo.team": (ELO_OUTPUT_DIR / "results" / "team_elo_final.csv", False),
+    "elo.player": (ELO_OUTPUT_DIR / "results" / "player_elo_final.csv", False),
+    "elo.team_history": (ELO_HISTORY_DIR / "team_elo_history.csv", True),
+    "elo.player_history": (ELO_HISTORY_DIR / "player_elo_history.csv", True),
+}
+
+
+# =========================
+# SERVER
+# =========================
+class WarmStore:
+    """In-memory DuckDB holding the resident tables"""
+
+    def __init__(self, threads: Optional[int] = None):
+        # imported here so clients of this module only pay for pyarrow
+        import duckdb
+        from sql import _quote, register_views
+
+        self._quote = _quote
+        self.conn = duckdb.connect(":memory:")
+        self.conn.execute(f"SET threads TO {int(threads or os.cpu_count() or 1)}")
+        self.conn.execute("CREATE SCHEMA IF NOT EXISTS unified; CREATE SCHEMA IF NOT EXISTS elo")
+        self.lock = threading.Lock()
+        self.versions: Dict[str, int] = {}
+        self.started = time.time()
+        self.reload()
+        self.views = sorted(register_views(self.conn))
+
+    def reload(self, force: bool = False) -> List[str]:
+        """Load the resident tables whose file changed since the last load"""
+        loaded = []
+        with self.lock:
+            for name, (path, has_game_id) in RESIDENT.items():
+                if not path.exists():
+                    continue
+                mtime = path.stat().st_mtime_ns
+                if not force and self.versions.get(name) == mtime:
+                    continue
+                start = time.time()
+                types = ", types = {'game_id': 'VARCHAR'}" if has_game_id else ""
+                self.conn.execute(f"CREATE OR REPLACE TABLE {name} AS SELECT * FROM read_csv("
+                                  f"{self._quote(path)}, header = true{types})")
+                self.versions[name] = mtime
+                loaded.append(name)
+                print(f"  {name}: {self.rows(name):,} rows ({time.time() - start:.1f}s)")
+        return loaded
+
+    def rows(self, name: str) -> int:
+        return self.conn.cursor().execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+
+    def handle(self, request: Dict) -> Tuple[Dict, Optional[pa.RecordBatchReader]]:
+        """Header and result stream for one request"""
+        op = request.get("op")
+        if op == "sql":
+            # a cursor per request: the connection itself is not safe to share between threads
+            reader = self.conn.cursor().execute(request["sql"], request.get("params") or []).fetch_record_batch()
+            return {"status": "ok"}, reader
+        if op == "aggregate":
+            from aggregate_cache import get
+            df = get(request["name"], **request.get("params", {}))
+            return {"status": "ok"}, pa.Table.from_pandas(df, preserve_index=False).to_reader()
+        if op == "ping":
+            return {"status": "ok", "uptime": round(time.time() - self.started, 1), "views": self.views,
+                    "tables": {name: self.rows(name) for name in self.versions}}, None
+        if op == "reload":
+            return {"status": "ok", "reloaded": self.reload(force=True)}, None
+        raise ValueError(f"Unknown op {op!r}")
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        reader = None
+        stop = False
+        try:
+            request = json.loads(self.rfile.readline())
+            if request.get("op") == "stop":
+                header, stop = {"status": "ok"}, True
+            else:
+                header, reader = self.server.store.handle(request)
+        except Exception as e:
+            header = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+        payload = json.dumps(header).encode()
+        self.wfile.write(HEADER.pack(len(payload)) + payload)
+        if stop:
+            # the reply is out before shutting down: handler threads are daemons and die with the process
+            self.wfile.flush()
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        if reader is not None:
+            with pa.ipc.new_stream(self.wfile, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: Path, store: WarmStore):
+        self.store = store
+        super().__init__(str(path), Handler)
+
+
+def _reload_loop(store: WarmStore, interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            store.reload()
+        except Exception as e:
+            print(f"Reload failed: {e}")
+
+
+def serve(path: Path = DAEMON_SOCKET, threads: Optional[int] = None, interval: float = RELOAD_SECONDS):
+    path = Path(path)
+    if path.exists():
+        try:
+            ping(path)
+            raise SystemExit(f"A daemon is already listening on {path}")
+        except (ConnectionRefusedError, FileNotFoundError):
+            path.unlink()  # left behind by a daemon that did not shut down cleanly
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    start = time.time()
+    store = WarmStore(threads)
+    server = Server(path, store)
+    os.chmod(path, 0o600)
+    threading.Thread(target=_reload_loop, args=(store, interval), daemon=True).start()
+    print(f"Ready in {time.time() - start:.1f}s; listening on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+
+
+# =========================
+# CLIENT
+# =========================
+def request(payload: Dict, path: Path = DAEMON_SOCKET) -> Tuple[Dict, Optional[pa.Table]]:
+    """Send one request; returns the header and the result table (if any)"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(path))
+        sock.sendall(json.dumps(payload).encode() + b"\n")
+        chunks = []
+        while True:
+            chunk = sock.recv(1 << 20)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    data = memoryview(b"".join(chunks))
+    if len(data) < HEADER.size or len(data) < HEADER.size + HEADER.unpack_from(data)[0]:
+        raise ConnectionError(f"The daemon on {path} closed the connection without a complete response "
+                              f"({len(data)} bytes)")
+    size = HEADER.unpack_from(data)[0]
+    header = json.loads(bytes(data[HEADER.size:HEADER.size + size]))
+    if header.get("status") != "ok":
+        raise RuntimeError(header.get("error", "daemon error"))
+    body = data[HEADER.size + size:]
+    # the table's buffers point into the received bytes
+    table = pa.ipc.open_stream(pa.py_buffer(body)).read_all() if len(body) else None
+    return header, table
+
+
+def query(sql: str, params: Optional[List] = None, path: Path = DAEMON_SOCKET) -> pa.Table:
+    return request({"op": "sql", "sql": sql, "params": params or []}, path)[1]
+
+
+def aggregate(name: str, path: Path = DAEMON_SOCKET, **params) -> pa.Table:
+    return request({"op": "aggregate", "name": name, "params": params}, path)[1]
+
+
+def ping(path: Path = DAEMON_SOCKET) -> Dict:
+    return request({"op": "ping"}, path)[0]
+
+
+# =========================
+# CLI
+# =========================
+def main():
+    parser = argparse.ArgumentParser(description="Keep the unified tables and ratings warm behind a Unix socket")
+    parser.add_argument("command", choices=["serve", "query", "ping", "reload", "stop"])
+    parser.add_argument("sql", nargs="?", help="statement for query")
+    parser.add_argument("--socket", type=Path, default=DAEMON_SOCKET)
+    parser.add_argument("--threads", type=int, help="DuckDB threads (serve)")
+    parser.add_argument("--out", help="write the query result to CSV")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.socket, args.threads)
+        return
+
+    start = time.time()
+    try:
+        header, table = request({"op": "sql", "sql": args.sql} if args.command == "query" else {"op": args.command},
+                                args.socket)
+    except (ConnectionRefusedError, FileNotFoundError):
+        raise SystemExit(f"No daemon listening on {args.socket}; start one with: python daemon.py serve")
+    except RuntimeError as e:
+        raise SystemExit(f"Error: {e}")
+
+    if args.command == "query":
+        elapsed = time.time() - start
+        if args.out:
+            import pyarrow.csv
+            pyarrow.csv.write_csv(table, args.out)
+            print(f"{table.num_rows:,} rows -> {args.out}")
+        else:
+            print(table.slice(0, 100).to_pandas().to_string(index=False) if table.num_rows else "(no rows)")
+        print(f"{table.num_rows:,} rows in {elapsed * 1000:.0f} ms")
+    else:
+        print(json.dumps(header, indent=1))
+        print(f"{(time.time() - start) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
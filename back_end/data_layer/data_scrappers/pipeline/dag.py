@@ -0,0 +1,364 @@
+"""
+PIPELINE DAG RUNNER
+Runs scrape -> compact -> rate -> publish in dependency order instead of by
+hand. Every stage declares the files it reads, the files it writes and its
+code; a stage is skipped when the hash of its inputs and code matches its last
+successful run and its outputs still exist. Independent stages run
+concurrently: the NBA and FBref branches only meet at the lake.
+
+    scrape_boxscores, scrape_quarters   nba_scapper.py, scrape_quarters_and_advanced.py   (--scrape)
+    scrape_fbref                        premier_scapper.py                                (--scrape)
+    rosters                             team_data/roster_to_csv.py
+    compact -> elo -> features          unified tables, incremental ratings (elo_incremental.py), feature store
+    player_matrix, percentiles, team_cube
+    lake -> aggregates                  Parquet lake, cached aggregates
+
+Scrapers read the web, so no file hash can tell whether they have work to do;
+they only run with --scrape, and then always run.
+
+File hashes are cached by (size, mtime), so a run where nothing changed stats
+the tree and hashes nothing. Each run, its per-stage status and duration go to
+DAG_DIR/runs.sqlite and each stage's output to DAG_DIR/logs/<run>/<stage>.log.
+With --profile the stages record profiler.py spans and the run ends with a
+report in PROFILE_DIR/<run>/report.html.
+
+Usage:
+    python dag.py                      # run what changed
+    python dag.py --scrape             # scrape first (nightly)
+    python dag.py --dry-run            # show what would run and why
+    python dag.py --only compact elo --force
+    python dag.py --scrape --profile   # where the time went
+    python dag.py --log                # recent runs
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from config import (BOXSCORE_DIR, DAG_DIR, ELO_HISTORY_DIR, ELO_OUTPUT_DIR, FBREF_DIR, FEATURE_STORE_DIR,
+                    LAKE_DIR, MATRIX_DIR, NBA_DIR, PERCENTILE_DIR, PROFILE_DIR, SEASON_BOX_DIRS, TEAM_CUBE_DIR,
+                    TEAM_DATA_DIR, TEAM_STATS_GLOB, UNIFIED_DIR)
+from loaders import GAME_TABLES
+from zstd_codec import SUFFIX
+
+# =========================
+# CONFIGURATION
+# =========================
+PIPELINE_DIR = Path(__file__).resolve().parent
+SCRAPERS_DIR = PIPELINE_DIR.parent / "scrappers"
+RUNS_DB = DAG_DIR / "runs.sqlite"
+LOG_DIR = DAG_DIR / "logs"
+JOBS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha1 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stage_state (
+    stage TEXT PRIMARY KEY,
+    input_key TEXT NOT NULL,
+    finished_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    seconds REAL,
+    status TEXT
+);
+CREATE TABLE IF NOT EXISTS stage_runs (
+    run_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    reason TEXT,
+    seconds REAL,
+    input_key TEXT,
+    PRIMARY KEY (run_id, stage)
+);
+"""
+
+IGNORED_SUFFIXES = (":Zone.Identifier", ".tmp", ".part")
+SHARED_CODE = [PIPELINE_DIR / "config.py", PIPELINE_DIR / "loaders.py", PIPELINE_DIR / "segments.py",
+               PIPELINE_DIR / "zstd_codec.py"]
+
+# (root, glob) file sets; a glob also matches the file's compressed copy
+BOX_SCORE_FILES = [(BOXSCORE_DIR, f"{table}_*.csv") for table in GAME_TABLES]
+SEASON_BOX_FILES = [(d, pattern) for d in SEASON_BOX_DIRS for pattern in ("tables/*/*.csv", "segments/*/*.csv")]
+TEAM_STATS_FILES = [(NBA_DIR, f"{TEAM_STATS_GLOB}/*/*.csv")]
+FBREF_FILES = [(FBREF_DIR, "*.csv")]
+
+
+class Stage:
+    """A command with the files it reads and writes"""
+
+    def __init__(self, name: str, command: Sequence, inputs: Sequence[Tuple[Path, str]] = (),
+                 outputs: Sequence[Path] = (), depends_on: Sequence[str] = (), code: Sequence[Path] = (),
+                 cwd: Path = PIPELINE_DIR, external: bool = False):
+        self.name = name
+        self.command = [sys.executable] + [str(c) for c in command]
+        self.inputs = list(inputs)
+        self.outputs = [Path(p) for p in outputs]
+        self.depends_on = list(depends_on)
+        self.cwd = Path(cwd)
+        self.external = external
+        script = Path(command[0])
+        self.code = [script if script.is_absolute() else self.cwd / script] + list(code)
+
+
+def _pipeline(script: str, *args, code: Sequence[str] = (), **kwargs) -> Dict:
+    return dict(command=[script, *args], code=SHARED_CODE + [PIPELINE_DIR / c for c in code], **kwargs)
+
+
+STAGES = {stage.name: stage for stage in [
+    # ----- scrape -----
+    Stage("scrape_boxscores", [SCRAPERS_DIR / "nba_scapper.py"], cwd=SCRAPERS_DIR, external=True),
+    Stage("scrape_quarters", [SCRAPERS_DIR / "scrape_quarters_and_advanced.py"], cwd=SCRAPERS_DIR, external=True),
+    Stage("scrape_fbref", [SCRAPERS_DIR / "premier_scapper.py"], cwd=SCRAPERS_DIR, external=True),
+    Stage("rosters", [TEAM_DATA_DIR / "roster_to_csv.py"], cwd=TEAM_DATA_DIR,
+          outputs=[TEAM_DATA_DIR / "PHX_roster_2022.csv"]),
+    # ----- compact / rate -----
+    Stage("compact", **_pipeline("compact.py", code=["schemas.py"], inputs=BOX_SCORE_FILES + SEASON_BOX_FILES,
+                                 outputs=[UNIFIED_DIR / "manifest.csv"],
+                                 depends_on=["scrape_boxscores", "scrape_quarters"])),
+    Stage("elo", **_pipeline("elo_incremental.py", inputs=[(UNIFIED_DIR, "*.csv")],
+                             outputs=[ELO_OUTPUT_DIR / "results" / "team_elo_final.csv"], depends_on=["compact"])),
+    Stage("features", **_pipeline("feature_store.py", inputs=BOX_SCORE_FILES[:2] + [(ELO_HISTORY_DIR, "*.csv")],
+                                  outputs=[FEATURE_STORE_DIR], depends_on=["elo"])),
+    Stage("player_matrix", **_pipeline("player_matrix.py", inputs=BOX_SCORE_FILES + SEASON_BOX_FILES,
+                                       outputs=[MATRIX_DIR], depends_on=["scrape_boxscores", "scrape_quarters"])),
+    Stage("percentiles", **_pipeline("percentiles.py", inputs=BOX_SCORE_FILES + TEAM_STATS_FILES,
+                                     outputs=[PERCENTILE_DIR], depends_on=["scrape_quarters"])),
+    Stage("team_cube", **_pipeline("team_cube.py", inputs=TEAM_STATS_FILES, outputs=[TEAM_CUBE_DIR])),
+    # ----- publish -----
+    Stage("lake", **_pipeline("lake.py", code=["compact.py", "schemas.py"],
+                              inputs=BOX_SCORE_FILES + SEASON_BOX_FILES + TEAM_STATS_FILES + FBREF_FILES,
+                              outputs=[LAKE_DIR / "manifest.json"],
+                              depends_on=["scrape_boxscores", "scrape_quarters", "scrape_fbref"])),
+    Stage("aggregates", **_pipeline("aggregate_cache.py", "--refresh", inputs=[(LAKE_DIR, "manifest.json")],
+                                    depends_on=["lake"])),
+]}
+
+
+# =========================
+# HASHING
+# =========================
+def connect(db_path: Path = RUNS_DB) -> sqlite3.Connection:
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class Hasher:
+    """Content hashes of file sets, re-hashing only files whose size or mtime changed"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.known = {p: (s, m, h) for p, s, m, h in conn.execute("SELECT * FROM file_hashes")}
+        self.digests: Dict[Tuple[Path, str], str] = {}
+
+    def file(self, path: Path) -> str:
+        st = path.stat()
+        known = self.known.get(str(path))
+        if known and known[:2] == (st.st_size, st.st_mtime_ns):
+            return known[2]
+        sha1 = hashlib.sha1(path.read_bytes()).hexdigest()
+        self.known[str(path)] = (st.st_size, st.st_mtime_ns, sha1)
+        self.conn.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)",
+                          (str(path), st.st_size, st.st_mtime_ns, sha1))
+        return sha1
+
+    def files(self, root: Path, pattern: str) -> str:
+        """Digest of every file matching root/pattern (plain or compressed), memoized per run"""
+        if (root, pattern) not in self.digests:
+            digest = hashlib.sha1()
+            paths = sorted(set(root.glob(pattern)) | set(root.glob(pattern + SUFFIX)))
+            for path in paths:
+                if path.name.endswith(IGNORED_SUFFIXES) or not path.is_file():
+                    continue
+                digest.update(f"{path.relative_to(root)}\0{self.file(path)}\n".encode())
+            self.conn.commit()
+            self.digests[(root, pattern)] = digest.hexdigest()
+        return self.digests[(root, pattern)]
+
+    def stage_key(self, stage: Stage) -> str:
+        digest = hashlib.sha1(" ".join(stage.command[1:]).encode())
+        for path in stage.code:
+            digest.update(f"code {path.name} {self.file(path) if path.exists() else '-'}\n".encode())
+        for root, pattern in stage.inputs:
+            digest.update(f"input {root}/{pattern} {self.files(root, pattern)}\n".encode())
+        return digest.hexdigest()
+
+
+# =========================
+# RUNNER
+# =========================
+def _missing_outputs(stage: Stage) -> List[Path]:
+    return [p for p in stage.outputs if not p.exists()]
+
+
+def select(only: Optional[Iterable[str]] = None, scrape: bool = False) -> List[str]:
+    """Stages to consider, in declaration order"""
+    if only:
+        unknown = set(only) - set(STAGES)
+        if unknown:
+            raise SystemExit(f"Unknown stage(s): {', '.join(sorted(unknown))}; choose from {', '.join(STAGES)}")
+        return [name for name in STAGES if name in set(only)]
+    return [name for name, stage in STAGES.items() if scrape or not stage.external]
+
+
+def _execute(stage: Stage, log_path: Path, env: Dict[str, str]) -> Tuple[bool, float]:
+    start = time.time()
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "w") as log:
+        result = subprocess.run(stage.command, cwd=stage.cwd, stdout=log, stderr=subprocess.STDOUT,
+                                env=env)
+    return result.returncode == 0, time.time() - start
+
+
+def run(names: List[str], force: bool = False, dry_run: bool = False, jobs: int = JOBS,
+        profile: bool = False) -> pd.DataFrame:
+    """Run the selected stages as their dependencies finish; returns one row per stage"""
+    conn = connect()
+    hasher = Hasher(conn)
+    state = {s: k for s, k in conn.execute("SELECT stage, input_key FROM stage_state")}
+    run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+    started = time.time()
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    if profile:
+        env.update(FORESIGHT_PROFILE="1", FORESIGHT_PROFILE_DIR=str(PROFILE_DIR / run_id))
+    if not dry_run:
+        conn.execute("INSERT OR REPLACE INTO runs (run_id, started_at) VALUES (?, ?)",
+                     (run_id, datetime.now().isoformat(timespec="seconds")))
+        conn.commit()
+
+    pending = list(names)
+    status: Dict[str, str] = {}
+    rows = []
+    running: Dict[concurrent.futures.Future, Tuple[str, str, str]] = {}
+
+    def record(name: str, result: str, reason: str, seconds: float = 0.0, key: Optional[str] = None):
+        status[name] = result
+        rows.append({"stage": name, "status": result, "reason": reason, "seconds": round(seconds, 2)})
+        print(f"  {name:<17} {result:<8} {reason}" + (f" ({seconds:.1f}s)" if seconds else ""))
+        if not dry_run:
+            conn.execute("INSERT OR REPLACE INTO stage_runs VALUES (?, ?, ?, ?, ?, ?)",
+                         (run_id, name, result, reason, seconds, key))
+            conn.commit()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name in list(pending):
+                stage = STAGES[name]
+                deps = [d for d in stage.depends_on if d in names]
+                if any(status.get(d) in ("failed", "blocked") for d in deps):
+                    pending.remove(name)
+                    record(name, "blocked", "upstream stage failed")
+                    continue
+                if not all(d in status for d in deps):
+                    continue
+                pending.remove(name)
+
+                # hashed only now: upstream stages of this run may have rewritten the inputs
+                key = hasher.stage_key(stage)
+                missing = _missing_outputs(stage)
+                if stage.external:
+                    reason = "scraper"
+                elif force:
+                    reason = "forced"
+                elif name not in state:
+                    reason = "never ran"
+                elif missing:
+                    reason = f"missing {missing[0].name}"
+                elif state[name] != key:
+                    reason = "inputs or code changed"
+                else:
+                    record(name, "skipped", "unchanged", key=key)
+                    continue
+                if dry_run:
+                    record(name, "would run", reason, key=key)
+                    continue
+                print(f"  {name:<17} started  {reason}")
+                future = pool.submit(_execute, stage, LOG_DIR / run_id / f"{name}.log", env)
+                running[future] = (name, reason, key)
+
+            if not running:
+                if pending:  # dependencies outside the selection that never resolve
+                    for name in pending:
+                        record(name, "blocked", "unresolved dependency")
+                    pending = []
+                continue
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                name, reason, key = running.pop(future)
+                ok, seconds = future.result()
+                if ok and not STAGES[name].external:
+                    # the key hashed before the run: inputs changed while it ran are picked up next time
+                    conn.execute("INSERT OR REPLACE INTO stage_state VALUES (?, ?, ?)",
+                                 (name, key, datetime.now().isoformat(timespec="seconds")))
+                record(name, "ran" if ok else "failed",
+                       reason if ok else f"exit status != 0, see {LOG_DIR / run_id / (name + '.log')}", seconds, key)
+
+    elapsed = time.time() - started
+    if not dry_run:
+        overall = "failed" if any(s in ("failed", "blocked") for s in status.values()) else "ok"
+        conn.execute("UPDATE runs SET seconds = ?, status = ? WHERE run_id = ?", (elapsed, overall, run_id))
+        conn.commit()
+    conn.close()
+    print(f"Done in {elapsed:.1f}s")
+    if profile and not dry_run:
+        from profiler import write_report
+        report = write_report(PROFILE_DIR / run_id)
+        if report:
+            print(f"Profile -> {report}")
+    return pd.DataFrame(rows)
+
+
+def history(limit: int = 10) -> pd.DataFrame:
+    conn = connect()
+    df = pd.read_sql_query(
+        "SELECT r.run_id, r.status, ROUND(r.seconds, 1) AS seconds, "
+        "SUM(s.status = 'ran') AS ran, SUM(s.status = 'skipped') AS skipped, "
+        "SUM(s.status IN ('failed', 'blocked')) AS failed, "
+        "GROUP_CONCAT(CASE WHEN s.status = 'ran' THEN s.stage || ' ' || ROUND(s.seconds, 1) || 's' END, ', ') "
+        "AS stages_run "
+        "FROM runs r LEFT JOIN stage_runs s ON s.run_id = r.run_id "
+        "GROUP BY r.run_id ORDER BY r.run_id DESC LIMIT ?", conn, params=(limit,))
+    conn.close()
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the pipeline stages whose inputs or code changed")
+    parser.add_argument("--scrape", action="store_true", help="run the scrapers first")
+    parser.add_argument("--only", nargs="+", metavar="STAGE", help="run only these stages")
+    parser.add_argument("--force", action="store_true", help="run the selected stages even if unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="show what would run and why")
+    parser.add_argument("--jobs", type=int, default=JOBS, help="stages run at the same time")
+    parser.add_argument("--profile", action="store_true", help="profile the stages and write a report")
+    parser.add_argument("--log", action="store_true", help="show recent runs")
+    args = parser.parse_args()
+
+    if args.log:
+        with pd.option_context("display.max_colwidth", 120, "display.width", 200):
+            print(history().to_string(index=False))
+        return
+    run(select(args.only, args.scrape), force=args.force, dry_run=args.dry_run, jobs=args.jobs,
+        profile=args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+SURROGATE-KEY DIMENSIONS
+Stable int32 keys for players, teams and games, so joins and groupbys run on
+integers instead of (game_id, player, team) strings, 40-char sha1 player_uids
+(nba_scapper.py) or 12-char md5 ids (premier_scapper.py).
+
+    players       player_sk <- canonical entity id from entity_resolution.py
+    teams         team_sk   <- (sport, team code)
+    games         game_sk   <- (sport, game id)
+    natural_keys  (dimension, source, natural key) -> surrogate, i.e. every
+                  spelling/code/uid a source uses for the same player or team
+
+Keys are assigned once and never reused, so outputs written with them stay
+valid. Missing or unresolvable values get -1, as in player_matrix.py.
+
+Loaders take with_keys=True to append player_sk/team_sk/opponent_sk/game_sk
+columns (loaders.read_game_table, schemas.load_box_tables, lake.read).
+
+Usage:
+    python dimensions.py --build                 # register every known source
+    python dimensions.py --lookup team BKN BRK brooklynnets
+"""
+
+import argparse
+import sqlite3
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import DIMENSIONS_DB, FBREF_DIR, ROSTERS_DIR
+from entity_resolution import EntityResolver
+from loaders import (FBREF_FILE_PATTERN, NON_PLAYER_ROWS, canonical_team, csv_files, espn_team_code,
+                     list_game_files, read_csv, read_csvs, team_stat_files)
+
+# =========================
+# CONFIGURATION
+# =========================
+MISSING = -1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    player_sk INTEGER PRIMARY KEY,
+    sport TEXT NOT NULL,
+    entity_id TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS teams (
+    team_sk INTEGER PRIMARY KEY,
+    sport TEXT NOT NULL,
+    code TEXT NOT NULL,
+    UNIQUE (sport, code)
+);
+CREATE TABLE IF NOT EXISTS games (
+    game_sk INTEGER PRIMARY KEY,
+    sport TEXT NOT NULL,
+    game_id TEXT NOT NULL,
+    game_date TEXT,
+    UNIQUE (sport, game_id)
+);
+CREATE TABLE IF NOT EXISTS natural_keys (
+    dimension TEXT NOT NULL,
+    source TEXT NOT NULL,
+    natural_key TEXT NOT NULL,
+    surrogate INTEGER NOT NULL,
+    PRIMARY KEY (dimension, source, natural_key)
+);
+CREATE INDEX IF NOT EXISTS idx_natural_keys_surrogate ON natural_keys (dimension, surrogate);
+"""
+
+# dimension -> (table, surrogate column, natural column)
+TABLES = {
+    "player": ("players", "player_sk", "entity_id"),
+    "team": ("teams", "team_sk", "code"),
+    "game": ("games", "game_sk", "game_id"),
+}
+
+
+# =========================
+# DIMENSIONS
+# =========================
+class Dimensions:
+    """Assigns and looks up surrogate keys; one instance per process is enough"""
+
+    def __init__(self, db_path: Path = DIMENSIONS_DB):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._keys: Dict[tuple, Dict[str, int]] = {}
+        self._resolvers: Dict[str, EntityResolver] = {}
+
+    def _mapping(self, dimension: str, sport: str) -> Dict[str, int]:
+        if (dimension, sport) not in self._keys:
+            table, sk, natural = TABLES[dimension]
+            self._keys[(dimension, sport)] = dict(self.conn.execute(
+                f"SELECT {natural}, {sk} FROM {table} WHERE sport = ?", (sport,)))
+        return self._keys[(dimension, sport)]
+
+    def _assign(self, dimension: str, sport: str, values: Iterable[str]) -> Dict[str, int]:
+        """Surrogates for natural values, inserting the ones not seen before"""
+        mapping = self._mapping(dimension, sport)
+        new = [v for v in dict.fromkeys(values) if v not in mapping]
+        if new:
+            table, _, natural = TABLES[dimension]
+            if dimension == "game":
+                rows = [(sport, g, f"{g[:4]}-{g[4:6]}-{g[6:8]}" if g[:8].isdigit() else None) for g in new]
+                self.conn.executemany("INSERT OR IGNORE INTO games (sport, game_id, game_date) VALUES (?, ?, ?)", rows)
+            else:
+                self.conn.executemany(f"INSERT OR IGNORE INTO {table} (sport, {natural}) VALUES (?, ?)",
+                                      [(sport, v) for v in new])
+            self.conn.commit()
+            del self._keys[(dimension, sport)]
+            mapping = self._mapping(dimension, sport)
+        return mapping
+
+    def register(self, dimension: str, source: str, natural_keys: Iterable[str], surrogates: Iterable[int]):
+        """Record which natural key a source uses for each surrogate"""
+        rows = {(dimension, source, str(k), int(s)) for k, s in zip(natural_keys, surrogates)
+                if isinstance(k, str) and k and s != MISSING}
+        if rows:
+            self.conn.executemany("INSERT OR REPLACE INTO natural_keys VALUES (?, ?, ?, ?)", sorted(rows))
+            self.conn.commit()
+
+    def lookup(self, dimension: str, natural_keys: Iterable[str], source: Optional[str] = None) -> List[int]:
+        """Surrogates for natural keys recorded by any (or one) source; MISSING if unknown"""
+        sql = "SELECT natural_key, surrogate FROM natural_keys WHERE dimension = ?"
+        params = [dimension]
+        if source is not None:
+            sql += " AND source = ?"
+            params.append(source)
+        known = dict(self.conn.execute(sql, params))
+        return [known.get(str(k), MISSING) for k in natural_keys]
+
+    # ----- per dimension -----
+    def _codes(self, values: pd.Series, dimension: str, sport: str, source: str, natural) -> pd.Series:
+        """Vectorized surrogate column: unique values are resolved once"""
+        uniques = pd.Series(values.dropna().astype(str).unique())
+        canonical = [natural(v) for v in uniques]
+        mapping = self._assign(dimension, sport, [c for c in canonical if c])
+        keys = [mapping.get(c, MISSING) if c else MISSING for c in canonical]
+        self.register(dimension, source, uniques, keys)
+        lookup = dict(zip(uniques, keys))
+        return values.astype("string").map(lookup).fillna(MISSING).astype(np.int32)
+
+    def player_keys(self, names: pd.Series, source: str, sport: str = "nba", fuzzy: bool = False) -> pd.Series:
+        """player_sk per raw name; fuzzy=False keeps authoritative spellings separate"""
+        if sport not in self._resolvers:
+            self._resolvers[sport] = EntityResolver(sport)
+        resolver = self._resolvers[sport]
+        names = names.where(~names.isin(NON_PLAYER_ROWS))
+        uniques = names.dropna().astype(str).unique()
+        entities = dict(zip(uniques, resolver.resolve(uniques, source=source, fuzzy=fuzzy)))
+        return self._codes(names, "player", sport, source, lambda n: entities.get(n))
+
+    def team_keys(self, codes: pd.Series, source: str, sport: str = "nba") -> pd.Series:
+        natural = canonical_team if sport == "nba" else (lambda c: str(c).strip().lower())
+        return self._codes(codes, "team", sport, source, natural)
+
+    def game_keys(self, game_ids: pd.Series, source: str, sport: str = "nba") -> pd.Series:
+        return self._codes(game_ids, "game", sport, source, lambda g: str(g).strip())
+
+    def add_keys(self, df: pd.DataFrame, source: str, sport: str = "nba", player: str = "player",
+                 team: str = "team", opponent: str = "opponent", game: str = "game_id") -> pd.DataFrame:
+        """Append int32 *_sk columns for whichever of the key columns df has"""
+        if player in df.columns:
+            df["player_sk"] = self.player_keys(df[player], source, sport)
+        if team in df.columns:
+            df["team_sk"] = self.team_keys(df[team], source, sport)
+        if opponent in df.columns:
+            df["opponent_sk"] = self.team_keys(df[opponent], source, sport)
+        if game in df.columns:
+            df["game_sk"] = self.game_keys(df[game], source, sport)
+        return df
+
+    def sizes(self) -> pd.DataFrame:
+        return pd.read_sql_query(
+            "SELECT 'player' AS dimension, sport, COUNT(*) AS keys FROM players GROUP BY sport "
+            "UNION ALL SELECT 'team', sport, COUNT(*) FROM teams GROUP BY sport "
+            "UNION ALL SELECT 'game', sport, COUNT(*) FROM games GROUP BY sport", self.conn)
+
+    def close(self):
+        for resolver in self._resolvers.values():
+            resolver.close()
+        self.conn.close()
+
+
+_shared: Optional[Dimensions] = None
+
+
+def add_keys(df: pd.DataFrame, source: str, sport: str = "nba", **columns) -> pd.DataFrame:
+    """Module-level add_keys on a shared Dimensions instance (what loaders call)"""
+    global _shared
+    if _shared is None:
+        _shared = Dimensions()
+    return _shared.add_keys(df, source, sport, **columns)
+
+
+# =========================
+# BUILD
+# =========================
+def build():
+    """Register the natural keys of every scraped source"""
+    from schemas import load_box_tables
+
+    start = time.time()
+    dims = Dimensions()
+
+    basic = read_csvs(list_game_files("team_basic").values(), usecols=["game_id", "team", "player"])
+    dims.add_keys(basic, "bbref_boxscores")
+    print(f"  bbref_boxscores: {len(basic):,} rows")
+
+    season = load_box_tables("game-basic", players_only=True)
+    if not season.empty:
+        season = season[["game_id", "team", "opponent", "player", "player_uid"]].astype("string")
+        dims.add_keys(season, "bbref_2025_26")
+        # nba_scapper.py's sha1(player_team_season) uid as a natural key of the same player
+        dims.register("player", "nba_scapper_uid", season["player_uid"], season["player_sk"])
+        print(f"  bbref_2025_26: {len(season):,} rows")
+
+    stats = pd.concat([read_csv(p, usecols=["Player"]).assign(team=team)
+                       for _, team, p in team_stat_files("per_game_stats")], ignore_index=True)
+    stats = stats[~stats["Player"].str.contains("Team Total", na=False)]
+    dims.add_keys(stats.rename(columns={"Player": "player"}), "bbref_team_stats")
+    print(f"  bbref_team_stats: {len(stats):,} rows")
+
+    espn = defaultdict(list)
+    for path in csv_files(ROSTERS_DIR, "*/roster_images.csv"):
+        espn["folder"].append(path.parent.name)
+        espn["team"].append(espn_team_code(path.parent.name))
+    if espn:
+        keys = dims.team_keys(pd.Series(espn["team"]), "bbref")
+        dims.register("team", "espn_folder", espn["folder"], keys)
+        print(f"  espn_rosters: {len(espn['folder'])} team folders")
+
+    slugs = sorted({m.group("team") for m in map(FBREF_FILE_PATTERN.match, (p.name for p in csv_files(FBREF_DIR, "*.csv")))
+                    if m and m.group("table") != "league_stats"})
+    if slugs:
+        dims.team_keys(pd.Series(slugs), "fbref_file", sport="soccer")
+        print(f"  fbref: {len(slugs)} teams")
+
+    print(dims.sizes().to_string(index=False))
+    dims.close()
+    print(f"Done in {time.time() - start:.1f}s -> {DIMENSIONS_DB}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Integer surrogate keys for players, teams and games")
+    parser.add_argument("--build", action="store_true", help="register every known source")
+    parser.add_argument("--lookup", nargs="+", metavar=("DIMENSION", "KEY"),
+                        help="surrogates for natural keys, e.g. --lookup team BKN BRK")
+    args = parser.parse_args()
+
+    if args.build:
+        build()
+    if args.lookup:
+        dimension, keys = args.lookup[0], args.lookup[1:]
+        dims = Dimensions()
+        for key, sk in zip(keys, dims.lookup(dimension, keys)):
+            print(f"  {dimension} {key!r} -> {sk}")
+        dims.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+INCREMENTAL ELO
+run_elo.py's team and player Elo, applied game by game on top of a saved
+rating state instead of replaying every season on each run.
+
+The state (current ratings, current season and the rated game ids) lives in
+elo_output/state/elo_state.json. A run rates only the unified games that are
+not rated yet, appends their rows to the history CSVs and rewrites the result
+tables run_elo.py writes. Games are rated in run_elo.py's order (sorted
+game_id); if a new game sorts before the last rated one, the whole history is
+replayed so the result matches a full run.
+
+The constants and update rules mirror run_elo.py; keep the two in sync.
+
+Usage:
+    python elo_incremental.py            # rate new games
+    python elo_incremental.py --rebuild  # replay every game
+"""
+
+import argparse
+import json
+import math
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import ELO_HISTORY_DIR, ELO_OUTPUT_DIR, UNIFIED_DIR
+from loaders import normalize_name, season_from_game_id
+from profiler import timed
+
+# =========================
+# CONFIGURATION (from run_elo.py)
+# =========================
+STATE_FILE = ELO_OUTPUT_DIR / "state" / "elo_state.json"
+RESULTS_DIR = ELO_OUTPUT_DIR / "results"
+TEAM_HISTORY_FILE = ELO_HISTORY_DIR / "team_elo_history.csv"
+PLAYER_HISTORY_FILE = ELO_HISTORY_DIR / "player_elo_history.csv"
+
+NBA_TEAM_PRIORS = {
+    'BOS': 1600, 'DEN': 1600, 'OKC': 1580, 'MIN': 1580, 'MIL': 1590,
+    'PHI': 1580, 'LAC': 1570, 'NYK': 1570, 'DAL': 1570, 'PHO': 1560,
+    'CLE': 1550, 'ORL': 1540, 'IND': 1540, 'LAL': 1530, 'GSW': 1520,
+    'SAC': 1520, 'MIA': 1520, 'NOP': 1510, 'ATL': 1500, 'CHI': 1500,
+    'SAS': 1510, 'HOU': 1490, 'MEM': 1490, 'UTA': 1480, 'BRK': 1480,
+    'TOR': 1470, 'POR': 1460, 'CHO': 1450, 'DET': 1440, 'WAS': 1430
+}
+SUPERSTAR_PRIORS = {
+    'Nikola Jokic': 1850, 'Giannis Antetokounmpo': 1820, 'Luka Doncic': 1820,
+    'Jayson Tatum': 1780, 'Shai Gilgeous-Alexander': 1800, 'Joel Embiid': 1780,
+    'Anthony Edwards': 1760, 'Stephen Curry': 1750, 'Kevin Durant': 1750,
+    'LeBron James': 1730, 'Devin Booker': 1720, 'Kawhi Leonard': 1720,
+    'Damian Lillard': 1710, 'Donovan Mitchell': 1710, 'Anthony Davis': 1720,
+    'Victor Wembanyama': 1750,
+    'Ja Morant': 1700, 'Zion Williamson': 1670, 'Paolo Banchero': 1680,
+    'Chet Holmgren': 1680, 'Jaren Jackson Jr.': 1670, 'Jaylen Brown': 1680,
+    'Bam Adebayo': 1660, 'Domantas Sabonis': 1660, 'DeAaron Fox': 1660,
+    'Kyrie Irving': 1700, 'James Harden': 1690, 'Karl-Anthony Towns': 1680,
+    'Trae Young': 1690, 'Jalen Brunson': 1690, 'Tyrese Haliburton': 1720,
+}
+
+INITIAL_TEAM_ELO = 1500
+INITIAL_PLAYER_ELO = 1500
+SEASON_REGRESSION = 0.75
+HOME_ADVANTAGE = 100
+TEAM_K = 16
+PLAYER_K = 10
+MIN_MINUTES = 10
+
+FOUR_FACTOR_COLUMNS = {'eFG%': 'efg_pct', 'TOV%': 'tov_pct', 'ORB%': 'orb_pct', 'FT/FGA': 'ft_rate', 'pace': 'pace'}
+
+
+# =========================
+# STATE
+# =========================
+class EloState:
+    def __init__(self, team: Dict[str, float] = None, player: Dict[str, float] = None,
+                 season: Optional[int] = None, games: List[str] = None):
+        self.team = team or {}
+        self.player = player or {}
+        self.season = season
+        self.games = set(games or [])
+
+    @classmethod
+    def load(cls, path: Path = STATE_FILE) -> "EloState":
+        if not path.exists():
+            return cls()
+        return cls(**json.loads(path.read_text()))
+
+    def save(self, path: Path = STATE_FILE):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps({"team": self.team, "player": self.player, "season": self.season,
+                                   "games": sorted(self.games)}))
+        tmp.replace(path)
+
+
+# =========================
+# INPUTS
+# =========================
+def parse_minutes(m) -> float:
+    if isinstance(m, str) and ":" in m:
+        mm, ss = m.split(":")
+        return float(mm) + float(ss) / 60
+    return float(m)
+
+
+@timed("parse")
+def load_inputs(game_ids: Optional[set] = None) -> Tuple[pd.DataFrame, Dict, Dict]:
+    """Player rows, team points and four-factor rows of the unified tables (optionally only some games)"""
+    basic = pd.read_csv(UNIFIED_DIR / "basic_boxscore.csv", dtype={"game_id": str},
+                        usecols=["game_id", "team", "home_team", "away_team", "player", "mp", "pts", "plus_minus"])
+    advanced = pd.read_csv(UNIFIED_DIR / "advanced_boxscore.csv", dtype={"game_id": str},
+                           usecols=["game_id", "team", "player", "bpm"])
+    four = pd.read_csv(UNIFIED_DIR / "four_factors.csv", dtype={"game_id": str})
+    if game_ids is not None:
+        basic = basic[basic["game_id"].isin(game_ids)]
+        advanced = advanced[advanced["game_id"].isin(game_ids)]
+        four = four[four["game_id"].isin(game_ids)]
+
+    basic["player"] = basic["player"].map(normalize_name)
+    advanced["player"] = advanced["player"].map(normalize_name)
+    basic["minutes"] = basic["mp"].map(parse_minutes)
+    basic["season"] = basic["game_id"].map(season_from_game_id)
+
+    points = basic.groupby(["game_id", "team"])["pts"].sum().to_dict()
+
+    four = four.rename(columns=FOUR_FACTOR_COLUMNS)
+    for col in FOUR_FACTOR_COLUMNS.values():
+        if col not in four.columns:
+            four[col] = 100 if col == "pace" else 0.0
+    ff = four.groupby(["game_id", "team"])[list(FOUR_FACTOR_COLUMNS.values())].mean()
+    ff = {key: row for key, row in zip(ff.index, ff.to_dict("records"))}
+
+    players = basic.merge(advanced, on=["game_id", "player", "team"], how="left")
+    players["bpm"] = players["bpm"].fillna(0)
+    players["plus_minus"] = players["plus_minus"].fillna(0)
+    return players, points, ff
+
+
+# =========================
+# RATING
+# =========================
+def _z(values: np.ndarray) -> np.ndarray:
+    """pandas-style z-score (ddof=1); all zeros when the spread is 0 or undefined"""
+    std = values.std(ddof=1) if len(values) > 1 else float("nan")
+    return (values - values.mean()) / std if std > 0 else np.zeros(len(values))
+
+
+@timed("compute")
+def rate_games(state: EloState, players: pd.DataFrame, points: Dict, ff: Dict) -> Tuple[list, list]:
+    """Apply every game in players (sorted by game_id) to state; returns history rows"""
+    team_history, player_history = [], []
+    for game_id, gp in players.groupby("game_id", sort=True):
+        season = int(gp["season"].iloc[0])
+        if state.season is not None and season != state.season:
+            for t in state.team:
+                prior = NBA_TEAM_PRIORS.get(t, INITIAL_TEAM_ELO)
+                state.team[t] = prior + (state.team[t] - prior) * SEASON_REGRESSION
+            for p in state.player:
+                prior = SUPERSTAR_PRIORS.get(p, INITIAL_PLAYER_ELO)
+                state.player[p] = prior + (state.player[p] - prior) * SEASON_REGRESSION
+        state.season = season
+        state.games.add(game_id)
+
+        for t in gp["team"].unique():
+            state.team.setdefault(t, NBA_TEAM_PRIORS.get(t, INITIAL_TEAM_ELO))
+        for p in gp["player"].unique():
+            state.player.setdefault(p, SUPERSTAR_PRIORS.get(p, INITIAL_PLAYER_ELO))
+        if gp["team"].nunique() != 2:
+            continue
+
+        home, away = gp["home_team"].iloc[0], gp["away_team"].iloc[0]
+        try:
+            actual_diff = points[(game_id, home)] - points[(game_id, away)]
+        except KeyError:
+            actual_diff = 0
+        try:
+            h, a = ff[(game_id, home)], ff[(game_id, away)]
+            ff_margin = (0.4 * (h["efg_pct"] - a["efg_pct"]) + 0.25 * (a["tov_pct"] - h["tov_pct"])
+                         + 0.2 * (h["orb_pct"] - a["orb_pct"]) + 0.15 * (h["ft_rate"] - a["ft_rate"])) \
+                * h["pace"] / 100
+        except KeyError:
+            ff_margin = 0
+
+        exp_home = 1 / (1 + 10 ** ((state.team[away] - (state.team[home] + HOME_ADVANTAGE)) / 400))
+        score_home = 1 if actual_diff > 0 else 0.5 if actual_diff == 0 else 0
+        blended_diff = 0.7 * actual_diff + 0.3 * ff_margin
+        delta = TEAM_K * (score_home - exp_home) * math.log(abs(blended_diff) + 1)
+        state.team[home] += delta
+        state.team[away] -= delta
+        team_history.append([game_id, home, state.team[home], season])
+        team_history.append([game_id, away, state.team[away], season])
+
+        rated = gp[gp["minutes"] >= MIN_MINUTES]
+        if rated.empty:
+            continue
+        minutes = rated["minutes"].to_numpy(dtype=float)
+        opp_elo = np.where(rated["team"].to_numpy() == home, state.team[away], state.team[home])
+        pm_adj = rated["plus_minus"].to_numpy(dtype=float) / np.clip(minutes, 0.1, None) * (opp_elo / 1500)
+        impact = 0.6 * _z(pm_adj) + 0.4 * _z(rated["bpm"].to_numpy(dtype=float))
+        weights = (minutes / minutes.sum()) ** 0.7
+        for pid, weight, value in zip(rated["player"], weights, np.clip(impact, -2, 2)):
+            state.player[pid] = max(1200, min(2000, state.player[pid] + PLAYER_K * weight * value))
+            player_history.append([game_id, pid, state.player[pid], season])
+    return team_history, player_history
+
+
+# =========================
+# OUTPUTS
+# =========================
+@timed("io")
+def _append_history(path: Path, rows: list, columns: List[str], rewrite: bool):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df = pd.DataFrame(rows, columns=columns)
+    if rewrite or not path.exists():
+        df.to_csv(path, index=False)
+    elif rows:
+        df.to_csv(path, mode="a", header=False, index=False)
+
+
+@timed("io")
+def write_results(state: EloState):
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    teams = pd.DataFrame(list(state.team.items()), columns=["team", "elo"]).sort_values(
+        "elo", ascending=False, kind="stable")
+    teams["rank"] = range(1, len(teams) + 1)
+    teams.to_csv(RESULTS_DIR / "team_elo_final.csv", index=False)
+
+    players = pd.DataFrame(list(state.player.items()), columns=["player", "elo"]).sort_values(
+        "elo", ascending=False, kind="stable")
+    players["rank"] = range(1, len(players) + 1)
+    players.to_csv(RESULTS_DIR / "player_elo_final.csv", index=False)
+    players.head(20).to_csv(RESULTS_DIR / "top_20_players.csv", index=False)
+
+
+def update(rebuild: bool = False) -> int:
+    """Rate the unified games not rated yet; returns the number of games rated"""
+    # Without a saved state every game is new: the history files (run_elo.py's, or an earlier
+    # run's) would get a second copy of each game appended, so they are rewritten instead
+    rebuild = rebuild or not STATE_FILE.exists()
+    state = EloState() if rebuild else EloState.load()
+    manifest = pd.read_csv(UNIFIED_DIR / "manifest.csv", dtype={"game_id": str}, usecols=["table", "game_id"])
+    available = set(manifest.loc[manifest["table"] == "basic_boxscore", "game_id"])
+    new = available - state.games
+    if not new:
+        return 0
+
+    if not rebuild and state.games and min(new) < max(state.games):
+        print(f"{len(new)} new games include games before the last rated one; replaying all games")
+        state, new, rebuild = EloState(), available, True
+
+    players, points, ff = load_inputs(new)
+    team_rows, player_rows = rate_games(state, players, points, ff)
+    _append_history(TEAM_HISTORY_FILE, team_rows, ["game_id", "team", "elo", "season"], rewrite=rebuild)
+    _append_history(PLAYER_HISTORY_FILE, player_rows, ["game_id", "player", "elo", "season"], rewrite=rebuild)
+    write_results(state)
+    state.save()
+    return len(new)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental team/player Elo (run_elo.py rules)")
+    parser.add_argument("--rebuild", action="store_true", help="replay every game from the priors")
+    args = parser.parse_args()
+
+    start = time.time()
+    rated = update(rebuild=args.rebuild)
+    print(f"Rated {rated:,} games in {time.time() - start:.1f}s -> {ELO_OUTPUT_DIR}" if rated
+          else "Elo ratings are up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+PLAYER ENTITY RESOLUTION
+One place to map the player names used by basketball-reference, ESPN and FBref
+to canonical entity ids, instead of run_elo.py's corrections dict,
+scrape_player_images.py's slugify, nba_scapper.py's sha1 uid and
+premier_scapper.py's md5 id.
+
+Names are reduced to an accent-insensitive key. A new name is resolved by:
+1. the persistent decision cache (raw name seen before)
+2. an exact key match
+3. candidate pruning through a character-trigram index (plus a surname block
+   for "J. Smith" style abbreviations): shared rare trigrams are counted with
+   np.bincount and only the top few candidates are scored with difflib -
+   never all pairs
+
+Decisions and entities are kept in a SQLite file so reruns are lookups.
+
+Usage:
+    python entity_resolution.py --build                  # index every known name
+    python entity_resolution.py --resolve "Luka Dončić" "J. Jackson"
+"""
+
+import argparse
+import re
+import sqlite3
+import time
+from collections import defaultdict
+from datetime import datetime
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import ENTITY_DB, FBREF_DIR, ROSTERS_DIR, TEAM_DATA_DIR
+from loaders import csv_files, list_game_files, normalize_name, read_csvs, read_table_file, team_stat_files
+from schemas import load_box_tables
+
+# =========================
+# CONFIGURATION
+# =========================
+MATCH_THRESHOLD = 0.88   # minimum difflib ratio between name keys
+MAX_CANDIDATES = 5       # candidates scored per name after trigram pruning
+MIN_DICE = 0.5           # trigram overlap below which a candidate is not worth scoring
+MAX_POSTING = 400        # trigrams shared by more names than this are too common to prune with
+
+# Letters NFKD does not decompose to ASCII
+TRANSLITERATIONS = str.maketrans({"Đ": "Dj", "đ": "dj", "Ø": "O", "ø": "o", "Ł": "L", "ł": "l",
+                                  "ß": "ss", "Æ": "Ae", "æ": "ae", "ı": "i", "ё": "e", "Ё": "E"})
+
+FBREF_NON_PLAYER_ROWS = {"Squad Total", "Opponent Total", "Player"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    entity_id TEXT PRIMARY KEY,
+    sport TEXT NOT NULL,
+    canonical_name TEXT NOT NULL,
+    name_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entities_key ON entities (sport, name_key);
+CREATE TABLE IF NOT EXISTS decisions (
+    sport TEXT NOT NULL,
+    raw_name TEXT NOT NULL,
+    entity_id TEXT NOT NULL,
+    method TEXT NOT NULL,
+    score REAL,
+    source TEXT,
+    decided_at TEXT,
+    PRIMARY KEY (sport, raw_name)
+);
+"""
+
+
+# =========================
+# NAME KEYS
+# =========================
+def name_key(name) -> str:
+    """Accent/case/punctuation-insensitive key, e.g. "Nikola Jokić" -> "nikola jokic" """
+    key = normalize_name(str(name).translate(TRANSLITERATIONS)).lower()
+    key = re.sub(r"[.'’`]", "", key)
+    key = re.sub(r"[^a-z0-9]+", " ", key)
+    return " ".join(key.split())
+
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _initial_form(key: str) -> Optional[Tuple[str, str]]:
+    """("j", "jackson") for abbreviations like "j jackson", else None"""
+    parts = key.split()
+    if len(parts) >= 2 and len(parts[0]) == 1:
+        return parts[0], " ".join(parts[1:])
+    return None
+
+
+# =========================
+# RESOLVER
+# =========================
+class EntityResolver:
+    """Resolves batches of raw names to canonical entity ids for one sport"""
+
+    def __init__(self, sport: str = "nba", db_path: Path = ENTITY_DB):
+        self.sport = sport
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+
+        self.by_key: Dict[str, str] = {}
+        self.keys: List[str] = []
+        self.ids: List[str] = []
+        self.postings = defaultdict(list)
+        self.surnames = defaultdict(list)
+        self._frozen = None
+        self.cache: Dict[str, str] = dict(self.conn.execute(
+            "SELECT raw_name, entity_id FROM decisions WHERE sport = ?", (sport,)))
+
+        for entity_id, key in self.conn.execute(
+                "SELECT entity_id, name_key FROM entities WHERE sport = ?", (sport,)):
+            self._index(entity_id, key)
+
+    def _index(self, entity_id: str, key: str):
+        pos = len(self.keys)
+        self.keys.append(key)
+        self.ids.append(entity_id)
+        self.by_key.setdefault(key, entity_id)
+        for gram in trigrams(key):
+            self.postings[gram].append(pos)
+        parts = key.split()
+        if len(parts) >= 2:
+            self.surnames[" ".join(parts[1:])].append(pos)
+
+    def _new_entity(self, raw_name: str, key: str) -> str:
+        entity_id = f"{self.sport}-{key.replace(' ', '-')}"
+        self.conn.execute("INSERT OR IGNORE INTO entities VALUES (?, ?, ?, ?)",
+                          (entity_id, self.sport, normalize_name(raw_name), key))
+        self._index(entity_id, key)
+        return entity_id
+
+    def _arrays(self):
+        """Posting lists as numpy arrays, rebuilt only after new entities were indexed"""
+        if self._frozen is None or self._frozen[0] != len(self.keys):
+            postings = {g: np.asarray(p, dtype=np.int32) for g, p in self.postings.items() if len(p) <= MAX_POSTING}
+            sizes = np.array([len(trigrams(k)) for k in self.keys], dtype=np.float64)
+            self._frozen = (len(self.keys), postings, sizes)
+        return self._frozen[1], self._frozen[2]
+
+    def _candidates(self, key: str) -> List[Tuple[int, float]]:
+        """(entity position, trigram dice) for the entities sharing the most rare trigrams"""
+        postings, sizes = self._arrays()
+        grams = trigrams(key)
+        hits = [postings[g] for g in grams if g in postings]
+        if not hits:
+            return []
+        counts = np.bincount(np.concatenate(hits), minlength=len(self.keys))
+        dice = 2 * counts / (sizes + len(grams))
+        top = np.argpartition(-dice, min(MAX_CANDIDATES, len(dice) - 1))[:MAX_CANDIDATES]
+        return [(int(p), float(dice[p])) for p in top if dice[p] >= MIN_DICE]
+
+    def _match(self, key: str) -> Tuple[Optional[str], str, float]:
+        """(entity_id, method, score) for a key not in the exact index"""
+        initial = _initial_form(key)
+        if initial:
+            first, surname = initial
+            hits = {self.ids[p] for p in self.surnames.get(surname, []) if self.keys[p].startswith(first)}
+            if len(hits) == 1:
+                return hits.pop(), "initial", 1.0
+
+        best, best_score = None, 0.0
+        for pos, _ in sorted(self._candidates(key), key=lambda c: -c[1]):
+            score = SequenceMatcher(None, key, self.keys[pos]).ratio()
+            if score > best_score:
+                best, best_score = pos, score
+        if best is not None and best_score >= MATCH_THRESHOLD:
+            return self.ids[best], "fuzzy", best_score
+        return None, "new", best_score
+
+    def resolve(self, names: Iterable[str], source: str = "unknown", create: bool = True,
+                fuzzy: bool = True) -> List[Optional[str]]:
+        """Canonical entity id for each raw name (None when unmatched and create=False)
+
+        fuzzy=False is for sources whose spelling is authoritative (basketball-reference):
+        a name that is not an exact key match becomes a new entity, so two real
+        players with similar names (Jalen/Jaylin Williams) are never merged.
+        """
+        names = list(names)
+        decisions = []
+        now = datetime.now().isoformat(timespec="seconds")
+
+        for raw in dict.fromkeys(n for n in names if isinstance(n, str) and n.strip()):
+            if raw in self.cache:
+                continue
+            key = name_key(raw)
+            if not key:
+                continue
+            if key in self.by_key:
+                entity_id, method, score = self.by_key[key], "exact", 1.0
+            else:
+                entity_id, method, score = self._match(key) if fuzzy else (None, "new", 0.0)
+                if entity_id is None:
+                    if not create:
+                        continue
+                    entity_id = self._new_entity(raw, key)
+            self.cache[raw] = entity_id
+            decisions.append((self.sport, raw, entity_id, method, score, source, now))
+
+        if decisions:
+            self.conn.executemany("INSERT OR REPLACE INTO decisions VALUES (?, ?, ?, ?, ?, ?, ?)", decisions)
+            self.conn.commit()
+        return [self.cache.get(n) for n in names]
+
+    def resolve_series(self, names: pd.Series, source: str = "unknown") -> pd.Series:
+        """Vectorized helper for DataFrame columns: resolves unique values once"""
+        uniques = names.dropna().unique()
+        mapping = dict(zip(uniques, self.resolve(uniques, source=source)))
+        return names.map(mapping)
+
+    def decisions(self) -> pd.DataFrame:
+        return pd.read_sql_query("SELECT * FROM decisions WHERE sport = ?", self.conn, params=(self.sport,))
+
+    def close(self):
+        self.conn.close()
+
+
+# =========================
+# KNOWN NAMES
+# =========================
+def nba_name_sources() -> List[Tuple[str, pd.Series, bool]]:
+    """(source, names, fuzzy) in trust order: box-score names become the canonical spelling"""
+    sources = []
+    box = read_csvs(list_game_files("team_basic").values(), usecols=["player"])
+    sources.append(("bbref_boxscores", box["player"], False))
+
+    season = load_box_tables("game-basic", players_only=True)
+    if not season.empty:
+        sources.append(("bbref_2025_26", season["player"].astype(str), False))
+
+    stats = read_csvs([p for _, _, p in team_stat_files("per_game_stats")], usecols=["Player"])
+    sources.append(("bbref_team_stats", stats["Player"][stats["Player"] != "Team Totals"], False))
+
+    rosters = read_csvs(csv_files(TEAM_DATA_DIR, "*_roster_*.csv"), usecols=["Player"])
+    names = rosters["Player"].str.replace(r"\s*\(TW\)$", "", regex=True)
+    sources.append(("team_data_rosters", names, False))
+
+    espn = read_csvs(csv_files(ROSTERS_DIR, "*/roster_images.csv"), usecols=["player"])
+    sources.append(("espn_rosters", espn["player"], True))
+    return sources
+
+
+def fbref_names() -> pd.Series:
+    """Player names from the FBref team tables (two header rows, 'Player' on the second)"""
+    names = []
+    for path in csv_files(FBREF_DIR, "*_20??-??-??.csv"):
+        df = read_table_file(path)
+        if "Player" in df.columns:
+            names.append(df["Player"])
+    if not names:
+        return pd.Series(dtype=object)
+    names = pd.concat(names, ignore_index=True).dropna()
+    return names[~names.isin(FBREF_NON_PLAYER_ROWS)]
+
+
+def build():
+    start = time.time()
+    resolver = EntityResolver("nba")
+    for source, names, fuzzy in nba_name_sources():
+        names = names.dropna().unique()
+        resolver.resolve(names, source=source, fuzzy=fuzzy)
+        print(f"  {source}: {len(names):,} names")
+    methods = resolver.decisions()["method"].value_counts().to_dict()
+    print(f"NBA: {len(set(resolver.ids)):,} entities, decisions by method {methods}")
+    resolver.close()
+
+    resolver = EntityResolver("soccer")
+    names = fbref_names().unique()
+    resolver.resolve(names, source="fbref")
+    print(f"Soccer: {len(set(resolver.ids)):,} entities from {len(names):,} FBref names")
+    resolver.close()
+    print(f"Done in {time.time() - start:.1f}s -> {ENTITY_DB}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve player names to canonical entity ids")
+    parser.add_argument("--build", action="store_true", help="index every known name")
+    parser.add_argument("--sport", default="nba", help="nba or soccer")
+    parser.add_argument("--resolve", nargs="+", help="names to resolve")
+    args = parser.parse_args()
+
+    if args.build:
+        build()
+    if args.resolve:
+        resolver = EntityResolver(args.sport)
+        for name, entity_id in zip(args.resolve, resolver.resolve(args.resolve, source="cli", create=False)):
+            print(f"  {name} -> {entity_id}")
+        resolver.close()
+
+
+if __name__ == "__main__":
+    main()
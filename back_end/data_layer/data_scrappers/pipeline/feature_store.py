@@ -0,0 +1,260 @@
+"""
+GAME FEATURE STORE
+Lagged team features for game-outcome models, persisted as Parquet keyed by game_id.
+
+Each run only reads the four_factors/line_scores files of games that are not in
+the store yet, appends them to the team-game base table, recomputes the lagged
+features with vectorized groupby shifts/rolls and appends the rows of the new
+games as a new Parquet part. Readers load the whole store in one call with
+load_features().
+
+Post-game Elo is joined when a game enters the base table. When the Elo history
+changes (run_elo.py/elo_incremental.py rated more games or were rebuilt), the
+Elo of every stored row is joined again and the whole store rewritten, since
+pre-game Elo of later games follows from it.
+
+Usage:
+    python feature_store.py            # append new games
+    python feature_store.py --rebuild  # recompute everything from scratch
+"""
+
+import argparse
+import hashlib
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+from config import BOXSCORE_DIR, ELO_HISTORY_DIR, FEATURE_STORE_DIR
+from loaders import list_game_files, read_csvs, season_from_dates
+
+# =========================
+# CONFIGURATION
+# =========================
+BASE_FILE = FEATURE_STORE_DIR / "team_games.parquet"
+FEATURES_DIR = FEATURE_STORE_DIR / "game_features"
+STATE_FILE = FEATURE_STORE_DIR / "state.json"
+
+ROLLING_WINDOW = 10
+ELO_HISTORY_FILES = [
+    ELO_HISTORY_DIR / "team_elo_history.csv",
+    BOXSCORE_DIR / "team_elo_history.csv",
+]
+
+FOUR_FACTOR_COLUMNS = {
+    "pace": "pace", "eFG%": "efg_pct", "TOV%": "tov_pct",
+    "ORB%": "orb_pct", "FT/FGA": "ft_rate", "ORtg": "ortg",
+}
+# Per-game values that get rolled into lagged features
+ROLLED_STATS = ["pts", "opp_pts", "margin", "pace", "efg_pct", "tov_pct",
+                "orb_pct", "ft_rate", "ortg", "drtg"]
+
+
+# =========================
+# BASE TABLE
+# =========================
+def load_post_game_elo() -> pd.DataFrame:
+    """Post-game team Elo per (game_id, team) from the latest run_elo.py history"""
+    for path in ELO_HISTORY_FILES:
+        if path.exists():
+            elo = pd.read_csv(path, usecols=["game_id", "team", "elo"])
+            # a game appended twice to the history keeps its latest rating
+            elo = elo.drop_duplicates(["game_id", "team"], keep="last")
+            return elo.rename(columns={"elo": "post_elo"})
+    return pd.DataFrame(columns=["game_id", "team", "post_elo"])
+
+
+def elo_fingerprint() -> str:
+    """Hash of the Elo history load_post_game_elo() reads; empty when there is none"""
+    for path in ELO_HISTORY_FILES:
+        if path.exists():
+            st = path.stat()
+            return hashlib.sha1(f"{path}|{st.st_size}|{st.st_mtime_ns}".encode()).hexdigest()
+    return ""
+
+
+def build_team_games(ff_paths: List[Path], ls_paths: List[Path]) -> pd.DataFrame:
+    """One row per (game, team) with the raw per-game values of both sides"""
+    four = read_csvs(ff_paths, usecols=["game_date", "game_id", "team"] + list(FOUR_FACTOR_COLUMNS))
+    lines = read_csvs(ls_paths, usecols=["game_id", "team", "TOTAL"])
+    if four.empty or lines.empty:
+        return pd.DataFrame()
+
+    four = four.rename(columns=FOUR_FACTOR_COLUMNS)
+    lines = lines.rename(columns={"TOTAL": "pts"})
+
+    df = four.merge(lines, on=["game_id", "team"], how="inner")
+    df = df.drop_duplicates(["game_id", "team"])
+
+    # Keep only complete two-team games
+    df = df[df.groupby("game_id")["team"].transform("size") == 2]
+
+    # Opponent values come from the other row of the same game
+    opp = df[["game_id", "team", "pts", "ortg"]].rename(
+        columns={"team": "opponent", "pts": "opp_pts", "ortg": "drtg"}
+    )
+    df = df.merge(opp, on="game_id")
+    df = df[df["team"] != df["opponent"]]
+
+    df["game_date"] = pd.to_datetime(df["game_date"], errors="coerce")
+    df["season"] = season_from_dates(df["game_date"])
+    df["is_home"] = df["game_id"].str[-3:] == df["team"]
+    df["margin"] = df["pts"] - df["opp_pts"]
+    df["win"] = (df["margin"] > 0).astype("int8")
+
+    df = df.merge(load_post_game_elo(), on=["game_id", "team"], how="left")
+    return df.reset_index(drop=True)
+
+
+# =========================
+# LAGGED FEATURES
+# =========================
+def _lagged_mean(df: pd.DataFrame, keys: List[str], cols: List[str]) -> pd.DataFrame:
+    """Rolling mean of the previous ROLLING_WINDOW games, excluding the current one"""
+    return df.groupby(keys, sort=False)[cols].transform(
+        lambda s: s.shift(1).rolling(ROLLING_WINDOW, min_periods=1).mean()
+    )
+
+
+def compute_features(base: pd.DataFrame) -> pd.DataFrame:
+    """Per team-game lagged features; every value only uses games played before"""
+    df = base.sort_values(["team", "game_date", "game_id"]).reset_index(drop=True)
+    by_team = df.groupby("team", sort=False)
+
+    feats = df[["game_id", "game_date", "season", "team", "opponent", "is_home"]].copy()
+
+    rolled = _lagged_mean(df, ["team"], ROLLED_STATS)
+    for col in ROLLED_STATS:
+        feats[f"{col}_l{ROLLING_WINDOW}"] = rolled[col]
+
+    feats[f"win_pct_l{ROLLING_WINDOW}"] = _lagged_mean(df, ["team"], ["win"])["win"]
+    feats["rest_days"] = by_team["game_date"].diff().dt.days
+    feats["games_played"] = df.groupby(["team", "season"], sort=False).cumcount()
+
+    # Home/away splits: form at the venue the game is played at
+    feats[f"venue_margin_l{ROLLING_WINDOW}"] = _lagged_mean(df, ["team", "is_home"], ["margin"])["margin"]
+
+    # Pre-game Elo is the last known post-game rating before this game
+    feats["pre_elo"] = by_team["post_elo"].transform(lambda s: s.ffill().shift(1))
+
+    return feats
+
+
+def to_game_rows(feats: pd.DataFrame, base: pd.DataFrame) -> pd.DataFrame:
+    """Pivot team-game features into one row per game (home_* / away_*) with targets"""
+    keys = ["game_id", "game_date", "season"]
+    value_cols = [c for c in feats.columns if c not in keys + ["opponent", "is_home"]]
+
+    home = feats[feats["is_home"]][keys + value_cols]
+    away = feats[~feats["is_home"]][["game_id"] + value_cols]
+    home = home.rename(columns={c: f"home_{c}" for c in value_cols})
+    away = away.rename(columns={c: f"away_{c}" for c in value_cols})
+
+    games = home.merge(away, on="game_id", how="inner")
+    games["elo_diff"] = games["home_pre_elo"] - games["away_pre_elo"]
+
+    targets = base[base["is_home"]][["game_id", "margin"]].rename(columns={"margin": "home_margin"})
+    games = games.merge(targets, on="game_id", how="left")
+    games["home_win"] = (games["home_margin"] > 0).astype("int8")
+
+    return games.sort_values(["game_date", "game_id"]).reset_index(drop=True)
+
+
+# =========================
+# STORAGE
+# =========================
+def _write_parquet(df: pd.DataFrame, path: Path):
+    """Write via a temporary file so readers never see a half-written part"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    df.to_parquet(tmp, index=False)
+    tmp.replace(path)
+
+
+def load_features(columns: Optional[List[str]] = None,
+                  seasons: Optional[List[int]] = None) -> pd.DataFrame:
+    """Read the game feature store in one I/O call"""
+    if not FEATURES_DIR.exists():
+        raise FileNotFoundError(f"No feature store at {FEATURES_DIR}; run feature_store.py first")
+    filters = [("season", "in", list(seasons))] if seasons else None
+    return pd.read_parquet(FEATURES_DIR, columns=columns, filters=filters)
+
+
+def update_store(rebuild: bool = False) -> int:
+    """Append features for games not in the store yet; returns the number of new games"""
+    ff_files = list_game_files("four_factors")
+    ls_files = list_game_files("line_scores")
+    available = set(ff_files) & set(ls_files)
+
+    if rebuild:
+        base = pd.DataFrame()
+        known = set()
+    else:
+        base = pd.read_parquet(BASE_FILE) if BASE_FILE.exists() else pd.DataFrame()
+        known = set(base["game_id"]) if not base.empty else set()
+
+    elo_stamp = elo_fingerprint()
+    state = json.loads(STATE_FILE.read_text()) if STATE_FILE.exists() else {}
+    elo_changed = not base.empty and state.get("elo_fingerprint") != elo_stamp
+
+    new_ids = sorted(available - known)
+    if not new_ids and not elo_changed:
+        print("Feature store is up to date")
+        return 0
+
+    new_rows = pd.DataFrame()
+    if new_ids:
+        print(f"Reading {len(new_ids)} new games...")
+        new_rows = build_team_games([ff_files[g] for g in new_ids], [ls_files[g] for g in new_ids])
+    if new_rows.empty and not elo_changed:
+        print("No complete games among the new files")
+        return 0
+
+    if elo_changed:
+        # stored rows carry the Elo of the history they were added with
+        print("Elo history changed; joining post-game Elo of all stored games again")
+        base = base.drop(columns="post_elo", errors="ignore")
+        base = base.merge(load_post_game_elo(), on=["game_id", "team"], how="left")
+
+    # A game older than the newest stored one shifts the lags of later games
+    out_of_order = (not base.empty and not new_rows.empty
+                    and new_rows["game_date"].min() < base["game_date"].max())
+
+    if not new_rows.empty:
+        base = pd.concat([base, new_rows], ignore_index=True) if not base.empty else new_rows
+    games = to_game_rows(compute_features(base), base)
+    _write_parquet(base, BASE_FILE)
+
+    if rebuild or out_of_order or elo_changed or not FEATURES_DIR.exists():
+        if out_of_order:
+            print("New games predate stored ones; rewriting the whole store")
+        for part in FEATURES_DIR.glob("part-*.parquet"):
+            part.unlink()
+        part_rows = games
+    else:
+        part_rows = games[games["game_id"].isin(set(new_rows["game_id"]))]
+
+    stamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    _write_parquet(part_rows, FEATURES_DIR / f"part-{stamp}.parquet")
+    STATE_FILE.write_text(json.dumps({"elo_fingerprint": elo_stamp}))
+
+    n_games = new_rows["game_id"].nunique() if not new_rows.empty else 0
+    print(f"Stored features for {len(part_rows)} games ({n_games} new)")
+    return n_games
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build/append the game feature store")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all games")
+    args = parser.parse_args()
+
+    start = time.time()
+    update_store(rebuild=args.rebuild)
+    print(f"Done in {time.time() - start:.1f}s -> {FEATURES_DIR}")
+
+
+if __name__ == "__main__":
+    main()
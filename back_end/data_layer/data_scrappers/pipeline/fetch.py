@@ -0,0 +1,257 @@
+"""
+PAGE FETCH BACKENDS
+The basketball-reference box-score, schedule, play-by-play and shot-chart
+pages are static HTML: every table is in the page source, some of them inside
+HTML comments that the site's JavaScript un-comments. Driving Chrome through
+Selenium to get them costs a browser process, its memory and a full render per
+page. Two backends return the same Page:
+
+    http        one requests.Session per process: pooled keep-alive connections,
+                gzip/deflate (and br/zstd when urllib3 can decode them), retries
+                on connection errors and 5xx
+    selenium    Chrome, started lazily; the page source after JavaScript ran
+
+Tables are extracted from the page source with lxml in both cases (commented
+tables included), so both backends yield the same tables for the same HTML.
+With backend="http" a page that fails, or is a bot challenge instead of the
+page ("Just a moment..."), is fetched again through Selenium; Selenium is never
+started when no page needs it.
+
+A 429 or 503 answer, or a "Too Many Requests" page in the browser, raises
+Throttled (with the Retry-After the host sent) instead: neither a retry nor
+the Selenium fallback should hit a host that asked us to slow down.
+scrape_engine.py lowers that host's rate and holds its requests.
+
+Usage:
+    from fetch import Fetcher
+    fetcher = Fetcher("http", driver_factory=get_driver)
+    page = fetcher.get(url)
+    for html, table_id in page.tables(prefix="box-"):
+        ...
+    page.table("pbp"), page.links("Box Score")
+    fetcher.close()
+
+    python -m pytest tests/test_fetch.py                     # backends vs read_html on the fixture pages
+    python tests/fixture_server.py tests/fixtures/boxscores  # serve locally, compare backends, CPU/memory per page
+"""
+
+import email.utils
+import functools
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import lxml.html
+import requests
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+from profiler import span
+
+# =========================
+# CONFIGURATION
+# =========================
+BACKENDS = ["http", "selenium"]
+TIMEOUT = 30
+POOL_SIZE = 8
+# 429/503 are left to the caller (Throttled): urllib3 would otherwise sleep out their Retry-After itself
+RETRIES = Retry(total=3, connect=3, read=2, backoff_factor=2, status_forcelist=(500, 502, 504),
+                allowed_methods=frozenset(["GET", "HEAD"]), respect_retry_after_header=False)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (NBA data scraper)",
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Encoding": ACCEPT_ENCODING,
+}
+
+# Bot-check interstitials served with a 200 (see homepage_source.html at the repo root)
+CHALLENGE_MARKERS = ["<title>Just a moment...</title>", "cf-browser-verification", "challenge-platform"]
+# Statuses meaning "too fast"
+THROTTLE_STATUSES = (429, 503)
+# What a browser shows for them; Selenium does not expose the status
+THROTTLE_MARKERS = ["<title>429", "Too Many Requests", "<title>Rate Limited", "<title>503 Service"]
+
+
+class Throttled(Exception):
+    """The host answered 429/503: slow down; retry_after is the seconds it asked for, if it said"""
+
+    def __init__(self, url: str, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"{url} answered {status}" + (f" (Retry-After {retry_after:.0f}s)" if retry_after else ""))
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """A Retry-After header (delta seconds or an HTTP date) in seconds from now"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+# =========================
+# PAGES
+# =========================
+class Page:
+    """A fetched page; tables and links come from the HTML source"""
+
+    def __init__(self, url: str, html: str, backend: str):
+        self.url = url
+        self.html = html
+        self.backend = backend
+
+    @functools.cached_property
+    def document(self):
+        return lxml.html.fromstring(self.html)
+
+    @functools.cached_property
+    def _tables(self) -> Dict[str, str]:
+        """table id -> outer HTML, in page order; commented-out tables after the live ones"""
+        found = {}
+        for el in self.document.iter("table"):
+            if el.get("id"):
+                found.setdefault(el.get("id"), lxml.html.tostring(el, encoding="unicode", with_tail=False))
+        for comment in self.document.iter(etree.Comment):
+            text = comment.text or ""
+            if "<table" not in text:
+                continue
+            for el in lxml.html.fromstring(f"<div>{text}</div>").iter("table"):
+                if el.get("id"):
+                    found.setdefault(el.get("id"), lxml.html.tostring(el, encoding="unicode", with_tail=False))
+        return found
+
+    def table_ids(self) -> List[str]:
+        return list(self._tables)
+
+    def table(self, table_id: str) -> Optional[str]:
+        return self._tables.get(table_id)
+
+    def tables(self, prefix: str = "", predicate: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, str]]:
+        """(outer HTML, id) of every table whose id starts with prefix and passes predicate"""
+        return [(html, tid) for tid, html in self._tables.items()
+                if tid.startswith(prefix) and (predicate is None or predicate(tid))]
+
+    def links(self, text: str) -> List[str]:
+        """Absolute hrefs of the links whose text contains text (Selenium's PARTIAL_LINK_TEXT)"""
+        return [urljoin(self.url, a.get("href")) for a in self.document.iter("a")
+                if a.get("href") and text in a.text_content()]
+
+    def is_challenge(self) -> bool:
+        head = self.html[:20000]
+        return any(marker in head for marker in CHALLENGE_MARKERS)
+
+    def is_throttled(self) -> bool:
+        return is_throttled(self.html)
+
+
+def is_throttled(html: str) -> bool:
+    """Whether a page source is a rate-limit error page rather than the page"""
+    head = html[:20000]
+    return any(marker in head for marker in THROTTLE_MARKERS)
+
+
+# =========================
+# BACKENDS
+# =========================
+def _session(pool_size: int = POOL_SIZE) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=RETRIES)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(HEADERS)
+    return session
+
+
+def _default_driver():
+    from selenium import webdriver
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    driver = webdriver.Chrome(options=options)
+    driver.set_page_load_timeout(TIMEOUT)
+    return driver
+
+
+class Fetcher:
+    """Fetch pages over plain HTTP, falling back to (or only using) Selenium"""
+
+    def __init__(self, backend: str = "http", driver_factory: Optional[Callable] = None, fallback: bool = True):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}; expected one of {BACKENDS}")
+        self.backend = backend
+        self.fallback = fallback
+        self.driver_factory = driver_factory or _default_driver
+        self.session = _session() if backend == "http" else None
+        self._driver = None
+        self.counts = {"http": 0, "selenium": 0, "fallbacks": 0}
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = self.driver_factory()
+        return self._driver
+
+    def get(self, url: str) -> Page:
+        """The page at url; raises Throttled, requests.RequestException / WebDriverException on failure"""
+        if self.backend == "http":
+            try:
+                page = self._get_http(url)
+                if not page.is_challenge():
+                    return page
+                error = requests.HTTPError(f"{url} served a bot challenge instead of the page")
+            except requests.RequestException as e:
+                error = e
+            if not self.fallback:
+                raise error
+            print(f"  {type(error).__name__}: {error}; fetching with Selenium")
+            self.counts["fallbacks"] += 1
+        return self._get_selenium(url)
+
+    def _get_http(self, url: str) -> Page:
+        with span("network", "http.get"):
+            response = self.session.get(url, timeout=TIMEOUT)
+            if response.status_code in THROTTLE_STATUSES:
+                raise Throttled(url, response.status_code, retry_after_seconds(response.headers.get("Retry-After")))
+            response.raise_for_status()
+            if "charset" not in response.headers.get("Content-Type", "").lower():
+                response.encoding = "utf-8"  # requests would assume ISO-8859-1 for text/html
+            self.counts["http"] += 1
+            return Page(response.url, response.text, "http")
+
+    def _get_selenium(self, url: str) -> Page:
+        with span("network", "driver.get"):
+            self.driver.get(url)
+            self.counts["selenium"] += 1
+            page = Page(self.driver.current_url, self.driver.page_source, "selenium")
+        if page.is_throttled():
+            raise Throttled(url, 429)
+        return page
+
+    def restart(self):
+        """Drop the browser (started again when next needed) and reopen the HTTP pool"""
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception:
+                pass
+            self._driver = None
+        if self.session is not None:
+            self.session.close()
+            self.session = _session()
+
+    def close(self):
+        self.restart()
+        if self.session is not None:
+            self.session.close()
+            self.session = None
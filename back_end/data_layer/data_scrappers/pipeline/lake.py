@@ -0,0 +1,299 @@
+"""
+PARQUET DATA LAKE
+Columnar copy of the scraped CSVs, partitioned by sport/table/season:
+
+    lake/sport=nba/table=four_factors/season=2023/part-0.parquet
+    lake/sport=soccer/table=shooting_stats/season=2025/part-0.parquet
+
+Each partition file is sorted by team and written with one row group per team,
+so read() prunes by partition (sport/table/season) and by row-group statistics
+(team, game_date) and only decodes the requested columns.
+
+A partition is rewritten only when the fingerprint of its source files changes.
+
+Usage:
+    python lake.py                                      # build/refresh the lake
+    python lake.py --rebuild
+    python lake.py --table four_factors --season 2023   # query + timing
+    python lake.py --table team_basic --team BOS --start 2024-01-01 --end 2024-02-01
+"""
+
+import argparse
+import hashlib
+import json
+import shutil
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from compact import add_game_keys, normalize_season_basic
+from config import FBREF_DIR, LAKE_DIR
+from loaders import (FBREF_FILE_PATTERN, GAME_TABLES, csv_files, list_game_files, list_team_box_files, read_csvs,
+                     read_table_file, season_from_game_id, soccer_season, team_stat_files)
+from profiler import timed
+
+# =========================
+# CONFIGURATION
+# =========================
+MANIFEST_FILE = LAKE_DIR / "manifest.json"
+# Part of every fingerprint: bump when load_partition changes what a partition holds
+BUILD_VERSION = 2  # 2: season_basic rows get game_date and home/away keys
+
+# Named team-season tables from nba_team_stats_YYYY (table_N files are unlabeled)
+TEAM_STAT_TABLES = [
+    "per_game_stats", "totals_stats", "per_minute_stats", "per_poss", "advanced",
+    "shooting", "adj_shooting", "pbp_stats", "team_and_opponent", "team_misc", "salaries2",
+]
+TEAM_STAT_TABLES += [f"{t}_post" for t in TEAM_STAT_TABLES[:8]]
+
+# Identifier columns that must stay text even when they look numeric
+TEXT_COLUMNS = {"game_id", "team", "player", "url", "quarter", "Player", "Squad", "Pos"}
+
+Source = Tuple[str, Path, Optional[str]]  # (reader kind, path, team)
+PartitionKey = Tuple[str, str, int]       # (sport, table, season)
+
+
+# =========================
+# SOURCES
+# =========================
+def discover() -> Dict[PartitionKey, List[Source]]:
+    """Every source file, grouped by the lake partition it belongs to"""
+    parts = defaultdict(list)
+
+    for table in GAME_TABLES:
+        for gid, path in list_game_files(table).items():
+            parts[("nba", table, season_from_game_id(gid))].append(("game", path, None))
+
+    # 2025-26 basic box scores join team_basic for games the per-game layout lacks
+    have = set(list_game_files("team_basic"))
+    for (gid, team), path in list_team_box_files("game-basic").items():
+        if gid not in have:
+            parts[("nba", "team_basic", season_from_game_id(gid))].append(("season_basic", path, team))
+
+    for table in TEAM_STAT_TABLES:
+        for season, team, path in team_stat_files(table):
+            parts[("nba", table, season)].append(("table", path, team))
+
+    for path in csv_files(FBREF_DIR, "*_20??-??-??.csv"):
+        m = FBREF_FILE_PATTERN.match(path.name)
+        if not m:
+            continue
+        season = soccer_season(m.group("date"))
+        team = None if m.group("table") == "league_stats" else m.group("team")
+        parts[("soccer", m.group("table"), season)].append(("table", path, team))
+
+    return parts
+
+
+def fingerprint(sources: Iterable[Source]) -> str:
+    h = hashlib.sha1(f"build {BUILD_VERSION}\n".encode())
+    for _, path, _ in sorted(sources, key=lambda s: str(s[1])):
+        st = path.stat()
+        h.update(f"{path.name}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+# =========================
+# BUILD
+# =========================
+def _normalize_types(df: pd.DataFrame) -> pd.DataFrame:
+    """Numeric-looking text -> float64, dates -> date32, everything else -> string
+
+    Using one numeric type per column keeps partition schemas compatible even
+    when a season happens to hold only integers.
+    """
+    for col in df.columns:
+        if col in TEXT_COLUMNS:
+            df[col] = df[col].astype("string")
+        elif col == "game_date":
+            df[col] = pd.to_datetime(df[col], errors="coerce").dt.date
+        elif pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            df[col] = df[col].astype("float64")
+        else:
+            as_num = pd.to_numeric(df[col], errors="coerce")
+            if as_num.notna().sum() == df[col].notna().sum():
+                df[col] = as_num.astype("float64")
+            else:
+                df[col] = df[col].astype("string")
+    return df
+
+
+@timed("parse")
+def load_partition(sources: List[Source]) -> pd.DataFrame:
+    frames = []
+    games = [path for kind, path, _ in sources if kind == "game"]
+    if games:
+        frames.append(read_csvs(games))
+    season = [path for kind, path, _ in sources if kind == "season_basic"]
+    if season:
+        # compact.py adds game_date and the home/away keys after normalizing; the unified game rows have them
+        frames.append(add_game_keys(normalize_season_basic(read_csvs(season))))
+    for kind, path, team in sources:
+        if kind == "table":
+            df = read_table_file(path)
+            if team is not None:
+                df.insert(0, "team", team)
+            elif "Squad" in df.columns:
+                df.insert(0, "team", df["Squad"])
+            frames.append(df)
+
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    df.columns = [str(c) for c in df.columns]
+    return _normalize_types(df)
+
+
+@timed("io")
+def write_partition(key: PartitionKey, df: pd.DataFrame) -> Path:
+    """Write one partition file with one row group per team (sorted by date inside)"""
+    sport, table, season = key
+    part_dir = LAKE_DIR / f"sport={sport}" / f"table={table}" / f"season={season}"
+    part_dir.mkdir(parents=True, exist_ok=True)
+
+    sort_cols = [c for c in ("team", "game_date", "game_id") if c in df.columns]
+    df = df.sort_values(sort_cols, na_position="last").reset_index(drop=True) if sort_cols else df
+    data = pa.Table.from_pandas(df, preserve_index=False)
+
+    path = part_dir / "part-0.parquet"
+    tmp = path.with_suffix(".tmp")
+    with pq.ParquetWriter(tmp, data.schema, compression="zstd") as writer:
+        if "team" in df.columns:
+            bounds = df.groupby("team", sort=False, dropna=False).size().cumsum().tolist()
+            start = 0
+            for end in bounds:
+                writer.write_table(data.slice(start, end - start))
+                start = end
+        else:
+            writer.write_table(data)
+    tmp.replace(path)
+    return path
+
+
+def build(rebuild: bool = False) -> int:
+    """Refresh every partition whose sources changed; returns partitions written"""
+    if rebuild and LAKE_DIR.exists():
+        shutil.rmtree(LAKE_DIR)
+    LAKE_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = json.loads(MANIFEST_FILE.read_text()) if MANIFEST_FILE.exists() else {}
+
+    written = 0
+    for key, sources in sorted(discover().items()):
+        name = "/".join(map(str, key))
+        stamp = fingerprint(sources)
+        if manifest.get(name) == stamp:
+            continue
+        start = time.time()
+        df = load_partition(sources)
+        if df.empty:
+            continue
+        write_partition(key, df)
+        manifest[name] = stamp
+        written += 1
+        print(f"  {name}: {len(df):,} rows from {len(sources):,} files ({time.time() - start:.1f}s)")
+
+    MANIFEST_FILE.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+    return written
+
+
+# =========================
+# READER
+# =========================
+def tables(sport: str = "nba") -> List[str]:
+    root = LAKE_DIR / f"sport={sport}"
+    return sorted(p.name.split("=", 1)[1] for p in root.glob("table=*")) if root.exists() else []
+
+
+def dataset(table: str, sport: str = "nba") -> ds.Dataset:
+    """Dataset over all seasons of one table, with partition schemas unified"""
+    root = LAKE_DIR / f"sport={sport}" / f"table={table}"
+    if not root.exists():
+        raise FileNotFoundError(f"No lake table {sport}/{table}; run lake.py first")
+    files = sorted(str(p) for p in root.glob("season=*/*.parquet"))
+    schemas = [pq.read_schema(f) for f in files]
+    try:
+        schema = pa.unify_schemas(schemas, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # A column that is numeric in one season and text in another is read as text
+        fields = {}
+        for s in schemas:
+            for field in s:
+                if field.name in fields and fields[field.name].type != field.type:
+                    fields[field.name] = pa.field(field.name, pa.string())
+                else:
+                    fields.setdefault(field.name, field)
+        schema = pa.schema(list(fields.values()))
+    schema = schema.append(pa.field("season", pa.int32())) if "season" not in schema.names else schema
+    partitioning = ds.partitioning(pa.schema([("season", pa.int32())]), flavor="hive")
+    return ds.dataset(files, schema=schema, format="parquet", partitioning=partitioning,
+                      partition_base_dir=str(root))
+
+
+def read(table: str, columns: Optional[List[str]] = None, sport: str = "nba",
+         seasons: Optional[Iterable[int]] = None, teams: Optional[Iterable[str]] = None,
+         start=None, end=None, with_keys: bool = False) -> pd.DataFrame:
+    """Load a lake table, pushing column selection and filters down to Parquet
+
+    seasons prunes partitions; teams and the start/end game_date range prune
+    row groups by their statistics before any data pages are decoded.
+    with_keys=True appends the int32 surrogate columns of dimensions.py.
+    """
+    data = dataset(table, sport)
+    expr = None
+
+    def _and(e):
+        nonlocal expr
+        expr = e if expr is None else expr & e
+
+    if seasons is not None:
+        _and(ds.field("season").isin([int(s) for s in seasons]))
+    if teams is not None:
+        _and(ds.field("team").isin([str(t) for t in teams]))
+    if start is not None:
+        _and(ds.field("game_date") >= pa.scalar(pd.Timestamp(start).date(), pa.date32()))
+    if end is not None:
+        _and(ds.field("game_date") <= pa.scalar(pd.Timestamp(end).date(), pa.date32()))
+
+    if columns is not None:
+        columns = [c for c in columns if c in data.schema.names]
+    df = data.to_table(columns=columns, filter=expr).to_pandas()
+    if with_keys:
+        from dimensions import add_keys
+        df = add_keys(df, source=f"lake_{sport}", sport=sport,
+                      player="Player" if sport == "soccer" else "player")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the Parquet data lake")
+    parser.add_argument("--rebuild", action="store_true", help="rewrite every partition")
+    parser.add_argument("--table", help="query a table instead of building")
+    parser.add_argument("--sport", default="nba")
+    parser.add_argument("--season", type=int, action="append", help="season start year (repeatable)")
+    parser.add_argument("--team", action="append", help="team code (repeatable)")
+    parser.add_argument("--start", help="first game_date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last game_date (YYYY-MM-DD)")
+    parser.add_argument("--columns", help="comma-separated column list")
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.table:
+        df = read(args.table, columns=args.columns.split(",") if args.columns else None, sport=args.sport,
+                  seasons=args.season, teams=args.team, start=args.start, end=args.end)
+        print(df.head(10).to_string())
+        print(f"{len(df):,} rows x {df.shape[1]} columns in {time.time() - start:.2f}s")
+        return
+
+    written = build(rebuild=args.rebuild)
+    print(f"{written} partitions written in {time.time() - start:.1f}s -> {LAKE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
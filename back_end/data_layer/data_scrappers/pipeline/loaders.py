@@ -0,0 +1,288 @@
+"""
+NBA DATA LOADERS
+Helpers for reading the one-file-per-game tables in nba_boxscores and the
+per-team season tables in nba_team_stats_YYYY
+
+Every file may be plain CSV or zstd-compressed (<name>.csv.zst, zstd_codec.py);
+csv_files() lists either form and the readers decompress transparently. The
+2025-26 box tables may also live in segment files (segments.py), listed as
+SegmentRefs that read_csvs() reads like files.
+"""
+
+import re
+import unicodedata
+import concurrent.futures
+from collections import defaultdict
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from zstandard import ZstdError
+
+from config import BOXSCORE_DIR, MAX_WORKERS, NBA_DIR, SEASON_BOX_DIRS, TEAM_STATS_GLOB
+from segments import SegmentRef, list_blocks
+from zstd_codec import SUFFIX, compressed_path, read_bytes
+
+# Per-game table types written by the quarters/advanced scraper
+GAME_TABLES = ["four_factors", "line_scores", "quarters", "team_basic", "team_advanced"]
+
+GAME_ID_PATTERN = re.compile(r"(\d{8}0[A-Z]{3})")
+BOX_TABLE_PATTERN = re.compile(r"box-([A-Z]{3})-(.+)")
+
+# Rows of the 2025-26 box tables that are section headers/totals, not players
+NON_PLAYER_ROWS = {"Starters", "Reserves", "Team Totals"}
+
+# ESPN roster folders are slugified team names (see scrape_player_images.py)
+ESPN_TEAM_CODES = {
+    "atlantahawks": "ATL", "bostonceltics": "BOS", "brooklynnets": "BRK",
+    "charlottehornets": "CHO", "chicagobulls": "CHI", "clevelandcavaliers": "CLE",
+    "dallasmavericks": "DAL", "denvernuggets": "DEN", "detroitpistons": "DET",
+    "goldenstatewarriors": "GSW", "houstonrockets": "HOU", "indianapacers": "IND",
+    "laclippers": "LAC", "losangeleslakers": "LAL", "memphisgrizzlies": "MEM",
+    "miamiheat": "MIA", "milwaukeebucks": "MIL", "minnesotatimberwolves": "MIN",
+    "neworleanspelicans": "NOP", "newyorkknicks": "NYK", "oklahomacitythunder": "OKC",
+    "orlandomagic": "ORL", "philadelphia76ers": "PHI", "phoenixsuns": "PHO",
+    "portlandtrailblazers": "POR", "sacramentokings": "SAC", "sanantoniospurs": "SAS",
+    "torontoraptors": "TOR", "utahjazz": "UTA", "washingtonwizards": "WAS",
+}
+
+# FBref team tables written by premier_scapper.py: <team>_<table>_<YYYY-MM-DD>.csv
+FBREF_TABLES = [
+    "adv_goalkeeping", "goal_creation_stats", "goalkeeping", "match_logs_schedule",
+    "miscellaneous_stats", "passing_stats", "passing_types_stats", "player_defensive_actions_stats",
+    "player_possession_stats", "player_stats_standard", "playing_time_stats", "shooting_stats",
+    "league_stats",
+]
+FBREF_FILE_PATTERN = re.compile(
+    r"^(?P<team>.+?)_(?P<table>" + "|".join(sorted(FBREF_TABLES, key=len, reverse=True))
+    + r")_(?P<date>\d{4}-\d{2}-\d{2})\.csv(\.zst)?$"
+)
+
+# team_data/ and ESPN use different codes than basketball-reference box scores
+TEAM_CODE_ALIASES = {"BKN": "BRK", "CHA": "CHO", "PHX": "PHO"}
+
+
+# =========================
+# FILE DISCOVERY
+# =========================
+def game_id_from_path(path) -> Optional[str]:
+    """Extract the basketball-reference game id (e.g. 201910220LAC) from a file name"""
+    m = GAME_ID_PATTERN.search(Path(path).name)
+    return m.group(1) if m else None
+
+
+def csv_files(directory: Path, pattern: str) -> List[Path]:
+    """Files matching a *.csv glob pattern, plain or compressed; a compressed copy wins"""
+    found = {path: path for path in Path(directory).glob(pattern)}
+    for path in Path(directory).glob(pattern + SUFFIX):
+        found[path.with_name(path.name[:-len(SUFFIX)])] = path
+    return [found[p] for p in sorted(found)]
+
+
+def existing_csv(path: Path) -> Path:
+    """The compressed copy of path if there is one, else path"""
+    compressed = compressed_path(path)
+    return compressed if compressed.exists() else Path(path)
+
+
+def list_game_files(table: str, directory: Path = BOXSCORE_DIR) -> Dict[str, Path]:
+    """Map game_id -> file for one per-game table type, ignoring Zone.Identifier side files"""
+    files = {}
+    for path in csv_files(directory, f"{table}_*.csv"):
+        gid = game_id_from_path(path)
+        if gid:
+            files[gid] = path
+    return files
+
+
+def list_team_box_files(kind: str = "game-basic",
+                        directories: Iterable[Path] = SEASON_BOX_DIRS) -> Dict[Tuple[str, str], Path]:
+    """Map (game_id, team) -> file for the per-team tables/box-<TEAM>-<kind>/ layout
+
+    Tables written to segments (segments.py) are included as SegmentRefs for
+    the games without a per-file copy.
+    """
+    directories = list(directories)
+    files = {}
+    for directory in directories:
+        for table_dir in sorted(Path(directory).glob(f"tables/box-*-{kind}")):
+            m = BOX_TABLE_PATTERN.match(table_dir.name)
+            if not m:
+                continue
+            for path in csv_files(table_dir, "*.csv"):
+                gid = game_id_from_path(path)
+                if gid:
+                    files.setdefault((gid, m.group(1)), path)
+    for key, ref in list_blocks(kind, directories).items():
+        files.setdefault(key, ref)
+    return files
+
+
+def team_stat_files(table: str, directory: Path = NBA_DIR) -> List[Tuple[int, str, Path]]:
+    """(season, team, path) for one team-stats table, e.g. table="per_game_stats"
+
+    Folders are named by the season's end year (nba_team_stats_2024 = 2023-24);
+    the returned season uses the start-year convention of run_elo.py.
+    """
+    found = []
+    for season_dir in sorted(Path(directory).glob(TEAM_STATS_GLOB)):
+        year = season_dir.name.rsplit("_", 1)[-1]
+        if not year.isdigit():
+            continue
+        for team_dir in sorted(p for p in season_dir.iterdir() if p.is_dir()):
+            path = existing_csv(team_dir / f"{team_dir.name}_{table}_{year}.csv")
+            if path.exists():
+                found.append((int(year) - 1, team_dir.name, path))
+    return found
+
+
+def canonical_team(code: str) -> str:
+    """basketball-reference team code for any of the codes used across sources"""
+    code = str(code).strip().upper()
+    return TEAM_CODE_ALIASES.get(code, code)
+
+
+def espn_team_code(folder: str) -> Optional[str]:
+    """Team code for an ESPN roster folder name such as 'golden_statewarriors'"""
+    return ESPN_TEAM_CODES.get(re.sub(r"[^a-z0-9]", "", str(folder).lower()))
+
+
+def normalize_name(name) -> str:
+    """Accent-insensitive, whitespace-collapsed player name (same rules as run_elo.py)"""
+    if pd.isna(name):
+        return ""
+    name = " ".join(str(name).split())
+    return unicodedata.normalize("NFKD", name).encode("ASCII", "ignore").decode("ASCII")
+
+
+def season_from_game_id(game_id: str) -> int:
+    """NBA season label (start year) from a game id, e.g. 202401100BOS -> 2023"""
+    year, month = int(game_id[:4]), int(game_id[4:6])
+    return year if month >= 10 else year - 1
+
+
+def soccer_season(day) -> int:
+    """European season label (start year): August 2025 - May 2026 -> 2025"""
+    day = pd.Timestamp(day)
+    return day.year if day.month >= 7 else day.year - 1
+
+
+def season_from_dates(dates: pd.Series) -> pd.Series:
+    """NBA season label (start year) for each game date, e.g. 2024-01-10 -> 2023"""
+    dates = pd.to_datetime(dates, errors="coerce")
+    return (dates.dt.year - (dates.dt.month < 10).astype(int)).astype("Int64")
+
+
+# =========================
+# READING
+# =========================
+def _read_bytes(path: Path) -> Optional[bytes]:
+    try:
+        if isinstance(path, SegmentRef):
+            return path.read()
+        return read_bytes(path)
+    except (OSError, ZstdError) as e:
+        print(f"Skipping unreadable file {path}: {e}")
+        return None
+
+
+def _parse(header: bytes, bodies: List[bytes], usecols=None) -> pd.DataFrame:
+    text = header + b"\n" + b"\n".join(body.rstrip(b"\r\n") for body in bodies if body.strip())
+    cols = None if usecols is None else (lambda c: c in usecols)
+    return pd.read_csv(BytesIO(text), usecols=cols)
+
+
+def read_csvs(paths: Iterable[Path], usecols: Optional[List[str]] = None,
+              max_workers: int = MAX_WORKERS) -> pd.DataFrame:
+    """Read many small CSVs and concatenate them (columns aligned by name)
+
+    Files are read as raw bytes concurrently and grouped by header line, so each
+    distinct header is parsed once instead of paying pandas' per-call overhead
+    for every file.
+    """
+    paths = list(paths)
+    if not paths:
+        return pd.DataFrame(columns=usecols or [])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        contents = list(pool.map(_read_bytes, paths))
+
+    groups = defaultdict(list)
+    for data in contents:
+        if not data or not data.strip():
+            continue
+        header, _, body = data.partition(b"\n")
+        groups[header.rstrip(b"\r")].append(body)
+
+    frames = []
+    for header, bodies in groups.items():
+        try:
+            frames.append(_parse(header, bodies, usecols))
+        except (pd.errors.EmptyDataError, pd.errors.ParserError):
+            # Fall back to one parse per file so a single bad file only drops itself
+            for body in bodies:
+                try:
+                    frames.append(_parse(header, [body], usecols))
+                except (pd.errors.EmptyDataError, pd.errors.ParserError) as e:
+                    print(f"Skipping unparseable file ({header[:40]!r}...): {e}")
+
+    if not frames:
+        return pd.DataFrame(columns=usecols or [])
+    return pd.concat(frames, ignore_index=True)
+
+
+def flatten_columns(columns: pd.MultiIndex) -> List[str]:
+    """Two header rows -> one: 'Per 90 Minutes' + 'Gls' -> 'Per 90 Minutes Gls'
+
+    Unnamed groups keep the bare column name; remaining duplicates get pandas'
+    '.1', '.2' suffixes.
+    """
+    names, seen = [], defaultdict(int)
+    for top, name in columns:
+        top, name = str(top), str(name)
+        if name.startswith("Unnamed:"):
+            flat = "" if top.startswith("Unnamed:") else top
+        else:
+            flat = name if top.startswith("Unnamed:") else f"{top} {name}"
+        names.append(f"{flat}.{seen[flat]}" if seen[flat] else flat)
+        seen[flat] += 1
+    return names
+
+
+def read_table_file(path: Path) -> pd.DataFrame:
+    """Read one scraped HTML table, flattening the two-row headers of grouped tables
+
+    basketball-reference shooting/pbp tables and the FBref tables are written with
+    a pandas MultiIndex header whose first row starts with 'Unnamed: 0_level_0'.
+    """
+    data = read_bytes(path)
+    if not data.startswith(b"Unnamed: 0_level_0"):
+        return pd.read_csv(BytesIO(data))
+    df = pd.read_csv(BytesIO(data), header=[0, 1])
+    df.columns = flatten_columns(df.columns)
+    return df
+
+
+def read_csv(path: Path, **kwargs) -> pd.DataFrame:
+    """pd.read_csv for a plain or zstd-compressed file"""
+    return pd.read_csv(BytesIO(read_bytes(path)), **kwargs)
+
+
+def read_game_table(table: str, game_ids: Optional[Iterable[str]] = None,
+                    usecols: Optional[List[str]] = None,
+                    directory: Path = BOXSCORE_DIR, with_keys: bool = False) -> pd.DataFrame:
+    """Load one per-game table type, optionally restricted to a set of game ids
+
+    with_keys=True appends the int32 surrogate columns of dimensions.py
+    (game_sk, team_sk, player_sk where the table has those columns).
+    """
+    files = list_game_files(table, directory)
+    if game_ids is not None:
+        wanted = set(game_ids)
+        files = {gid: path for gid, path in files.items() if gid in wanted}
+    df = read_csvs(files.values(), usecols=usecols)
+    if with_keys:
+        from dimensions import add_keys
+        df = add_keys(df, source="bbref_boxscores")
+    return df
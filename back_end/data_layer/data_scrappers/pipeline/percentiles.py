@@ -0,0 +1,315 @@
+"""
+LEAGUE PERCENTILE ENGINE
+Presorted stat arrays per (season, position group, stat) answering percentile
+queries with binary search instead of pandas rank() over the season tables.
+
+Sources per season:
+- nba_team_stats_YYYY/<TEAM>/<TEAM>_per_game_stats_YYYY.csv and _advanced_YYYY.csv
+- season averages of plus_minus / game_score from the team_basic_*.csv box scores
+
+A season is only rebuilt when one of its source files changed (size/mtime).
+
+Usage:
+    python percentiles.py                 # rebuild changed seasons
+    python percentiles.py --rebuild       # rebuild every season
+    python percentiles.py --card "Trae Young" --season 2023
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import PERCENTILE_DIR
+from loaders import list_game_files, normalize_name, read_csvs, season_from_dates, team_stat_files
+
+# =========================
+# CONFIGURATION
+# =========================
+MANIFEST_FILE = PERCENTILE_DIR / "manifest.json"
+
+MIN_GAMES = 10  # population only includes players with at least this many games
+POSITION_GROUPS = {"PG": "G", "SG": "G", "SF": "F", "PF": "F", "C": "C"}
+ALL_POSITIONS = "ALL"
+
+# Stats where a smaller value is better; their percentile is inverted
+LOWER_IS_BETTER = {"tov", "pf", "tov_pct"}
+
+# Columns of the season tables that are identifiers, not stats
+NON_STAT_COLUMNS = {"rk", "player", "age", "pos", "g", "gs", "awards", "team"}
+BOX_SCORE_STATS = ["plus_minus", "game_score"]
+
+
+def stat_name(col: str) -> str:
+    """Canonical stat key for a basketball-reference header, e.g. '3P%' -> '3p_pct'"""
+    col = str(col).strip().lower()
+    for old, new in (("%", "_pct"), ("/", "_per_"), ("+", "_plus"), ("-", "_")):
+        col = col.replace(old, new)
+    return "_".join(filter(None, "".join(c if c.isalnum() else "_" for c in col).split("_")))
+
+
+def position_group(pos) -> str:
+    if not isinstance(pos, str) or not pos:
+        return ALL_POSITIONS
+    return POSITION_GROUPS.get(pos.split("-")[0].strip(), ALL_POSITIONS)
+
+
+# =========================
+# SOURCES
+# =========================
+def season_sources() -> Dict[int, List[Path]]:
+    """All source files per season, used both for building and for change detection"""
+    sources = defaultdict(list)
+    for table in ("per_game_stats", "advanced"):
+        for season, _, path in team_stat_files(table):
+            sources[season].append(path)
+
+    box_files = list_game_files("team_basic")
+    box_seasons = season_from_dates(pd.Series(pd.to_datetime([g[:8] for g in box_files], format="%Y%m%d")))
+    for path, season in zip(box_files.values(), box_seasons):
+        sources[int(season)].append(path)
+    return dict(sources)
+
+
+def fingerprint(paths: Iterable[Path]) -> str:
+    """Cheap change detector: names, sizes and mtimes of a season's source files"""
+    h = hashlib.sha1()
+    for path in sorted(paths):
+        st = os.stat(path)
+        h.update(f"{path.name}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def position_lookup() -> Dict[str, str]:
+    """player_key -> most recent listed position across all team-stats seasons"""
+    paths = [path for _, _, path in sorted(team_stat_files("per_game_stats"))]
+    df = read_csvs(paths, usecols=["Player", "Pos"]).dropna()
+    df = df[df["Player"] != "Team Totals"]
+    return dict(zip(df["Player"].map(normalize_name), df["Pos"]))
+
+
+def _read_team_stats(paths: List[Path]) -> pd.DataFrame:
+    df = read_csvs(paths)
+    if df.empty:
+        return df
+    df = df[df["Player"].notna() & (df["Player"] != "Team Totals")]
+    df.columns = [stat_name(c) for c in df.columns]
+    return df.drop(columns=[c for c in ("rk", "awards") if c in df.columns])
+
+
+def _combine_stints(df: pd.DataFrame, weight: str) -> pd.DataFrame:
+    """One row per player: traded players get a weighted mean over their team stints"""
+    stats = [c for c in df.columns if c not in NON_STAT_COLUMNS and c != "player_key"]
+    df = df.copy()
+    df[stats] = df[stats].apply(pd.to_numeric, errors="coerce")
+    df[weight] = pd.to_numeric(df[weight], errors="coerce").fillna(0)
+
+    w = df[weight].clip(lower=1e-9)
+    weighted = df[stats].mul(w, axis=0)
+    weighted["_w"] = w.where(df[stats].notna().any(axis=1), 0)
+    grouped = weighted.groupby(df["player_key"]).sum(min_count=1)
+    out = grouped[stats].div(grouped["_w"], axis=0)
+
+    # Identity from the longest stint
+    primary = df.sort_values(weight, ascending=False).drop_duplicates("player_key")
+    primary = primary.set_index("player_key")[["player", "pos", "g"]]
+    primary["g"] = df.groupby("player_key")["g"].apply(lambda s: pd.to_numeric(s, errors="coerce").sum())
+    return primary.join(out)
+
+
+def build_season_table(season: int, paths: List[Path]) -> pd.DataFrame:
+    """Player-season stat table for one season"""
+    by_kind = defaultdict(list)
+    for path in paths:
+        kind = "advanced" if "_advanced_" in path.name else "per_game" if "_per_game_stats_" in path.name else "box"
+        by_kind[kind].append(path)
+
+    players = None
+    for kind in ("per_game", "advanced"):
+        df = _read_team_stats(by_kind[kind])
+        if df.empty:
+            continue
+        df["player_key"] = df["player"].map(normalize_name)
+        df = _combine_stints(df, "g")
+        if players is None:
+            players = df
+        else:
+            players = players.join(df.drop(columns=["player", "pos", "g", "mp"], errors="ignore"), how="outer")
+
+    box = read_csvs(by_kind["box"], usecols=["player"] + BOX_SCORE_STATS)
+    if not box.empty:
+        box["player_key"] = box["player"].map(normalize_name)
+        for col in BOX_SCORE_STATS:
+            box[col] = pd.to_numeric(box[col], errors="coerce")
+        avg = box.groupby("player_key").agg(
+            box_games=("player", "size"), **{col: (col, "mean") for col in BOX_SCORE_STATS}
+        )
+        players = avg if players is None else players.join(avg, how="outer")
+
+    if players is None:
+        return pd.DataFrame()
+
+    players = players.reset_index().rename(columns={"index": "player_key"})
+    if "pos" not in players:
+        players["pos"] = np.nan
+    # Box-score-only players take their position from any other season
+    players["pos"] = players["pos"].fillna(players["player_key"].map(position_lookup()))
+    players["player"] = players.get("player", pd.Series(dtype=object)).fillna(players["player_key"])
+    players["season"] = season
+    players["pos_group"] = players["pos"].map(position_group)
+    return players
+
+
+def sorted_arrays(players: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """'<group>/<stat>' -> ascending array of qualified players' values"""
+    games = players["g"].fillna(players.get("box_games", 0)) if "g" in players else players["box_games"]
+    qualified = players[games.fillna(0) >= MIN_GAMES]
+
+    stats = [c for c in qualified.columns if c not in NON_STAT_COLUMNS
+             and c not in ("player_key", "season", "pos_group", "box_games")]
+    groups = [(ALL_POSITIONS, qualified)]
+    groups += [(g, m) for g, m in qualified.groupby("pos_group") if g != ALL_POSITIONS]
+
+    arrays = {}
+    for group, members in groups:
+        values = members[stats].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        for i, stat in enumerate(stats):
+            col = values[:, i]
+            col = col[~np.isnan(col)]
+            if col.size:
+                arrays[f"{group}/{stat}"] = np.sort(col)
+    return arrays
+
+
+# =========================
+# STORAGE
+# =========================
+def _season_files(season: int):
+    return PERCENTILE_DIR / f"season_{season}.npz", PERCENTILE_DIR / f"players_{season}.parquet"
+
+
+def _load_manifest() -> dict:
+    if MANIFEST_FILE.exists():
+        return json.loads(MANIFEST_FILE.read_text())
+    return {}
+
+
+def build(rebuild: bool = False) -> List[int]:
+    """Rebuild the arrays of every season whose sources changed; returns rebuilt seasons"""
+    PERCENTILE_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = {} if rebuild else _load_manifest()
+    rebuilt = []
+
+    for season, paths in sorted(season_sources().items()):
+        fp = fingerprint(paths)
+        if manifest.get(str(season)) == fp and all(f.exists() for f in _season_files(season)):
+            continue
+
+        print(f"Building season {season} from {len(paths)} files...")
+        players = build_season_table(season, paths)
+        if players.empty:
+            continue
+
+        arrays_file, players_file = _season_files(season)
+        np.savez(arrays_file, **sorted_arrays(players))
+        players.to_parquet(players_file, index=False)
+        manifest[str(season)] = fp
+        rebuilt.append(season)
+
+    MANIFEST_FILE.write_text(json.dumps(manifest, indent=2))
+    return rebuilt
+
+
+# =========================
+# QUERIES
+# =========================
+class PercentileEngine:
+    """Answers percentile queries from the precomputed sorted arrays"""
+
+    def __init__(self, directory: Path = PERCENTILE_DIR):
+        self.directory = Path(directory)
+        self._arrays = {}
+        self._players = {}
+
+    def _season(self, season: int) -> Dict[str, np.ndarray]:
+        if season not in self._arrays:
+            path = self.directory / f"season_{season}.npz"
+            if not path.exists():
+                raise KeyError(f"No percentile arrays for season {season}; run percentiles.py")
+            with np.load(path) as data:
+                self._arrays[season] = {k: data[k] for k in data.files}
+        return self._arrays[season]
+
+    def stats(self, season: int, position: str = ALL_POSITIONS) -> List[str]:
+        group = self._group(position)
+        return sorted(k.split("/", 1)[1] for k in self._season(season) if k.startswith(f"{group}/"))
+
+    @staticmethod
+    def _group(position: str) -> str:
+        position = (position or ALL_POSITIONS).upper()
+        if position in (ALL_POSITIONS, "G", "F", "C"):
+            return position
+        return position_group(position)
+
+    def percentile(self, season: int, position: str, stat: str, values) -> np.ndarray:
+        """Percent of the population at or below each value (vectorized over values)"""
+        population = self._season(season).get(f"{self._group(position)}/{stat}")
+        values = np.asarray(values, dtype=np.float64)
+        if population is None or population.size == 0:
+            return np.full(values.shape, np.nan)
+
+        pct = np.searchsorted(population, values, side="right") / population.size * 100
+        if stat in LOWER_IS_BETTER:
+            pct = 100 - np.searchsorted(population, values, side="left") / population.size * 100
+        return np.where(np.isnan(values), np.nan, pct)
+
+    def card(self, season: int, position: str, values: Dict[str, float]) -> Dict[str, float]:
+        """Percentiles for a whole player card {stat: value} in one call"""
+        return {stat: float(self.percentile(season, position, stat, value)) for stat, value in values.items()}
+
+    def player_card(self, season: int, player: str, position: Optional[str] = None) -> Dict[str, float]:
+        """Percentiles of every stored stat for a player, among their position group by default"""
+        if season not in self._players:
+            self._players[season] = pd.read_parquet(self.directory / f"players_{season}.parquet")
+        table = self._players[season]
+
+        row = table[table["player_key"] == normalize_name(player)]
+        if row.empty:
+            raise KeyError(f"{player} not found in season {season}")
+        row = row.iloc[0]
+
+        position = position or row["pos_group"]
+        stats = [s for s in self.stats(season, position) if s in row.index]
+        return self.card(season, position, {s: pd.to_numeric(row[s], errors="coerce") for s in stats})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build/query league percentile arrays")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild every season")
+    parser.add_argument("--card", help="print a player's percentile card")
+    parser.add_argument("--season", type=int, help="season start year for --card")
+    parser.add_argument("--position", help="position group for --card (G/F/C/ALL)")
+    args = parser.parse_args()
+
+    if args.card:
+        card = PercentileEngine().player_card(args.season, args.card, args.position)
+        for stat, pct in card.items():
+            print(f"  {stat:>14}: {pct:5.1f}")
+        return
+
+    start = time.time()
+    rebuilt = build(rebuild=args.rebuild)
+    print(f"Rebuilt seasons: {rebuilt or 'none'} in {time.time() - start:.1f}s -> {PERCENTILE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+PLAYER-GAME MATRIX
+Fixed-schema binary matrix of per-player-game box-score stats that readers open
+with np.memmap instead of reparsing the box-score CSVs.
+
+player_games.bin layout (little endian):
+    header   64 bytes   magic, version, n_rows, n_int_cols, n_float_cols, n_players, build_id
+    ints     int32   [n_rows, n_int_cols]     ids, dates, flags
+    floats   float32 [n_rows, n_float_cols]   stats (NaN = missing)
+    offsets  int64   [n_players + 1]          first row of each player
+
+player_games.json is the sidecar with column names and the player/team/game
+dictionaries that map the int ids back to names. Rows are sorted by
+(player_id, date), so one player's games are the contiguous slice
+offsets[p]:offsets[p + 1].
+
+The file is written to a temp name and renamed, so readers that already have
+it mapped keep a consistent (old) copy while a rebuild runs. Every process
+mapping the file shares the same pages through the OS cache. The two files are
+renamed one after the other; each build stamps a random build_id into both,
+and PlayerGameMatrix only pairs a matrix with the sidecar of the same build.
+
+Usage:
+    python player_matrix.py                       # build
+    python player_matrix.py --player "Jayson Tatum"
+"""
+
+import argparse
+import json
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from compact import normalize_season_basic
+from config import MATRIX_DIR
+from loaders import (canonical_team, list_game_files, list_team_box_files, normalize_name, read_csvs,
+                     season_from_dates)
+
+# =========================
+# CONFIGURATION
+# =========================
+MATRIX_FILE = MATRIX_DIR / "player_games.bin"
+SIDECAR_FILE = MATRIX_DIR / "player_games.json"
+
+MAGIC = b"FSPGMTRX"
+VERSION = 2
+HEADER = struct.Struct("<8sIQIII16s")  # magic, version, n_rows, n_int, n_float, n_players, build_id
+HEADER_SIZE = 64
+
+# A reader that opens the files between the two renames of a build tries again
+OPEN_ATTEMPTS = 20
+OPEN_RETRY_DELAY = 0.05
+
+INT_COLUMNS = ["player_id", "team_id", "opp_id", "game_idx", "date", "season", "is_home"]
+FLOAT_COLUMNS = ["mp", "pts", "trb", "orb", "drb", "ast", "stl", "blk", "tov", "pf",
+                 "fg", "fga", "fg3", "fg3a", "ft", "fta", "plus_minus", "game_score", "bpm"]
+BOX_COLUMNS = ["game_id", "team", "player"] + [c for c in FLOAT_COLUMNS if c != "bpm"]
+
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+# =========================
+# BUILD
+# =========================
+def load_player_games() -> pd.DataFrame:
+    """One row per player-game with basic stats and bpm (2025-26 rows have no bpm)"""
+    basic_files = list_game_files("team_basic")
+    basic = read_csvs(basic_files.values(), usecols=BOX_COLUMNS)
+
+    season_files = [p for (gid, _), p in list_team_box_files("game-basic").items() if gid not in basic_files]
+    if season_files:
+        season = normalize_season_basic(read_csvs(season_files))
+        basic = pd.concat([basic, season[[c for c in BOX_COLUMNS if c in season.columns]]], ignore_index=True)
+
+    adv = read_csvs(list_game_files("team_advanced").values(), usecols=["game_id", "team", "player", "bpm"])
+    df = basic.merge(adv.drop_duplicates(["game_id", "team", "player"]), on=["game_id", "team", "player"], how="left")
+
+    df["team"] = df["team"].map(canonical_team)
+    df["player_key"] = df["player"].map(normalize_name)
+    df = df[df["player_key"] != ""].drop_duplicates(["player_key", "game_id"])
+    df["game_date"] = pd.to_datetime(df["game_id"].str[:8], format="%Y%m%d")
+
+    teams = df.groupby("game_id")["team"].unique()
+    opponent = {(gid, t[0]): t[1] for gid, t in teams.items() if len(t) == 2}
+    opponent.update({(gid, t[1]): t[0] for gid, t in teams.items() if len(t) == 2})
+    df["opponent"] = [opponent.get(k) for k in zip(df["game_id"], df["team"])]
+    return df
+
+
+def build() -> int:
+    start = time.time()
+    df = load_player_games()
+
+    players = pd.Index(sorted(df["player_key"].unique()))
+    teams = pd.Index(sorted(set(df["team"]) | set(df["opponent"].dropna())))
+    games = pd.Index(sorted(df["game_id"].unique()))
+
+    df["player_id"] = players.get_indexer(df["player_key"])
+    df = df.sort_values(["player_id", "game_date", "game_id"]).reset_index(drop=True)
+
+    ints = np.empty((len(df), len(INT_COLUMNS)), dtype="<i4")
+    ints[:, 0] = df["player_id"]
+    ints[:, 1] = teams.get_indexer(df["team"])
+    ints[:, 2] = teams.get_indexer(df["opponent"])  # -1 when unknown
+    ints[:, 3] = games.get_indexer(df["game_id"])
+    ints[:, 4] = (df["game_date"].to_numpy().astype("datetime64[D]") - EPOCH).astype(np.int32)
+    ints[:, 5] = season_from_dates(df["game_date"]).to_numpy(dtype=np.int32)
+    ints[:, 6] = (df["game_id"].str[-3:] == df["team"]).to_numpy(dtype=np.int32)
+
+    floats = np.column_stack([pd.to_numeric(df[c], errors="coerce").to_numpy(dtype="<f4") for c in FLOAT_COLUMNS])
+    offsets = np.searchsorted(ints[:, 0], np.arange(len(players) + 1)).astype("<i8")
+
+    # Display name per player: the most common spelling
+    names = df.groupby("player_id")["player"].agg(lambda s: s.value_counts().index[0])
+
+    MATRIX_DIR.mkdir(parents=True, exist_ok=True)
+    build_id = os.urandom(16)
+    tmp = MATRIX_FILE.with_name(MATRIX_FILE.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(df), len(INT_COLUMNS), len(FLOAT_COLUMNS), len(players), build_id)
+                .ljust(HEADER_SIZE, b"\0"))
+        f.write(np.ascontiguousarray(ints).tobytes())
+        f.write(np.ascontiguousarray(floats).tobytes())
+        f.write(offsets.tobytes())
+
+    sidecar = {
+        "version": VERSION,
+        "build_id": build_id.hex(),
+        "int_columns": INT_COLUMNS,
+        "float_columns": FLOAT_COLUMNS,
+        "players": names.reindex(range(len(players))).tolist(),
+        "player_keys": players.tolist(),
+        "teams": teams.tolist(),
+        "games": games.tolist(),
+    }
+    tmp_sidecar = SIDECAR_FILE.with_name(SIDECAR_FILE.name + ".tmp")
+    tmp_sidecar.write_text(json.dumps(sidecar))
+    tmp_sidecar.replace(SIDECAR_FILE)
+    tmp.replace(MATRIX_FILE)
+
+    size = MATRIX_FILE.stat().st_size / 1e6
+    print(f"{len(df):,} player-games x {len(INT_COLUMNS) + len(FLOAT_COLUMNS)} columns, "
+          f"{len(players):,} players, {size:.1f} MB in {time.time() - start:.1f}s -> {MATRIX_FILE}")
+    return len(df)
+
+
+# =========================
+# READER
+# =========================
+class PlayerGameMatrix:
+    """Read-only memory-mapped view of player_games.bin
+
+    Nothing is read until a column is touched; ints/floats are np.memmap views
+    and column() returns strided views into them (no copies).
+    """
+
+    def __init__(self, path: Path = MATRIX_FILE, sidecar: Path = SIDECAR_FILE):
+        for attempt in range(OPEN_ATTEMPTS):
+            # the views map the file whose header was read, even if a rebuild renames a new one over it
+            f = open(path, "rb")
+            magic, version, n_rows, n_int, n_float, n_players, build_id = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                f.close()
+                raise ValueError(f"{path} is not a version {VERSION} player-game matrix")
+            meta = json.loads(Path(sidecar).read_text())
+            if meta.get("build_id") == build_id.hex():
+                break
+            f.close()
+            time.sleep(OPEN_RETRY_DELAY)
+        else:
+            raise ValueError(f"{sidecar} is not the sidecar of {path} (different builds)")
+
+        self.int_columns: List[str] = meta["int_columns"]
+        self.float_columns: List[str] = meta["float_columns"]
+        self.players: List[str] = meta["players"]
+        self.teams: List[str] = meta["teams"]
+        self.games: List[str] = meta["games"]
+        self._player_ids: Dict[str, int] = {k: i for i, k in enumerate(meta["player_keys"])}
+
+        self.n_rows = n_rows
+        with f:
+            if n_rows == 0:
+                # built before there were box scores: nothing to map, and zero-length maps fail on some platforms
+                self.ints = np.empty((0, n_int), dtype="<i4")
+                self.floats = np.empty((0, n_float), dtype="<f4")
+                self.offsets = np.zeros(n_players + 1, dtype="<i8")
+                return
+            offset = HEADER_SIZE
+            self.ints = np.memmap(f, dtype="<i4", mode="r", offset=offset, shape=(n_rows, n_int))
+            offset += self.ints.nbytes
+            self.floats = np.memmap(f, dtype="<f4", mode="r", offset=offset, shape=(n_rows, n_float))
+            offset += self.floats.nbytes
+            self.offsets = np.memmap(f, dtype="<i8", mode="r", offset=offset, shape=(n_players + 1,))
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def column(self, name: str) -> np.ndarray:
+        if name in self.float_columns:
+            return self.floats[:, self.float_columns.index(name)]
+        return self.ints[:, self.int_columns.index(name)]
+
+    def dates(self, rows: slice = slice(None)) -> np.ndarray:
+        return EPOCH + self.ints[rows, self.int_columns.index("date")].astype("timedelta64[D]")
+
+    def player_id(self, name: str) -> Optional[int]:
+        return self._player_ids.get(normalize_name(name))
+
+    def player_rows(self, name: str) -> slice:
+        """Row slice of one player's games (empty slice if unknown)"""
+        pid = self.player_id(name)
+        if pid is None:
+            return slice(0, 0)
+        return slice(int(self.offsets[pid]), int(self.offsets[pid + 1]))
+
+    def to_frame(self, rows=slice(None), columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Decode rows into a DataFrame with names instead of ids"""
+        columns = columns or self.int_columns + self.float_columns
+        out = {}
+        for col in columns:
+            values = np.asarray(self.column(col)[rows])
+            if col == "player_id":
+                out["player"] = np.asarray(self.players, dtype=object)[values]
+            elif col in ("team_id", "opp_id"):
+                lookup = np.asarray(self.teams + [None], dtype=object)
+                out[col[:-3] if col == "team_id" else "opponent"] = lookup[values]
+            elif col == "game_idx":
+                out["game_id"] = np.asarray(self.games, dtype=object)[values]
+            elif col == "date":
+                out["game_date"] = EPOCH + values.astype("timedelta64[D]")
+            else:
+                out[col] = values
+        return pd.DataFrame(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build/query the memory-mapped player-game matrix")
+    parser.add_argument("--player", help="print one player's games instead of building")
+    args = parser.parse_args()
+
+    if args.player:
+        start = time.time()
+        matrix = PlayerGameMatrix()
+        games = matrix.to_frame(matrix.player_rows(args.player))
+        print(games.tail(10).to_string(index=False))
+        print(f"{len(games)} games of {len(matrix):,} rows in {(time.time() - start) * 1000:.1f} ms")
+        return
+    build()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+RUN PROFILER
+Where the wall time of a nightly run goes: page loads, politeness sleeps, HTML
+parsing, CSV writes, Elo replay. Scrapers and pipeline scripts wrap their work
+in timed spans with a category
+
+    network   page loads and HTTP requests
+    sleep     politeness and retry delays
+    parse     HTML/CSV parsing
+    io        reading and writing files
+    compute   everything else worth naming (rating, aggregation, ...)
+
+Spans nest; a category total counts each span's self time (its time minus
+that of the spans inside it), so nothing is counted twice. With memory
+profiling on, each span also records the peak of Python allocations
+(tracemalloc) above its starting point.
+
+Profiling is off unless FORESIGHT_PROFILE=1; spans then cost a flag check.
+Each profiled process writes <script>-<pid>.json to FORESIGHT_PROFILE_DIR
+(default PROFILE_DIR) at exit, and `report` merges a folder of them into
+report.json and report.html with per-category and per-script totals and the
+slowest spans. dag.py --profile does all of that for a pipeline run.
+
+Usage:
+    from profiler import span, timed, record_sleeps
+    with span("network", url):
+        driver.get(url)
+    @timed("compute")
+    def rate_games(...): ...
+    record_sleeps()        # time.sleep outside any span counts as "sleep"
+
+    FORESIGHT_PROFILE=1 FORESIGHT_PROFILE_MEMORY=1 python elo_incremental.py --rebuild
+    python profiler.py report                 # PROFILE_DIR
+    python profiler.py report path/to/run --top 30
+"""
+
+import argparse
+import atexit
+import functools
+import html
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import PROFILE_DIR
+
+# =========================
+# CONFIGURATION
+# =========================
+CATEGORIES = ["network", "sleep", "parse", "io", "compute"]
+TOP_N = 20
+
+ENABLED = os.getenv("FORESIGHT_PROFILE", "0") == "1"
+MEMORY = os.getenv("FORESIGHT_PROFILE_MEMORY", "0") == "1"
+OUTPUT_DIR = Path(os.getenv("FORESIGHT_PROFILE_DIR", PROFILE_DIR))
+
+
+# =========================
+# RECORDING
+# =========================
+class _Open:
+    __slots__ = ("category", "name", "start", "child_seconds", "mem_start", "child_peak")
+
+    def __init__(self, category: str, name: str, mem_start: int):
+        self.category = category
+        self.name = name
+        self.start = time.perf_counter()
+        self.child_seconds = 0.0
+        self.mem_start = mem_start
+        self.child_peak = 0
+
+
+class Profiler:
+    """Spans of one process; one instance per process is enough"""
+
+    def __init__(self, memory: bool = MEMORY):
+        self.memory = memory
+        self.spans: List[Dict] = []
+        self.started = time.time()
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stack(self) -> List[_Open]:
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def active(self) -> bool:
+        return bool(self._stack())
+
+    @contextmanager
+    def span(self, category: str, name: str):
+        stack = self._stack()
+        mem_start = 0
+        if self.memory:
+            mem_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        current = _Open(category, name, mem_start)
+        stack.append(current)
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            seconds = end - current.start
+            record = {"category": category, "name": name, "start": round(current.start - self.origin, 4),
+                      "seconds": round(seconds, 6), "self_seconds": round(seconds - current.child_seconds, 6),
+                      "thread": threading.current_thread().name}
+            if self.memory:
+                # a child's reset_peak hides the peak before it, so children report theirs upwards
+                peak = max(tracemalloc.get_traced_memory()[1], current.child_peak)
+                record["peak_mb"] = round((peak - current.mem_start) / 1e6, 3)
+            if stack:
+                stack[-1].child_seconds += seconds
+                if self.memory:
+                    stack[-1].child_peak = max(stack[-1].child_peak, peak)
+            with self.lock:
+                self.spans.append(record)
+
+    def dump(self, directory: Path = OUTPUT_DIR) -> Path:
+        """Write this process' spans as <script>-<pid>.json"""
+        directory.mkdir(parents=True, exist_ok=True)
+        script = Path(sys.argv[0]).stem or "python"
+        path = directory / f"{script}-{os.getpid()}.json"
+        data = {"script": script, "pid": os.getpid(), "argv": sys.argv[1:],
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "wall_seconds": round(time.time() - self.started, 3),
+                "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                "spans": self.spans}
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data))
+        tmp.replace(path)
+        return path
+
+
+_shared: Optional[Profiler] = None
+if ENABLED:
+    _shared = Profiler()
+    atexit.register(_shared.dump)
+
+
+@contextmanager
+def _noop():
+    yield
+
+
+def span(category: str, name: str = ""):
+    """Context manager timing a block under a category (no-op unless profiling)"""
+    if _shared is None:
+        return _noop()
+    return _shared.span(category, name or category)
+
+
+def timed(category: str, name: Optional[str] = None):
+    """Decorator form of span; the name defaults to the function's"""
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(category, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_sleeps():
+    """Count time.sleep calls made outside any span as "sleep" spans
+
+    Sleeps inside a span (selenium's page-load polling inside a network span)
+    stay part of that span.
+    """
+    if _shared is None or getattr(time.sleep, "_profiled", False):
+        return
+    real_sleep = time.sleep
+
+    def sleep(seconds):
+        if _shared.active():
+            return real_sleep(seconds)
+        with _shared.span("sleep", "time.sleep"):
+            return real_sleep(seconds)
+
+    sleep._profiled = True
+    time.sleep = sleep
+
+
+# =========================
+# REPORT
+# =========================
+def load_profiles(directory: Path) -> List[Dict]:
+    return [json.loads(p.read_text()) for p in sorted(Path(directory).glob("*.json")) if p.name != "report.json"]
+
+
+def summarize(profiles: List[Dict], top: int = TOP_N) -> Dict:
+    """Per-category and per-script totals, slowest span names and slowest single spans"""
+    categories: Dict[str, Dict] = {}
+    names: Dict[tuple, Dict] = {}
+    scripts, slowest = [], []
+    for profile in profiles:
+        totals: Dict[str, float] = {}
+        for s in profile["spans"]:
+            cat = categories.setdefault(s["category"], {"category": s["category"], "seconds": 0.0, "spans": 0,
+                                                        "peak_mb": 0.0})
+            cat["seconds"] += s["self_seconds"]
+            cat["spans"] += 1
+            cat["peak_mb"] = max(cat["peak_mb"], s.get("peak_mb", 0.0))
+            key = (profile["script"], s["category"], s["name"])
+            entry = names.setdefault(key, {"script": key[0], "category": key[1], "name": key[2], "seconds": 0.0,
+                                           "calls": 0, "max_seconds": 0.0})
+            entry["seconds"] += s["self_seconds"]
+            entry["calls"] += 1
+            entry["max_seconds"] = max(entry["max_seconds"], s["seconds"])
+            totals[s["category"]] = totals.get(s["category"], 0.0) + s["self_seconds"]
+            slowest.append({"script": profile["script"], **s})
+        profiled = sum(totals.values())
+        scripts.append({"script": profile["script"], "pid": profile["pid"], "wall_seconds": profile["wall_seconds"],
+                        "max_rss_mb": profile["max_rss_mb"], **{c: round(totals.get(c, 0.0), 3) for c in CATEGORIES},
+                        "unprofiled": round(max(0.0, profile["wall_seconds"] - profiled), 3)})
+
+    total = sum(c["seconds"] for c in categories.values()) or 1.0
+    ordered = sorted(categories.values(), key=lambda c: -c["seconds"])
+    for c in ordered:
+        c["seconds"] = round(c["seconds"], 3)
+        c["share"] = round(c["seconds"] / total, 3)
+    return {
+        "categories": ordered,
+        "scripts": sorted(scripts, key=lambda s: -s["wall_seconds"]),
+        "top_names": sorted(names.values(), key=lambda n: -n["seconds"])[:top],
+        "top_spans": sorted(slowest, key=lambda s: -s["seconds"])[:top],
+    }
+
+
+def _html_table(rows: List[Dict], bar: Optional[str] = None) -> str:
+    if not rows:
+        return "<p>(none)</p>"
+    columns = list(rows[0])
+    widest = max((r[bar] for r in rows), default=0) or 1 if bar else 1
+    out = ["<table><tr>" + "".join(f"<th>{html.escape(c)}</th>" for c in columns) + "</tr>"]
+    for r in rows:
+        cells = []
+        for c in columns:
+            value = r[c]
+            text = f"{value:,.3f}" if isinstance(value, float) else html.escape(str(value))
+            if c == bar:
+                text = f'<div class="bar" style="width:{100 * value / widest:.0f}px"></div>{text}'
+            cells.append(f"<td>{text}</td>")
+        out.append("<tr>" + "".join(cells) + "</tr>")
+    return "\n".join(out + ["</table>"])
+
+
+def write_report(directory: Path = OUTPUT_DIR, top: int = TOP_N) -> Optional[Path]:
+    """Merge the profiles in a folder into report.json and report.html"""
+    profiles = load_profiles(directory)
+    if not profiles:
+        print(f"No profiles in {directory}")
+        return None
+    summary = summarize(profiles, top)
+    (directory / "report.json").write_text(json.dumps(summary, indent=1))
+    sections = [("Time by category (self time)", summary["categories"], "seconds"),
+                ("Scripts", summary["scripts"], "wall_seconds"),
+                (f"Top {top} span names by total time", summary["top_names"], "seconds"),
+                (f"Top {top} slowest spans", summary["top_spans"], "seconds")]
+    body = "\n".join(f"<h2>{title}</h2>\n{_html_table(rows, bar)}" for title, rows, bar in sections)
+    page = (f"<!doctype html><html><head><meta charset='utf-8'><title>Run profile</title><style>"
+            f"body{{font-family:sans-serif;margin:2em}} table{{border-collapse:collapse;margin-bottom:2em}}"
+            f"td,th{{border:1px solid #ccc;padding:3px 8px;text-align:left;font-size:13px}}"
+            f".bar{{display:inline-block;height:10px;background:#4a7fb5;margin-right:6px}}</style></head><body>"
+            f"<h1>Run profile: {html.escape(str(directory))}</h1>\n{body}</body></html>")
+    path = directory / "report.html"
+    path.write_text(page)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge run profiles into a JSON/HTML report")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("directory", nargs="?", type=Path, default=OUTPUT_DIR)
+    parser.add_argument("--top", type=int, default=TOP_N)
+    args = parser.parse_args()
+
+    path = write_report(args.directory, args.top)
+    if path:
+        summary = json.loads((args.directory / "report.json").read_text())
+        for c in summary["categories"]:
+            print(f"  {c['category']:<8} {c['seconds']:10.1f}s  {c['share']:6.1%}  ({c['spans']:,} spans)")
+        print(f"Report -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+ROSTER TIMELINE INDEX
+Player-team stints derived from box-score appearances, answering "which team was
+player X on, on date D" with binary search over presorted interval arrays.
+
+A stint is a run of consecutive appearances for the same team (first/last game).
+Stints are cross-checked with team_data/<TEAM>_roster_<YEAR>.csv and the ESPN
+nba_rosters/<team>/roster_images.csv files; mismatches go to a report.
+
+Usage:
+    python roster_index.py                               # build index + report
+    python roster_index.py --player "Dennis Schroder" --date 2024-03-01
+"""
+
+import argparse
+import re
+import time
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import ROSTER_INDEX_DIR, ROSTERS_DIR, TEAM_DATA_DIR
+from loaders import (NON_PLAYER_ROWS, canonical_team, csv_files, espn_team_code, list_game_files, normalize_name,
+                     read_csv, read_csvs, season_from_dates)
+from schemas import load_box_tables
+
+# =========================
+# CONFIGURATION
+# =========================
+STINTS_FILE = ROSTER_INDEX_DIR / "stints.parquet"
+REPORT_FILE = ROSTER_INDEX_DIR / "roster_discrepancies.csv"
+
+TWO_WAY_SUFFIX = r"\s*\(TW\)$"  # two-way contracts are marked "Name (TW)" in team_data
+
+DAY = np.timedelta64(1, "D")
+KEY_SHIFT = 1 << 20  # day numbers stay far below 2**20 (year 4840)
+
+
+# =========================
+# APPEARANCES
+# =========================
+def load_appearances() -> pd.DataFrame:
+    """(player_key, player, team, game_id, game_date) for every listed box-score row"""
+    frames = []
+
+    basic = read_csvs(list_game_files("team_basic").values(), usecols=["game_id", "game_date", "team", "player"])
+    frames.append(basic)
+
+    season = load_box_tables("game-basic")
+    if not season.empty:
+        frames.append(season[["player", "team", "game_id", "game_date"]].astype({
+            "player": str, "team": str, "game_id": str}))
+
+    apps = pd.concat(frames, ignore_index=True)
+    apps = apps[apps["player"].notna() & ~apps["player"].isin(NON_PLAYER_ROWS)]
+    apps["game_date"] = pd.to_datetime(apps["game_date"], errors="coerce")
+    apps["team"] = apps["team"].map(canonical_team)
+    apps["player_key"] = apps["player"].map(normalize_name)
+    return apps.drop_duplicates(["player_key", "game_id"]).reset_index(drop=True)
+
+
+def build_stints(apps: pd.DataFrame) -> pd.DataFrame:
+    """Collapse consecutive same-team appearances into stints"""
+    apps = apps.sort_values(["player_key", "game_date", "game_id"]).reset_index(drop=True)
+    new_stint = (apps["player_key"] != apps["player_key"].shift()) | (apps["team"] != apps["team"].shift())
+    apps["stint"] = new_stint.cumsum()
+
+    stints = apps.groupby("stint").agg(
+        player_key=("player_key", "first"),
+        player=("player", "first"),
+        team=("team", "first"),
+        start_date=("game_date", "min"),
+        end_date=("game_date", "max"),
+        first_game=("game_id", "first"),
+        last_game=("game_id", "last"),
+        games=("game_id", "size"),
+    ).reset_index(drop=True)
+    stints["season"] = season_from_dates(stints["start_date"])
+    return stints
+
+
+# =========================
+# CROSS-CHECK WITH ROSTERS
+# =========================
+def load_roster_files(current_season: int) -> pd.DataFrame:
+    """(player_key, team, season) from team_data roster CSVs and ESPN roster folders
+
+    The ESPN folders only hold the roster at scrape time, so they are checked
+    against current_season.
+    """
+    rows = []
+    for path in csv_files(TEAM_DATA_DIR, "*_roster_*.csv"):
+        m = re.match(r"([A-Z]{3})_roster_(\d{4})\.csv(\.zst)?$", path.name)
+        if not m:
+            continue
+        df = read_csv(path, usecols=lambda c: c == "Player")
+        rows.append(pd.DataFrame({
+            "player_key": df["Player"].str.replace(TWO_WAY_SUFFIX, "", regex=True).map(normalize_name),
+            "team": canonical_team(m.group(1)),
+            "season": int(m.group(2)) - 1,
+            "source": "team_data",
+        }))
+
+    for path in csv_files(ROSTERS_DIR, "*/roster_images.csv"):
+        code = espn_team_code(path.parent.name)
+        if not code:
+            continue
+        df = read_csv(path, usecols=["player"])
+        rows.append(pd.DataFrame({
+            "player_key": df["player"].map(normalize_name),
+            "team": code,
+            "season": current_season,
+            "source": "espn",
+        }))
+
+    if not rows:
+        return pd.DataFrame(columns=["player_key", "team", "season", "source"])
+    return pd.concat(rows, ignore_index=True).drop_duplicates()
+
+
+def cross_check(apps: pd.DataFrame, rosters: pd.DataFrame) -> pd.DataFrame:
+    """Team-seasons missing from the roster files and roster entries with no appearances"""
+    played = apps.assign(season=season_from_dates(apps["game_date"]))
+    played = played[["player_key", "team", "season", "player"]].drop_duplicates(["player_key", "team", "season"])
+    # Only compare team-seasons that both sides cover
+    covered = played[["team", "season"]].drop_duplicates().merge(rosters[["team", "season"]].drop_duplicates())
+    played = played.merge(covered)
+    rosters = rosters.merge(covered)
+
+    merged = played.merge(rosters, on=["player_key", "team", "season"], how="outer", indicator=True)
+    merged["issue"] = merged["_merge"].map({
+        "left_only": "played_not_on_roster_file",
+        "right_only": "on_roster_file_no_appearance",
+    })
+    report = merged[merged["issue"].notna()].drop(columns="_merge")
+    return report.sort_values(["season", "team", "player_key"]).reset_index(drop=True)
+
+
+def build(report: bool = True) -> pd.DataFrame:
+    start = time.time()
+    apps = load_appearances()
+    stints = build_stints(apps)
+    ROSTER_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    stints.to_parquet(STINTS_FILE, index=False)
+    print(f"{len(stints):,} stints from {len(apps):,} appearances in {time.time() - start:.1f}s")
+
+    if report:
+        issues = cross_check(apps, load_roster_files(int(stints["season"].max())))
+        issues.to_csv(REPORT_FILE, index=False)
+        print(f"Roster cross-check: {len(issues):,} discrepancies -> {REPORT_FILE}")
+    return stints
+
+
+# =========================
+# INDEX
+# =========================
+class RosterIndex:
+    """Interval index over player-team stints
+
+    Stints are sorted by (player, start_date) and encoded into one int64 key per
+    stint, so point, range and bulk lookups are all np.searchsorted calls.
+    """
+
+    def __init__(self, stints: Optional[pd.DataFrame] = None):
+        if stints is None:
+            stints = pd.read_parquet(STINTS_FILE)
+        stints = stints.sort_values(["player_key", "start_date"]).reset_index(drop=True)
+
+        self.players = pd.Index(stints["player_key"].unique())
+        self.teams = stints["team"].to_numpy()
+        self.stints = stints
+
+        self._player_codes = self.players.get_indexer(stints["player_key"]).astype(np.int64)
+        self._start = self._days(stints["start_date"])
+        self._end = self._days(stints["end_date"])
+        self._keys = self._player_codes * KEY_SHIFT + self._start
+
+        # Team-side index for "who was on team T on date D"
+        self._by_team = {team: g.sort_values("start_date") for team, g in stints.groupby("team")}
+
+    @staticmethod
+    def _days(dates) -> np.ndarray:
+        return (pd.to_datetime(pd.Series(dates)).to_numpy().astype("datetime64[D]") - np.datetime64(0, "D")) // DAY
+
+    def _candidates(self, player_codes: np.ndarray, days: np.ndarray) -> np.ndarray:
+        """Position of the last stint of each player starting on/before each day (-1 if none)"""
+        pos = np.searchsorted(self._keys, player_codes * KEY_SHIFT + days, side="right") - 1
+        ok = (pos >= 0) & (player_codes >= 0)
+        ok[ok] &= self._player_codes[pos[ok]] == player_codes[ok]
+        return np.where(ok, pos, -1)
+
+    def lookup(self, players, dates, strict: bool = False) -> np.ndarray:
+        """Bulk mode: team for each (player, date) pair, None where unknown
+
+        strict=True only matches dates inside a stint's first/last game; otherwise
+        a player stays on their last team until their next stint starts.
+        """
+        keys = pd.Series(players).map(normalize_name)
+        codes = self.players.get_indexer(keys).astype(np.int64)
+        days = self._days(dates)
+
+        pos = self._candidates(codes, days)
+        found = pos >= 0
+        if strict:
+            found[found] &= days[found] <= self._end[pos[found]]
+
+        out = np.full(len(codes), None, dtype=object)
+        out[found] = self.teams[pos[found]]
+        return out
+
+    def team_on(self, player: str, date, strict: bool = False) -> Optional[str]:
+        """Point query: the team a player was on at a date"""
+        return self.lookup([player], [date], strict=strict)[0]
+
+    def stints_between(self, player: str, start, end) -> pd.DataFrame:
+        """Range query: all stints of a player overlapping [start, end]"""
+        code = self.players.get_indexer([normalize_name(player)])[0]
+        if code < 0:
+            return self.stints.iloc[0:0]
+        lo_day, hi_day = self._days([start, end])
+        lo = max(np.searchsorted(self._keys, code * KEY_SHIFT + lo_day, side="right") - 1,
+                 np.searchsorted(self._keys, code * KEY_SHIFT, side="left"))
+        hi = np.searchsorted(self._keys, code * KEY_SHIFT + hi_day, side="right")
+        rows = np.arange(lo, hi)
+        rows = rows[self._end[rows] >= lo_day]
+        return self.stints.iloc[rows]
+
+    def roster_on(self, team: str, date) -> List[str]:
+        """Players whose stint with a team covers a date"""
+        stints = self._by_team.get(canonical_team(team))
+        if stints is None:
+            return []
+        date = pd.Timestamp(date)
+        upto = stints.iloc[:np.searchsorted(stints["start_date"].to_numpy(), np.datetime64(date), side="right")]
+        return upto[upto["end_date"] >= date]["player"].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build/query the roster timeline index")
+    parser.add_argument("--player", help="player to look up")
+    parser.add_argument("--date", help="date for --player (YYYY-MM-DD)")
+    parser.add_argument("--no-report", action="store_true", help="skip the roster cross-check")
+    args = parser.parse_args()
+
+    if args.player:
+        index = RosterIndex()
+        print(f"{args.player} on {args.date}: {index.team_on(args.player, args.date)}")
+        print(index.stints_between(args.player, "1900-01-01", "2100-01-01").to_string(index=False))
+        return
+
+    build(report=not args.no_report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+BOX TABLE SCHEMA REGISTRY
+Canonical names and compact dtypes for the tables written by save_table() in
+nba_scapper.py (tables/box-<TEAM>-<period>-basic/<game_id>.csv).
+
+Those headers are flattened MultiIndex names run through sanitize(), so FG and
+FG% both become basic_box_score_stats_fg, +/- becomes basic_box_score_stats_,
+minutes are "34:49" strings and plus/minus "+8" strings. The registry maps
+(raw header, occurrence) pairs to canonical columns, so the duplicates are
+resolved by their order instead of by position, and extra or missing columns
+do not shift anything.
+
+A header is compiled into a column plan once (cached) and applied to whole
+DataFrames with vectorized parsers.
+
+Usage:
+    python schemas.py                  # memory report for the game-basic tables
+    python schemas.py --kind q1-basic
+"""
+
+import argparse
+import re
+import time
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import pandas as pd
+
+from loaders import BOX_TABLE_PATTERN, NON_PLAYER_ROWS, list_team_box_files, read_csvs
+
+# =========================
+# REGISTRY
+# =========================
+# (raw header, occurrence) -> (canonical name, dtype kind)
+BOX_BASIC = {
+    ("unnamed_0_level_0_starters", 0): ("player", "category"),
+    ("basic_box_score_stats_mp", 0): ("mp", "minutes"),
+    ("basic_box_score_stats_fg", 0): ("fg", "count"),
+    ("basic_box_score_stats_fga", 0): ("fga", "count"),
+    ("basic_box_score_stats_fg", 1): ("fg_pct", "pct"),
+    ("basic_box_score_stats_3p", 0): ("fg3", "count"),
+    ("basic_box_score_stats_3pa", 0): ("fg3a", "count"),
+    ("basic_box_score_stats_3p", 1): ("fg3_pct", "pct"),
+    ("basic_box_score_stats_ft", 0): ("ft", "count"),
+    ("basic_box_score_stats_fta", 0): ("fta", "count"),
+    ("basic_box_score_stats_ft", 1): ("ft_pct", "pct"),
+    ("basic_box_score_stats_orb", 0): ("orb", "count"),
+    ("basic_box_score_stats_drb", 0): ("drb", "count"),
+    ("basic_box_score_stats_trb", 0): ("trb", "count"),
+    ("basic_box_score_stats_ast", 0): ("ast", "count"),
+    ("basic_box_score_stats_stl", 0): ("stl", "count"),
+    ("basic_box_score_stats_blk", 0): ("blk", "count"),
+    ("basic_box_score_stats_tov", 0): ("tov", "count"),
+    ("basic_box_score_stats_pf", 0): ("pf", "count"),
+    ("basic_box_score_stats_pts", 0): ("pts", "count"),
+    ("basic_box_score_stats_gmsc", 0): ("game_score", "float"),
+    ("basic_box_score_stats_", 0): ("plus_minus", "count"),
+    ("did_play", 0): ("did_play", "bool"),
+    ("dnp_reason", 0): ("dnp_reason", "category"),
+    ("team", 0): ("team", "category"),
+    ("opponent", 0): ("opponent", "category"),
+    ("home_team", 0): ("home_team", "category"),
+    ("away_team", 0): ("away_team", "category"),
+    ("is_home", 0): ("is_home", "bool"),
+    ("is_away", 0): ("is_away", "bool"),
+    ("player_uid", 0): ("player_uid", "category"),
+    ("game_id", 0): ("game_id", "category"),
+    ("game_date", 0): ("game_title", "category"),  # "Away at Home Box Score, Month D, YYYY"
+    ("scraped_at", 0): ("scraped_at", "datetime"),
+    ("table_id", 0): ("table_id", "category"),
+}
+
+# table_id pattern (team code stripped) -> registry; quarter/half/OT tables share the game layout
+SCHEMAS = [
+    (re.compile(r"^(game|q\d|h\d|ot\d*)-basic$"), BOX_BASIC),
+]
+
+
+def schema_for(table_id: str) -> Dict[Tuple[str, int], Tuple[str, str]]:
+    """Registry entry for a table id ("box-ATL-game-basic") or kind ("game-basic")"""
+    m = BOX_TABLE_PATTERN.match(table_id)
+    kind = m.group(2) if m else table_id
+    for pattern, schema in SCHEMAS:
+        if pattern.match(kind):
+            return schema
+    raise KeyError(f"No schema registered for table {table_id!r}")
+
+
+@lru_cache(maxsize=None)
+def compile_header(table_id: str, header: Tuple[str, ...]) -> Tuple[Tuple[int, str, str], ...]:
+    """Column plan (position, canonical name, dtype kind) for one raw header
+
+    Accepts both the raw CSV header and pandas' de-duplicated names ("x.1").
+    Unregistered columns are kept under their raw name as text.
+    """
+    schema = schema_for(table_id)
+    seen: Dict[str, int] = {}
+    plan = []
+    for pos, raw in enumerate(header):
+        m = re.match(r"^(.*)\.(\d+)$", raw)
+        base, occurrence = (m.group(1), int(m.group(2))) if m and (m.group(1), int(m.group(2))) in schema else \
+            (raw, seen.get(raw, 0))
+        seen[base] = occurrence + 1
+        name, kind = schema.get((base, occurrence), (raw, "text"))
+        plan.append((pos, name, kind))
+    return tuple(plan)
+
+
+# =========================
+# PARSERS
+# =========================
+def parse_minutes(values: pd.Series) -> pd.Series:
+    """'34:49' -> 34.8167 (float32); plain numbers pass through, text -> NaN"""
+    text = values.astype("string")
+    parts = text.str.extract(r"^(\d+):(\d{1,2})$")
+    minutes = pd.to_numeric(parts[0], errors="coerce") + pd.to_numeric(parts[1], errors="coerce") / 60
+    return minutes.fillna(pd.to_numeric(values, errors="coerce")).astype("float32")
+
+
+PARSERS = {
+    "minutes": parse_minutes,
+    "count": lambda s: pd.to_numeric(s, errors="coerce").round().astype("Int16"),  # "+8" parses as 8
+    "pct": lambda s: pd.to_numeric(s, errors="coerce").astype("float32"),
+    "float": lambda s: pd.to_numeric(s, errors="coerce").astype("float32"),
+    "bool": lambda s: s.astype("string").str.lower().map({"true": True, "false": False}).astype("boolean"),
+    "category": lambda s: s.astype("category"),
+    "datetime": lambda s: pd.to_datetime(s, errors="coerce"),
+    "text": lambda s: s,
+}
+
+
+def apply_schema(df: pd.DataFrame, table_id: str) -> pd.DataFrame:
+    """Rename and type one loaded box table (or a concat of same-kind tables)"""
+    plan = compile_header(table_id, tuple(map(str, df.columns)))
+    out = {name: PARSERS[kind](df.iloc[:, pos]) for pos, name, kind in plan}
+    typed = pd.DataFrame(out, index=df.index)
+    if "game_id" in typed.columns:
+        gid = typed["game_id"].astype("string")
+        typed["game_date"] = pd.to_datetime(gid.str[:8], format="%Y%m%d", errors="coerce")
+    return typed
+
+
+def load_box_tables(kind: str = "game-basic", players_only: bool = False, with_keys: bool = False) -> pd.DataFrame:
+    """All box-<TEAM>-<kind> tables, typed through the registry
+
+    with_keys=True appends player_sk/team_sk/opponent_sk/game_sk (dimensions.py).
+    """
+    files = list_team_box_files(kind)
+    if not files:
+        return pd.DataFrame()
+    df = apply_schema(read_csvs(files.values()), kind)
+    if players_only:
+        df = df[df["player"].notna() & ~df["player"].isin(NON_PLAYER_ROWS)]
+        df["player"] = df["player"].cat.remove_unused_categories()
+    if with_keys:
+        from dimensions import add_keys
+        df = add_keys(df, source="bbref_2025_26")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Typed loading of the 2025-26 box tables")
+    parser.add_argument("--kind", default="game-basic", help="table kind, e.g. game-basic or q1-basic")
+    args = parser.parse_args()
+
+    start = time.time()
+    raw = read_csvs(list_team_box_files(args.kind).values())
+    loaded = time.time()
+    typed = apply_schema(raw, args.kind)
+    typed_at = time.time()
+
+    raw_mb = raw.memory_usage(deep=True).sum() / 1e6
+    typed_mb = typed.memory_usage(deep=True).sum() / 1e6
+    print(typed.dtypes.to_string())
+    print(f"{len(typed):,} rows: {raw_mb:.1f} MB raw -> {typed_mb:.1f} MB typed "
+          f"({raw_mb / max(typed_mb, 1e-9):.1f}x smaller); read {loaded - start:.2f}s, typed {typed_at - loaded:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+ASYNC SCRAPE ENGINE
+The scrapers fetch one page, sleep a fixed or random interval, and fetch the
+next, so their throughput is latency + sleep per page, well under what the
+sites allow. This engine keeps many requests in flight and spaces their starts
+with a per-host token bucket instead:
+
+    rate     requests per minute the host allows (HOST_LIMITS)
+    burst    requests that may start back to back after an idle spell
+
+so a scrape runs at exactly the allowed rate however slow single pages are.
+
+The rates adapt to the hosts' answers (AIMD, as TCP does with its window):
+every INCREASE_EVERY healthy responses add INCREASE requests per minute, a 429
+or 503 (fetch.Throttled) multiplies the rate by DECREASE and holds the host's
+requests for its Retry-After. Each host's rate is saved to HOST_RATES_FILE
+and the next run starts from it, so scrapes converge on the highest rate a
+host sustains instead of a hand-picked conservative one; HOST_LIMITS is only
+the starting point for a host never seen before.
+
+The event loop only schedules: requests run on a thread pool sharing one
+pooled keep-alive session (fetch.py), parsing runs in a process pool, and only
+the result callback (saving) runs on the loop thread.
+
+The buckets are per process and thread-safe, so synchronous scrapers (the
+Selenium threads of premier_scapper.py) share them through limiter(url).wait()
+and report what the host answered with feedback(url, started, throttled).
+
+Usage:
+    from scrape_engine import Engine, limiter, feedback, polite_get
+    Engine().run(urls, parse, on_result)      # parse(url, html) runs in a worker process
+    polite_get(fetcher, url)                  # blocking form: paced, reported, raises Throttled
+    limiter(url).wait()                       # before a driver.get, then feedback(url, started, ...)
+
+    python scrape_engine.py check                         # stub server, default limits
+    python scrape_engine.py check --rate 120 --burst 2 --pages 60 --latency 0.5
+    python scrape_engine.py check --rate 30 --capacity 90 --pages 250 --latency 0.1 --increase 10
+    python scrape_engine.py rates                         # learned rates (HOST_RATES_FILE)
+    python scrape_engine.py reset                         # forget them, back to HOST_LIMITS
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import http.server
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from config import HOST_RATES_FILE, MAX_WORKERS
+from fetch import Fetcher, Page, Throttled
+
+# =========================
+# CONFIGURATION
+# =========================
+# host -> (starting requests per minute, burst); sports-reference sites document 20/min (FBref: 10/min)
+HOST_LIMITS = {
+    "www.basketball-reference.com": (20, 1),
+    "fbref.com": (10, 1),
+}
+DEFAULT_LIMIT = (30, 1)
+CONCURRENCY = 8
+
+# Adaptive rates (requests per minute)
+MIN_RATE = 2.0
+MAX_RATE = 120.0
+INCREASE = 1.0          # added after every INCREASE_EVERY healthy responses
+INCREASE_EVERY = 10
+DECREASE = 0.5          # rate multiplier on a 429/503
+DEFAULT_PAUSE = 60.0    # seconds a host is held after a throttle that gave no Retry-After
+THROTTLE_RETRIES = 3    # Engine: times a throttled url is queued again
+
+
+# =========================
+# RATE LIMITING
+# =========================
+class TokenBucket:
+    """rate/min with a burst allowance; a caller reserves a token and then sleeps until it is due
+
+    Reserving (tokens may go negative) keeps callers in arrival order without
+    holding the lock while they wait, for threads and coroutines alike. A
+    pause (Retry-After) moves `updated` into the future: no tokens accrue until
+    then. A pause or a new rate starts a new generation and drops the
+    reservations handed out: their turns were spaced at the old rate (too close
+    after a cut, crowded by the new ones after an increase), so a caller that
+    wakes into a new generation reserves again at the new rate.
+    """
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        self.per_minute = per_minute
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def set_rate(self, per_minute: float):
+        with self.lock:
+            self._refill()
+            if per_minute != self.per_minute:
+                self.tokens = max(self.tokens, 0.0)
+                self.generation += 1
+            self.per_minute = per_minute
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.per_minute / 60)
+            self.updated = now
+        return now
+
+    def reserve(self) -> Tuple[float, int]:
+        """Take a token; (seconds until it may be used, generation it was taken in)"""
+        with self.lock:
+            now = self._refill()
+            self.tokens -= 1
+            paused = max(0.0, self.updated - now)
+            return paused + (0.0 if self.tokens >= 0 else -self.tokens * 60 / self.per_minute), self.generation
+
+    def pause(self, seconds: float):
+        """Start nothing for the next seconds; the reservations already handed out are dropped"""
+        with self.lock:
+            self._refill()
+            self.tokens = 0.0
+            self.updated = max(self.updated, time.monotonic() + seconds)
+            self.generation += 1
+
+    def current(self, generation: int) -> bool:
+        """Whether a reservation taken in generation still stands (no pause or new rate since)"""
+        with self.lock:
+            return generation == self.generation and self.updated <= time.monotonic()
+
+    def wait(self):
+        while True:
+            delay, generation = self.reserve()
+            if delay > 0:
+                time.sleep(delay)
+            if self.current(generation):
+                return
+
+    async def acquire(self):
+        while True:
+            delay, generation = self.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.current(generation):
+                return
+
+
+class HostRates:
+    """The per-host buckets, their rates adapted to the hosts' answers and saved between runs
+
+    Throttles of requests started before the host's last cut do not cut
+    again: they went out at the old rate, and a burst of them is one signal.
+    Requests still waiting for their turn at the cut are re-spaced at the new
+    rate (TokenBucket generations), so whatever starts after it is paced by it.
+    """
+
+    def __init__(self, path: Optional[Path] = HOST_RATES_FILE, increase: float = INCREASE):
+        self.path = Path(path) if path else None
+        self.increase = increase
+        self.lock = threading.Lock()
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.healthy: Dict[str, int] = {}
+        self.last_cut: Dict[str, float] = {}
+        self.cuts: Dict[str, List[float]] = {}  # host -> the rates it was cut from, in order
+        self.saved: Optional[Dict[str, Dict]] = None
+
+    def load(self) -> Dict[str, Dict]:
+        """host -> {"per_minute", "throttles", "updated_at"} as saved"""
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, host: str, per_minute: float, throttled: bool = False):
+        if self.path is None:
+            return
+        with self.lock:
+            state = self.load()  # other scrapers save their hosts to the same file
+            entry = state.setdefault(host, {"throttles": 0})
+            entry["per_minute"] = round(per_minute, 2)
+            entry["throttles"] = entry.get("throttles", 0) + int(throttled)
+            entry["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(state, indent=1, sort_keys=True))
+            tmp.replace(self.path)
+            self.saved = state
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self.lock:
+            if host not in self.buckets:
+                if self.saved is None:
+                    self.saved = self.load()
+                per_minute, burst = HOST_LIMITS.get(host, DEFAULT_LIMIT)
+                if host in self.saved:
+                    per_minute = min(MAX_RATE, max(MIN_RATE, self.saved[host]["per_minute"]))
+                self.buckets[host] = TokenBucket(per_minute, burst)
+            return self.buckets[host]
+
+    def success(self, host: str):
+        """Additive increase: INCREASE more per minute after every INCREASE_EVERY healthy responses"""
+        bucket = self.bucket(host)
+        with self.lock:
+            self.healthy[host] = self.healthy.get(host, 0) + 1
+            if self.healthy[host] < INCREASE_EVERY or bucket.per_minute >= MAX_RATE:
+                return
+            self.healthy[host] = 0
+            per_minute = min(MAX_RATE, bucket.per_minute + self.increase)
+        bucket.set_rate(per_minute)
+        self._save(host, per_minute)
+
+    def throttled(self, host: str, retry_after: Optional[float] = None, started: Optional[float] = None):
+        """Multiplicative decrease, and hold the host for its Retry-After (DEFAULT_PAUSE without one)"""
+        bucket = self.bucket(host)
+        per_minute = None
+        with self.lock:
+            self.healthy[host] = 0
+            if started is None or started >= self.last_cut.get(host, float("-inf")):
+                per_minute = max(MIN_RATE, bucket.per_minute * DECREASE)
+                self.last_cut[host] = time.monotonic()
+                self.cuts.setdefault(host, []).append(bucket.per_minute)
+        bucket.pause(DEFAULT_PAUSE if retry_after is None else retry_after)
+        if per_minute is not None:
+            bucket.set_rate(per_minute)
+            self._save(host, per_minute, throttled=True)
+            print(f"  {host} throttled us: {per_minute:.1f} requests/min from now"
+                  + (f", resuming in {retry_after:.0f}s" if retry_after else ""))
+
+    def reset(self):
+        """Forget the learned rates; hosts start from HOST_LIMITS again"""
+        with self.lock:
+            if self.path is not None and self.path.exists():
+                self.path.unlink()
+            self.buckets, self.healthy, self.last_cut, self.cuts, self.saved = {}, {}, {}, {}, None
+
+
+_shared = HostRates()
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def limiter(url: str) -> TokenBucket:
+    """The process-wide bucket of url's host"""
+    return _shared.bucket(_host(url))
+
+
+def feedback(url: str, started: Optional[float] = None, throttled: bool = False,
+             retry_after: Optional[float] = None):
+    """Report how url's host answered a request sent at started (time.monotonic())"""
+    if throttled:
+        _shared.throttled(_host(url), retry_after, started)
+    else:
+        _shared.success(_host(url))
+
+
+def polite_get(fetcher: Fetcher, url: str) -> Page:
+    """fetcher.get(url) at the host's rate, reporting the answer; raises Throttled as fetcher.get does"""
+    limiter(url).wait()
+    started = time.monotonic()
+    try:
+        page = fetcher.get(url)
+    except Throttled as e:
+        feedback(url, started, throttled=True, retry_after=e.retry_after)
+        raise
+    feedback(url, started)
+    return page
+
+
+# =========================
+# ENGINE
+# =========================
+class Engine:
+    """Fetch many pages concurrently under the host limits and parse them off the event loop"""
+
+    def __init__(self, concurrency: int = CONCURRENCY, parse_workers: int = MAX_WORKERS):
+        self.concurrency = concurrency
+        self.parse_workers = parse_workers
+        self.fetcher = Fetcher("http", fallback=False)
+
+    async def _one(self, url: str, parse: Optional[Callable], slots: asyncio.Semaphore, io_pool, parse_pool):
+        loop = asyncio.get_running_loop()
+        try:
+            for attempt in range(THROTTLE_RETRIES + 1):
+                async with slots:
+                    await limiter(url).acquire()
+                    started = time.monotonic()
+                    try:
+                        page = await loop.run_in_executor(io_pool, self.fetcher.get, url)
+                    except Throttled as e:
+                        # the bucket now holds the host; queue again behind the pause at the lower rate
+                        feedback(url, started, throttled=True, retry_after=e.retry_after)
+                        if attempt == THROTTLE_RETRIES:
+                            raise
+                        continue
+                feedback(url, started)
+                break
+            if parse is None:
+                return url, page, None
+            return url, await loop.run_in_executor(parse_pool, parse, url, page.html), None
+        except Exception as e:
+            return url, None, e
+
+    async def _run(self, urls: List[str], parse: Optional[Callable], on_result: Callable):
+        # a slot is taken before the token, so at most `concurrency` requests wait on or hold the bucket
+        slots = asyncio.Semaphore(self.concurrency)
+        with concurrent.futures.ThreadPoolExecutor(self.concurrency) as io_pool, \
+                concurrent.futures.ProcessPoolExecutor(self.parse_workers) as parse_pool:
+            jobs = [self._one(url, parse, slots, io_pool, parse_pool) for url in urls]
+            for done in asyncio.as_completed(jobs):
+                on_result(*await done)
+
+    def run(self, urls: Iterable[str], parse: Optional[Callable] = None,
+            on_result: Optional[Callable] = None) -> List[Tuple[str, object, Optional[Exception]]]:
+        """Fetch every url; parse(url, html) runs in a worker process (module-level function)
+
+        on_result(url, result, error) is called on the loop thread as pages
+        finish; without one the (url, result, error) triples are returned.
+        result is the Page itself when parse is None.
+        """
+        collected = []
+        callback = on_result or (lambda *r: collected.append(r))
+        asyncio.run(self._run(list(urls), parse, callback))
+        self.fetcher.close()
+        return collected
+
+
+# =========================
+# STUB SERVER CHECK
+# =========================
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    """Serves a one-table page; above `capacity` requests/min (over 10 s) it answers 429
+
+    Retry-After is when the 10 s window next has room, as a real limiter's would be.
+    """
+    protocol_version = "HTTP/1.1"
+    wbufsize = 1 << 16
+    latency = 0.0
+    capacity = 0.0
+    times: List[float] = []
+    refused: List[float] = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        now = time.monotonic()
+        with self.lock:
+            window = [t for t in self.times if t > now - 10]
+            over = self.capacity and len(window) >= self.capacity * 10 / 60
+            (self.refused if over else self.times).append(now)
+        time.sleep(self.latency)
+        if over:
+            self.send_response(429)
+            self.send_header("Retry-After", str(math.ceil(window[0] + 10 - now)))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = (f"<html><body><table id='t'><tr><th>path</th></tr><tr><td>{self.path}</td></tr></table>"
+                f"</body></html>").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _stub_parse(url: str, html: str) -> int:
+    from io import StringIO
+    import pandas as pd
+    return len(pd.read_html(StringIO(html))[0])
+
+
+def check(rate: float, burst: int, pages: int, latency: float, concurrency: int, capacity: float = 0.0,
+          increase: float = INCREASE) -> Dict[str, float]:
+    """Scrape a local stub server and measure the request rate it saw
+
+    With a capacity the stub throttles above it. The rate should only be cut
+    when it reaches the capacity, and the accepted rate settle in the AIMD
+    sawtooth under it (DECREASE x capacity up to capacity) whether it starts
+    above or below. Learned rates are not saved.
+    """
+    global _shared
+    handler = type("Handler", (_StubHandler,), {"latency": latency, "capacity": capacity, "times": [],
+                                                "refused": [], "lock": threading.Lock()})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    HOST_LIMITS[urlsplit(base).netloc] = (rate, burst)
+    previous, _shared = _shared, HostRates(path=None, increase=increase)
+
+    start = time.monotonic()
+    try:
+        results = Engine(concurrency=concurrency).run([f"{base}/page/{i}" for i in range(pages)], _stub_parse)
+        final = limiter(base).per_minute
+        cuts = _shared.cuts.get(_host(base), [])
+    finally:
+        _shared = previous
+        server.shutdown()
+    elapsed = time.monotonic() - start
+
+    times = sorted(handler.times)
+    steady = times[burst - 1:] if len(times) > burst else times
+    achieved = (len(steady) - 1) * 60 / (steady[-1] - steady[0]) if len(steady) > 1 else 0.0
+    # most requests seen in any 10 s window vs what the bucket allows there
+    window = 10.0
+    busiest = max(sum(1 for u in times if t <= u < t + window) for t in times)
+    # the rate the host accepted over the second half of the run, once the controller has settled
+    late = [t for t in times if t >= start + elapsed / 2]
+    settled = (len(late) - 1) * 60 / (late[-1] - late[0]) if len(late) > 1 else 0.0
+    return {"pages": pages, "errors": sum(1 for _, _, e in results if e), "seconds": elapsed,
+            "configured_per_min": rate, "achieved_per_min": achieved,
+            "busiest_10s": busiest, "allowed_10s": rate * window / 60 + burst,
+            "sequential_per_min": 60 / (latency + 60 / rate) if rate else 0.0,
+            "capacity_per_min": capacity, "throttled": len(handler.refused), "final_per_min": final,
+            "settled_per_min": settled, "cuts": cuts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent scraping under per-host rate limits")
+    parser.add_argument("command", choices=["check", "rates", "reset"])
+    parser.add_argument("--rate", type=float, default=120, help="starting requests per minute for the stub host")
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds the stub takes per page")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--capacity", type=float, default=0, help="stub answers 429 above this many per minute")
+    parser.add_argument("--increase", type=float, default=INCREASE, help="additive step, requests per minute")
+    args = parser.parse_args()
+
+    if args.command == "rates":
+        saved = _shared.load()
+        for host in sorted(set(HOST_LIMITS) | set(saved)):
+            entry = saved.get(host)
+            learned = (f"{entry['per_minute']:7.1f}/min  {entry['throttles']:>4} throttles  {entry['updated_at']}"
+                       if entry else "      (not learned yet)")
+            print(f"  {host:<32} start {HOST_LIMITS.get(host, DEFAULT_LIMIT)[0]:5.1f}/min  {learned}")
+        return
+    if args.command == "reset":
+        _shared.reset()
+        print(f"Forgot learned rates ({HOST_RATES_FILE})")
+        return
+
+    r = check(args.rate, args.burst, args.pages, args.latency, args.concurrency, args.capacity, args.increase)
+    print(f"  {r['pages']} pages in {r['seconds']:.1f}s, {r['errors']} errors")
+    print(f"  rate: configured {r['configured_per_min']:.1f}/min, achieved {r['achieved_per_min']:.1f}/min "
+          f"(fetch-then-sleep loop: {r['sequential_per_min']:.1f}/min)")
+    print(f"  busiest 10s window: {r['busiest_10s']} requests (bucket allows {r['allowed_10s']:.1f})")
+    if args.capacity:
+        print(f"  adaptive: capacity {r['capacity_per_min']:.1f}/min, {r['throttled']} requests throttled, "
+              f"settled at {r['settled_per_min']:.1f}/min accepted, bucket ended at {r['final_per_min']:.1f}/min")
+        print(f"  cut {len(r['cuts'])} times, from " + ", ".join(f"{c:.1f}" for c in r["cuts"]) + " per minute")
+
+
+if __name__ == "__main__":
+    main()
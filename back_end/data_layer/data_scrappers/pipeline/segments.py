@@ -0,0 +1,369 @@
+"""
+SEGMENT FILE STORE
+Output mode for nba_scapper.py that replaces the one-CSV-per-team-per-game
+layout (tables/box-<TEAM>-<kind>/<game_id>.csv, thousands of tiny files a
+season) with a few append-only segment files per table kind:
+
+    <season dir>/segments/<kind>/<run>-<n>.csv     blocks of one run, rolled over at SEGMENT_MB
+    <season dir>/segments/index.sqlite             (table_id, game_id) -> segment, offset, length
+
+A block is one game's table as a complete CSV (header included), so blocks
+with different columns can share a segment and reading one game is a seek
+plus one read. Blocks are appended and fsynced before their index row is
+committed: a crash can leave unindexed bytes at the end of a segment, never
+an index row pointing at a partial block. Re-scraping an unchanged table is a
+no-op (content hash); a changed one is appended again and the index moves to
+the new block, leaving the old bytes dead until compaction.
+
+compact() rewrites the live blocks of a kind into one segment (tmp + rename),
+switches the index to it in one transaction and only then deletes the old
+segments, including unreferenced ones a crash left behind. A writer holds a
+shared lock on the segments folder for its whole run and compaction an
+exclusive one, so compaction skips a folder a scrape is still writing to.
+
+loaders.list_team_box_files() lists indexed blocks next to the per-file
+layout (a per-file copy wins), so compact.py, lake.py, schemas.py and
+player_matrix.py read either layout.
+
+Usage:
+    python segments.py                          # blocks, segments and dead bytes per kind
+    python segments.py --compact                # merge segments (every season dir)
+    python segments.py --game 202601150BOS --table box-BOS-game-basic
+    python segments.py --migrate                # move per-file tables into segments
+
+    from segments import SegmentWriter
+    writer = SegmentWriter(BASE_DIR)
+    writer.append("box-BOS-game-basic", "202601150BOS", data, rows=15)
+    writer.close()
+"""
+
+import argparse
+import fcntl
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import SEASON_BOX_DIRS
+
+# =========================
+# CONFIGURATION
+# =========================
+SEGMENTS = "segments"
+INDEX_NAME = "index.sqlite"
+SEGMENT_MB = 64          # roll over to a new segment past this size
+LOCK_NAME = ".lock"
+
+TABLE_PATTERN = re.compile(r"box-([A-Z]{3})-(.+)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    table_id TEXT NOT NULL,
+    game_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    team TEXT,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    rows INTEGER,
+    content_hash TEXT NOT NULL,
+    written_at TEXT,
+    PRIMARY KEY (table_id, game_id)
+);
+CREATE INDEX IF NOT EXISTS idx_blocks_kind ON blocks (kind, game_id);
+CREATE INDEX IF NOT EXISTS idx_blocks_segment ON blocks (segment);
+"""
+
+
+def connect(base_dir) -> sqlite3.Connection:
+    root = Path(base_dir) / SEGMENTS
+    root.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(root / INDEX_NAME, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def split_table_id(table_id: str) -> Tuple[str, Optional[str]]:
+    """box-BOS-game-basic -> ("game-basic", "BOS"); other ids are their own kind"""
+    m = TABLE_PATTERN.match(table_id)
+    return (m.group(2), m.group(1)) if m else (table_id, None)
+
+
+def _lock(root: Path, mode: int):
+    """flock on <segments>/.lock; None if non-blocking and held by someone else"""
+    handle = open(root / LOCK_NAME, "a")
+    try:
+        fcntl.flock(handle, mode)
+    except BlockingIOError:
+        handle.close()
+        return None
+    return handle
+
+
+def _fsync_dir(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# =========================
+# WRITING
+# =========================
+class SegmentWriter:
+    """Appends one run's tables to per-kind segments under <base_dir>/segments"""
+
+    def __init__(self, base_dir, run_id: Optional[str] = None, segment_mb: int = SEGMENT_MB):
+        self.root = Path(base_dir) / SEGMENTS
+        self.conn = connect(base_dir)
+        self.lock = _lock(self.root, fcntl.LOCK_SH)
+        self.run_id = run_id or f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        self.limit = segment_mb * 1024 * 1024
+        self.open: Dict[str, Tuple[str, object]] = {}   # kind -> (segment, file)
+        self.counts: Dict[str, int] = {}
+
+    def _segment(self, kind: str):
+        segment, handle = self.open.get(kind, (None, None))
+        if handle is not None and handle.tell() < self.limit:
+            return segment, handle
+        if handle is not None:
+            handle.close()
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        segment = f"{kind}/{self.run_id}-{self.counts[kind]}.csv"
+        path = self.root / segment
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle = open(path, "ab")
+        _fsync_dir(path.parent)
+        self.open[kind] = (segment, handle)
+        return segment, handle
+
+    def append(self, table_id: str, game_id: str, data: bytes, rows: Optional[int] = None) -> bool:
+        """Store one game's table (CSV bytes with header); False if unchanged since the last scrape"""
+        content_hash = hashlib.sha1(data).hexdigest()
+        known = self.conn.execute("SELECT content_hash FROM blocks WHERE table_id = ? AND game_id = ?",
+                                  (table_id, game_id)).fetchone()
+        if known and known[0] == content_hash:
+            return False
+        if not data.endswith(b"\n"):
+            data += b"\n"
+
+        kind, team = split_table_id(table_id)
+        segment, handle = self._segment(kind)
+        offset = handle.tell()
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+        # the block is durable before the index points at it
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              (table_id, game_id, kind, team, segment, offset, len(data), rows, content_hash,
+                               datetime.now().isoformat(timespec="seconds")))
+        return True
+
+    def close(self):
+        for _, handle in self.open.values():
+            handle.close()
+        self.open.clear()
+        self.conn.close()
+        self.lock.close()
+
+
+# =========================
+# READING
+# =========================
+class SegmentRef:
+    """One game's table inside a segment; loaders.read_csvs() reads it like a file"""
+    __slots__ = ("path", "offset", "length", "table_id", "game_id")
+
+    def __init__(self, path: Path, offset: int, length: int, table_id: str, game_id: str):
+        self.path = Path(path)
+        self.offset = offset
+        self.length = length
+        self.table_id = table_id
+        self.game_id = game_id
+
+    @property
+    def name(self) -> str:
+        return f"{self.game_id}.csv"
+
+    def read(self) -> bytes:
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            return f.read(self.length)
+
+    def stat(self) -> os.stat_result:
+        return self.path.stat()
+
+    def __str__(self) -> str:
+        return f"{self.path}@{self.offset}"
+
+    def __repr__(self) -> str:
+        return f"SegmentRef({self.table_id}/{self.game_id} @ {self})"
+
+
+def list_blocks(kind: str, directories: Iterable[Path] = SEASON_BOX_DIRS) -> Dict[Tuple[str, str], SegmentRef]:
+    """Map (game_id, team) -> SegmentRef for every indexed block of a kind"""
+    blocks = {}
+    for directory in directories:
+        index = Path(directory) / SEGMENTS / INDEX_NAME
+        if not index.exists():
+            continue
+        root = index.parent
+        with sqlite3.connect(index, timeout=30) as conn:
+            rows = conn.execute("SELECT game_id, team, table_id, segment, offset, length FROM blocks "
+                                "WHERE kind = ? ORDER BY game_id, team", (kind,)).fetchall()
+        for gid, team, table_id, segment, offset, length in rows:
+            blocks.setdefault((gid, team), SegmentRef(root / segment, offset, length, table_id, gid))
+    return blocks
+
+
+def read_block(table_id: str, game_id: str, base_dir) -> Optional[bytes]:
+    """CSV bytes of one game's table, or None if it is not indexed"""
+    with sqlite3.connect(Path(base_dir) / SEGMENTS / INDEX_NAME, timeout=30) as conn:
+        row = conn.execute("SELECT segment, offset, length FROM blocks WHERE table_id = ? AND game_id = ?",
+                           (table_id, game_id)).fetchone()
+    if row is None:
+        return None
+    return SegmentRef(Path(base_dir) / SEGMENTS / row[0], row[1], row[2], table_id, game_id).read()
+
+
+# =========================
+# COMPACTION
+# =========================
+def compact(base_dir, kinds: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+    """Merge each kind's live blocks into one segment and drop the old segments"""
+    root = Path(base_dir) / SEGMENTS
+    if not (root / INDEX_NAME).exists():
+        return {}
+    lock = _lock(root, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    if lock is None:
+        print(f"Skipping {root}: a scrape is writing segments")
+        return {}
+    conn = connect(base_dir)
+    kinds = kinds or [k for (k,) in conn.execute("SELECT DISTINCT kind FROM blocks ORDER BY kind")]
+    stamp = f"{datetime.now():%Y%m%d-%H%M%S}"
+    results = {}
+
+    for kind in kinds:
+        rows = conn.execute("SELECT table_id, game_id, segment, offset, length FROM blocks WHERE kind = ? "
+                            "ORDER BY game_id, table_id", (kind,)).fetchall()
+        on_disk = sorted(p.relative_to(root).as_posix() for p in (root / kind).glob("*.csv"))
+        live = sum(r[4] for r in rows)
+        total = sum((root / s).stat().st_size for s in on_disk)
+        if len(on_disk) <= 1 and total == live:
+            continue
+
+        target = f"{kind}/compact-{stamp}.csv"
+        tmp = root / (target + ".tmp")
+        moved, handles = [], {}
+        with open(tmp, "wb") as out:
+            for table_id, gid, segment, offset, length in rows:
+                if segment not in handles:
+                    handles[segment] = open(root / segment, "rb")
+                src = handles[segment]
+                src.seek(offset)
+                moved.append((target, out.tell(), table_id, gid))
+                out.write(src.read(length))
+            out.flush()
+            os.fsync(out.fileno())
+        for handle in handles.values():
+            handle.close()
+        tmp.replace(root / target)
+        _fsync_dir(root / kind)
+
+        with conn:
+            conn.executemany("UPDATE blocks SET segment = ?, offset = ? WHERE table_id = ? AND game_id = ?", moved)
+
+        for segment in on_disk:
+            (root / segment).unlink()
+        results[kind] = {"blocks": len(rows), "segments_removed": len(on_disk), "bytes_before": total,
+                         "bytes_after": live}
+    conn.close()
+    lock.close()
+    return results
+
+
+def migrate(base_dir) -> int:
+    """Move the per-file tables/box-*/<game_id>.csv[.zst] of one season dir into segments"""
+    from loaders import csv_files, game_id_from_path
+    from zstd_codec import read_bytes
+
+    writer = SegmentWriter(base_dir, run_id=f"migrate-{datetime.now():%Y%m%d-%H%M%S}")
+    moved = 0
+    try:
+        for table_dir in sorted(Path(base_dir).glob("tables/box-*")):
+            for path in csv_files(table_dir, "*.csv"):
+                gid = game_id_from_path(path)
+                if not gid:
+                    continue
+                data = read_bytes(path)
+                writer.append(table_dir.name, gid, data, rows=max(data.count(b"\n") - 1, 0))
+                path.unlink()
+                Path(str(path) + ":Zone.Identifier").unlink(missing_ok=True)
+                moved += 1
+    finally:
+        writer.close()
+    return moved
+
+
+def stats(base_dir) -> List[Dict[str, object]]:
+    root = Path(base_dir) / SEGMENTS
+    if not (root / INDEX_NAME).exists():
+        return []
+    with sqlite3.connect(root / INDEX_NAME, timeout=30) as conn:
+        live = {kind: (blocks, size) for kind, blocks, size in
+                conn.execute("SELECT kind, COUNT(*), SUM(length) FROM blocks GROUP BY kind")}
+    out = []
+    for kind, (blocks, size) in sorted(live.items()):
+        files = list((root / kind).glob("*.csv"))
+        on_disk = sum(p.stat().st_size for p in files)
+        out.append({"kind": kind, "blocks": blocks, "segments": len(files), "live_mb": size / 1e6,
+                    "dead_mb": (on_disk - size) / 1e6})
+    return out
+
+
+# =========================
+# CLI
+# =========================
+def main():
+    parser = argparse.ArgumentParser(description="Segment files of the 2025-26 box tables")
+    parser.add_argument("--dir", type=Path, action="append", help="season dir (default: every existing one)")
+    parser.add_argument("--compact", action="store_true", help="merge segments and drop dead blocks")
+    parser.add_argument("--migrate", action="store_true", help="move per-file tables into segments")
+    parser.add_argument("--game", help="print one game's table")
+    parser.add_argument("--table", help="table id for --game, e.g. box-BOS-game-basic")
+    args = parser.parse_args()
+
+    directories = [d for d in (args.dir or SEASON_BOX_DIRS) if d.exists()]
+    if args.game:
+        if not args.table:
+            parser.error("--game needs --table")
+        for directory in directories:
+            data = read_block(args.table, args.game, directory) if (directory / SEGMENTS).exists() else None
+            if data is not None:
+                print(data.decode("utf-8"))
+                return
+        raise SystemExit(f"{args.table}/{args.game} is not in any segment index")
+
+    start = time.time()
+    for directory in directories:
+        if args.migrate:
+            print(f"{directory}: {migrate(directory):,} tables moved into segments")
+        if args.compact:
+            for kind, r in compact(directory).items():
+                print(f"{directory} {kind}: {r['blocks']:,} blocks, {r['segments_removed']} segments removed, "
+                      f"{r['bytes_before'] / 1e6:.1f} -> {r['bytes_after'] / 1e6:.1f} MB")
+        for s in stats(directory):
+            print(f"{directory} {s['kind']:<16} {s['blocks']:>7,} blocks  {s['segments']:>3} segments  "
+                  f"{s['live_mb']:8.1f} MB live  {s['dead_mb']:6.1f} MB dead")
+    print(f"Done in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+SQL LAYER
+In-process DuckDB over the Parquet lake and the Elo outputs, so ad hoc
+questions are one SQL statement instead of a pandas script over thousands of
+files. Nothing is loaded up front: every view scans its files when queried,
+in parallel on all cores, reading only the columns and partitions it needs.
+
+Views:
+    four_factors, line_scores, quarters      per-game tables (lake.py, sport=nba)
+    team_basic, team_advanced                player box scores
+    team_stats_<table>                        nba_team_stats_YYYY tables (per_game_stats, advanced, ...)
+    fbref_<table>                             FBref team tables (sport=soccer)
+    team_cube                                 long-form team-season stats (team_cube.py)
+    team_elo_history, player_elo_history      rating after every game (elo_incremental.py / run_elo.py)
+    team_elo, player_elo                      current ratings
+    team_games                                one row per team and game: opponent, home, points, win,
+                                              four factors
+
+Lake views have a season column from the partition path, so season filters
+skip whole partitions.
+
+Usage:
+    python sql.py "SELECT season, AVG(pace) FROM team_games WHERE is_home AND won GROUP BY 1 ORDER BY 1"
+    python sql.py -f question.sql --out answer.csv
+    python sql.py --views
+    python sql.py                 # interactive prompt
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import duckdb
+import pandas as pd
+
+from config import ELO_HISTORY_DIR, ELO_OUTPUT_DIR, LAKE_DIR, TEAM_CUBE_DIR
+
+# =========================
+# CONFIGURATION
+# =========================
+THREADS = os.cpu_count() or 1
+ELO_FILES = {
+    "team_elo_history": ELO_HISTORY_DIR / "team_elo_history.csv",
+    "player_elo_history": ELO_HISTORY_DIR / "player_elo_history.csv",
+    "team_elo": ELO_OUTPUT_DIR / "results" / "team_elo_final.csv",
+    "player_elo": ELO_OUTPUT_DIR / "results" / "player_elo_final.csv",
+}
+TEAM_CUBE_FILE = TEAM_CUBE_DIR / "team_stats.parquet"
+
+# Built on the lake views; the home team is the code at the end of the game id
+TEAM_GAMES_SQL = """
+CREATE OR REPLACE VIEW team_games AS
+SELECT f.season, f.game_date, f.game_id, f.team, o.team AS opponent,
+       f.team = right(f.game_id, 3) AS is_home,
+       l."TOTAL" AS points, lo."TOTAL" AS opp_points, l."TOTAL" > lo."TOTAL" AS won,
+       f.pace, f."eFG%" AS efg_pct, f."TOV%" AS tov_pct, f."ORB%" AS orb_pct, f."FT/FGA" AS ft_rate,
+       f."ORtg" AS off_rtg, o."ORtg" AS def_rtg
+FROM four_factors f
+JOIN four_factors o ON o.game_id = f.game_id AND o.team <> f.team
+LEFT JOIN line_scores l ON l.game_id = f.game_id AND l.team = f.team
+LEFT JOIN line_scores lo ON lo.game_id = f.game_id AND lo.team = o.team
+"""
+
+
+# =========================
+# VIEWS
+# =========================
+def view_name(sport: str, table: str) -> str:
+    from lake import TEAM_STAT_TABLES
+    if sport == "soccer":
+        return f"fbref_{table}"
+    return f"team_stats_{table}" if table in TEAM_STAT_TABLES else table
+
+
+def _quote(path: Path) -> str:
+    return "'" + path.as_posix().replace("'", "''") + "'"
+
+
+def register_views(conn: duckdb.DuckDBPyConnection) -> Dict[str, str]:
+    """Create every view whose files exist; returns view name -> source"""
+    sources = {}
+    for sport_dir in sorted(LAKE_DIR.glob("sport=*")):
+        sport = sport_dir.name.split("=", 1)[1]
+        for table_dir in sorted(sport_dir.glob("table=*")):
+            name = view_name(sport, table_dir.name.split("=", 1)[1])
+            # union_by_name: seasons may add, drop or retype columns
+            conn.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT * FROM read_parquet("
+                         f"{_quote(table_dir / 'season=*' / '*.parquet')}, hive_partitioning = true, "
+                         f"union_by_name = true)")
+            sources[name] = str(table_dir)
+
+    if TEAM_CUBE_FILE.exists():
+        conn.execute(f"CREATE OR REPLACE VIEW team_cube AS SELECT * FROM read_parquet({_quote(TEAM_CUBE_FILE)})")
+        sources["team_cube"] = str(TEAM_CUBE_FILE)
+
+    for name, path in ELO_FILES.items():
+        if path.exists():
+            types = ", types = {'game_id': 'VARCHAR'}" if "history" in name else ""
+            conn.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT * FROM read_csv({_quote(path)}, "
+                         f"header = true{types})")
+            sources[name] = str(path)
+
+    if "four_factors" in sources and "line_scores" in sources:
+        conn.execute(TEAM_GAMES_SQL)
+        sources["team_games"] = "four_factors + line_scores"
+    return sources
+
+
+def _open(threads: int = THREADS) -> Tuple[duckdb.DuckDBPyConnection, Dict[str, str]]:
+    conn = duckdb.connect(":memory:")
+    conn.execute(f"SET threads TO {int(threads)}")
+    sources = register_views(conn)
+    if not sources:
+        print(f"No lake files under {LAKE_DIR}; run lake.py first")
+    return conn, sources
+
+
+def connect(threads: int = THREADS) -> duckdb.DuckDBPyConnection:
+    """In-memory DuckDB connection with all views registered"""
+    return _open(threads)[0]
+
+
+_shared: Optional[duckdb.DuckDBPyConnection] = None
+
+
+def query(sql: str, params: Optional[List] = None) -> pd.DataFrame:
+    """Run one statement on a shared connection and return a DataFrame"""
+    global _shared
+    if _shared is None:
+        _shared = connect()
+    return _shared.execute(sql, params or []).df()
+
+
+def describe_views(conn: duckdb.DuckDBPyConnection, sources: Dict[str, str]) -> pd.DataFrame:
+    rows = []
+    for name, source in sources.items():
+        columns = conn.execute(f"DESCRIBE {name}").df()["column_name"].tolist()
+        rows.append({"view": name, "columns": len(columns), "source": source})
+    return pd.DataFrame(rows)
+
+
+# =========================
+# CLI
+# =========================
+def _run(conn: duckdb.DuckDBPyConnection, sql: str, out: Optional[str] = None):
+    start = time.time()
+    df = conn.execute(sql).df()
+    elapsed = time.time() - start
+    if out:
+        df.to_csv(out, index=False)
+        print(f"{len(df):,} rows -> {out} ({elapsed:.2f}s)")
+    else:
+        with pd.option_context("display.max_rows", 100, "display.width", 200):
+            print(df.to_string(index=False) if len(df) else "(no rows)")
+        print(f"{len(df):,} rows in {elapsed:.2f}s")
+
+
+def repl(conn: duckdb.DuckDBPyConnection):
+    """Minimal prompt: statements end with ';', an empty line at the prompt exits"""
+    buffer = []
+    while True:
+        try:
+            line = input("sql> " if not buffer else "...> ")
+        except EOFError:
+            break
+        if not line.strip() and not buffer:
+            break
+        buffer.append(line)
+        if line.rstrip().endswith(";"):
+            try:
+                _run(conn, "\n".join(buffer))
+            except duckdb.Error as e:
+                print(f"Error: {e}")
+            buffer = []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQL over the Parquet lake and Elo outputs (DuckDB)")
+    parser.add_argument("sql", nargs="?", help="statement to run")
+    parser.add_argument("-f", "--file", help="read the statement from a file")
+    parser.add_argument("--out", help="write the result to CSV instead of printing it")
+    parser.add_argument("--views", action="store_true", help="list the registered views")
+    parser.add_argument("--threads", type=int, default=THREADS)
+    args = parser.parse_args()
+
+    conn, sources = _open(args.threads)
+    if not sources:
+        return
+
+    if args.views:
+        print(describe_views(conn, sources).to_string(index=False))
+    elif args.file or args.sql:
+        _run(conn, Path(args.file).read_text() if args.file else args.sql, args.out)
+    elif sys.stdin.isatty():
+        repl(conn)
+    else:
+        _run(conn, sys.stdin.read(), args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+TEAM-SEASON STATS CUBE
+One columnar file with every stat from the nba_team_stats_YYYY/<TEAM>/ tables,
+in long form:
+
+    family, split, season, team, player, label, stat, value
+
+family is the table type (advanced, per_game_stats, team_misc, ...), split is
+regular or playoffs (the *_post files), player is set for player tables and
+label for team rows ("Team", "Opponent/G", "Team Totals", ...).
+
+Tables are recognized by a fingerprint of their header rather than by their
+file name, so the table_N files are identified too (they turn out to be the
+site's standings/scores/leaders/staff widgets, which are inventoried but not
+part of the cube). The file name only breaks ties between tables with the same
+header (per_game_stats and per_minute_stats).
+
+Files are read on a process pool and the cube is rebuilt only when the source
+fingerprint changes. Each family is one row group, so a family filter reads one
+group and cross-team/cross-season queries are a single file read.
+
+Usage:
+    python team_cube.py                         # build (skips if sources unchanged)
+    python team_cube.py --inventory             # what every file was identified as
+    python team_cube.py --family advanced --stat BPM --season 2023
+    python team_cube.py --stat pts --team BOS     # stat names match in any case
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import hashlib
+import json
+import re
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import MAX_WORKERS, NBA_DIR, TEAM_CUBE_DIR, TEAM_STATS_GLOB
+from loaders import canonical_team, csv_files, read_table_file
+from zstd_codec import logical_path, read_bytes
+
+# =========================
+# CONFIGURATION
+# =========================
+CUBE_FILE = TEAM_CUBE_DIR / "team_stats.parquet"
+INVENTORY_FILE = TEAM_CUBE_DIR / "inventory.csv"
+STATE_FILE = TEAM_CUBE_DIR / "state.json"
+CHUNK_SIZE = 250  # files per worker task
+
+TEAM_STAT_FILE_PATTERN = re.compile(r"^(?P<team>[A-Z]{3})_(?P<table>.+)_(?P<year>\d{4})\.csv(\.zst)?$")
+
+# family -> header names that identify it (checked against the last header row)
+SIGNATURES = [
+    ("advanced", {"Player", "PER", "WS/48", "BPM"}),
+    ("totals_stats", {"Player", "PTS", "Trp-Dbl"}),
+    ("per_poss", {"Player", "PTS", "ORtg", "DRtg"}),
+    ("per_game_stats", {"Player", "MP", "PTS", "Awards"}),
+    ("per_minute_stats", {"Player", "MP", "PTS", "Awards"}),
+    ("shooting", {"Player", "Dist.", "0-3", "16-3P"}),
+    ("adj_shooting", {"Player", "FG+", "TS+"}),
+    ("pbp_stats", {"Player", "OnCourt", "On-Off"}),
+    ("salaries2", {"Rk", "Salary"}),
+    ("team_and_opponent", {"Unnamed: 0", "G", "MP", "PTS"}),
+    ("team_misc", {"MOV", "SOS", "SRS", "Pace"}),
+    ("roster", {"No.", "Player", "Birth Date"}),
+    ("injuries", {"Player", "Update", "Description"}),
+    ("draft-rights", {"Yr", "Rd", "Pk"}),
+]
+# per_poss and totals headers contain every per_game column too
+_EXCLUSIVE = {"per_game_stats": {"ORtg", "Trp-Dbl"}, "per_minute_stats": {"ORtg", "Trp-Dbl"}}
+
+PLAYER_FAMILIES = ["per_game_stats", "per_minute_stats", "totals_stats", "per_poss", "advanced",
+                   "shooting", "adj_shooting", "pbp_stats", "salaries2"]
+TEAM_FAMILIES = ["team_and_opponent", "team_misc"]
+CUBE_FAMILIES = PLAYER_FAMILIES + TEAM_FAMILIES
+
+LEADER_STATS = {"PTS", "TRB", "AST", "STL", "BLK"}
+DROP_COLUMNS = {"Rk"}
+
+
+# =========================
+# IDENTIFICATION
+# =========================
+@lru_cache(maxsize=None)
+def candidates_for(header: str) -> Tuple[str, ...]:
+    """Families whose signature matches a header row (cached per distinct header)"""
+    names = set(next(csv.reader([header]), []))
+    return tuple(family for family, required in SIGNATURES
+                 if required <= names and not (_EXCLUSIVE.get(family, set()) & names))
+
+
+def identify(path: Path) -> Tuple[str, str]:
+    """(family, split) of one team-stats file, from its header fingerprint"""
+    m = TEAM_STAT_FILE_PATTERN.match(path.name)
+    table = m.group("table") if m else logical_path(path).stem
+    split = "playoffs" if table.endswith("_post") else "regular"
+    named = table[:-len("_post")] if split == "playoffs" else table
+
+    lines = [line.strip() for line in read_bytes(path).decode("utf-8", errors="replace").split("\n", 3)[:3]]
+    lines += [""] * (3 - len(lines))
+    header, first_row = lines[0], lines[1]
+    if header.startswith("Unnamed: 0_level_0"):
+        header, first_row = lines[1], lines[2]
+
+    if re.fullmatch(r"0(,\d+)*", header):
+        # Unlabeled site widgets: division standings, scores, league leaders, staff
+        width = header.count(",") + 1
+        first_cell = first_row.split(",", 1)[0]
+        widget = {4: "standings", 2: "staff"}.get(width, "leaders" if first_cell in LEADER_STATS else "scores")
+        return f"widget_{widget}", split
+
+    candidates = candidates_for(header)
+    if named in candidates:
+        return named, split
+    if len(candidates) == 1:
+        return candidates[0], split  # header wins over a table_N or wrong name
+    if not candidates and not named.startswith("table_"):
+        return named, split  # a table type without a registered signature
+    return "unknown", split
+
+
+def discover(directory: Path = NBA_DIR) -> List[Tuple[int, str, Path]]:
+    """(season, team, path) of every team-stats CSV; season uses the start-year convention"""
+    found = []
+    for season_dir in sorted(Path(directory).glob(TEAM_STATS_GLOB)):
+        year = season_dir.name.rsplit("_", 1)[-1]
+        if not year.isdigit():
+            continue
+        for path in csv_files(season_dir, "*/*.csv"):
+            found.append((int(year) - 1, canonical_team(path.parent.name), path))
+    return found
+
+
+def fingerprint(sources: Iterable[Tuple[int, str, Path]]) -> str:
+    h = hashlib.sha1()
+    for _, _, path in sources:
+        st = path.stat()
+        h.update(f"{path.parent.parent.name}/{path.name}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+# =========================
+# READING
+# =========================
+def to_number(values: pd.Series) -> pd.Series:
+    """'$36,861,707' / '-0.8%' / '+3.1' / '.471' -> float; text -> NaN"""
+    cleaned = values.astype("string").str.replace(r"[$,%+]", "", regex=True).str.strip()
+    return pd.to_numeric(cleaned, errors="coerce")
+
+
+def melt_table(df: pd.DataFrame, family: str) -> pd.DataFrame:
+    """One table -> long rows (player, label, stat, raw value); values are parsed per chunk"""
+    df = df.drop(columns=[c for c in df.columns if c in DROP_COLUMNS])
+    if family in TEAM_FAMILIES:
+        key = df.columns[0]
+        labels, base = [], "Team"
+        for label in df[key].astype(str):
+            if label in ("Team", "Opponent"):
+                base = label
+            labels.append(f"{base} {label}" if label in ("Lg Rank", "Year/Year") else label)
+        players, labels = np.full(len(df), None, dtype=object), np.asarray(labels, dtype=object)
+    else:
+        key = "Player" if "Player" in df.columns else df.columns[0]  # salaries2: 'Unnamed: 1'
+        names = df[key].astype(str).str.strip().to_numpy(dtype=object)
+        totals = np.array(["Team Total" in n for n in names])
+        players, labels = np.where(totals, None, names), np.where(totals, names, None)
+
+    stat_cols = [c for c in df.columns if c != key]
+    values = df[stat_cols].to_numpy(dtype=object)
+    return pd.DataFrame({
+        "player": np.repeat(players, len(stat_cols)),
+        "label": np.repeat(labels, len(stat_cols)),
+        "stat": np.tile(np.asarray(stat_cols, dtype=object), len(df)),
+        "value": values.ravel(),
+    })
+
+
+def _read_chunk(jobs: List[Tuple[int, str, str]]) -> Tuple[pd.DataFrame, List[dict]]:
+    """Worker: identify and melt one chunk of files"""
+    frames, inventory = [], []
+    for season, team, path in jobs:
+        path = Path(path)
+        family, split = identify(path)
+        inventory.append({"path": f"{path.parent.parent.name}/{path.parent.name}/{path.name}",
+                          "season": season, "team": team, "family": family, "split": split})
+        if family not in CUBE_FAMILIES:
+            continue
+        try:
+            long = melt_table(read_table_file(path), family)
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+            inventory[-1]["family"] = f"unreadable: {e}"
+            continue
+        long["family"], long["split"], long["season"], long["team"] = family, split, season, team
+        frames.append(long)
+    if not frames:
+        return pd.DataFrame(), inventory
+
+    # Numeric cells only: text columns (Pos, Awards, Arena) and blanks drop out here
+    df = pd.concat(frames, ignore_index=True)
+    df["value"] = to_number(df["value"])
+    df = df[df["value"].notna()]
+    return df[["family", "split", "season", "team", "player", "label", "stat", "value"]], inventory
+
+
+# =========================
+# BUILD
+# =========================
+def build(force: bool = False, processes: bool = True) -> Optional[int]:
+    """Rebuild the cube if the source files changed; returns cube rows (None if skipped, 0 if nothing to build)"""
+    sources = discover()
+    stamp = fingerprint(sources)
+    state = json.loads(STATE_FILE.read_text()) if STATE_FILE.exists() else {}
+    if not force and state.get("fingerprint") == stamp and CUBE_FILE.exists():
+        return None
+
+    jobs = [(s, t, str(p)) for s, t, p in sources]
+    chunks = [jobs[i:i + CHUNK_SIZE] for i in range(0, len(jobs), CHUNK_SIZE)]
+    if processes and len(chunks) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(chunks))) as pool:
+            results = list(pool.map(_read_chunk, chunks))
+    else:
+        results = [_read_chunk(chunk) for chunk in chunks]
+
+    frames = [df for df, _ in results if not df.empty]
+    inventory = pd.DataFrame([row for _, rows in results for row in rows])
+    if not frames:
+        print(f"No team-stats tables under {NBA_DIR / TEAM_STATS_GLOB} ({len(sources)} files read)")
+        return 0
+    cube = pd.concat(frames, ignore_index=True)
+
+    for col in ("family", "split", "team", "player", "label", "stat"):
+        cube[col] = cube[col].astype("category")
+    cube["season"] = cube["season"].astype("int16")
+    cube["value"] = cube["value"].astype("float32")
+    cube = cube.sort_values(["family", "split", "season", "team"]).reset_index(drop=True)
+
+    TEAM_CUBE_DIR.mkdir(parents=True, exist_ok=True)
+    data = pa.Table.from_pandas(cube, preserve_index=False)
+    tmp = CUBE_FILE.with_name(CUBE_FILE.name + ".tmp")
+    with pq.ParquetWriter(tmp, data.schema, compression="zstd") as writer:
+        start = 0
+        for end in cube.groupby("family", sort=False, observed=True).size().cumsum().tolist():
+            writer.write_table(data.slice(start, end - start))
+            start = end
+    tmp.replace(CUBE_FILE)
+    inventory.to_csv(INVENTORY_FILE, index=False)
+    STATE_FILE.write_text(json.dumps({"fingerprint": stamp, "files": len(sources), "rows": len(cube)}))
+    return len(cube)
+
+
+# =========================
+# QUERIES
+# =========================
+def read_cube(families: Optional[Iterable[str]] = None, split: Optional[str] = "regular",
+              seasons: Optional[Iterable[int]] = None, teams: Optional[Iterable[str]] = None,
+              players: Optional[Iterable[str]] = None, stats: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Cube rows matching all given filters, in one read of the cube file"""
+    filters = []
+    for column, values in (("family", families), ("team", teams), ("player", players), ("stat", stats)):
+        if values is not None:
+            filters.append((column, "in", [str(v) for v in values]))
+    if seasons is not None:
+        filters.append(("season", "in", [int(s) for s in seasons]))
+    if split is not None:
+        filters.append(("split", "=", split))
+    return pq.read_table(CUBE_FILE, filters=filters or None).to_pandas()
+
+
+def stat_names(families: Optional[Iterable[str]] = None) -> List[str]:
+    """Distinct stat names in the cube, of the given families only if any"""
+    filters = [("family", "in", [str(f) for f in families])] if families else None
+    stats = pq.read_table(CUBE_FILE, columns=["stat"], filters=filters).column("stat")
+    return sorted(map(str, stats.unique().to_pylist()))
+
+
+def match_stats(names: Iterable[str], families: Optional[Iterable[str]] = None) -> Tuple[List[str], List[str]]:
+    """(stats in the cube matching names case-insensitively, names matching none)"""
+    by_lower = {}
+    for stat in stat_names(families):
+        by_lower.setdefault(stat.lower(), []).append(stat)
+    matched = [stat for name in names for stat in by_lower.get(name.lower(), [])]
+    return list(dict.fromkeys(matched)), [name for name in names if name.lower() not in by_lower]
+
+
+def pivot(df: pd.DataFrame) -> pd.DataFrame:
+    """Long cube rows -> one row per (season, team, player/label), one column per stat"""
+    df = df.assign(entity=df["player"].astype("string").fillna(df["label"].astype("string")))
+    return df.pivot_table(index=["season", "team", "entity"], columns="stat", values="value",
+                          aggfunc="first", observed=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the team-season stats cube")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild even if sources are unchanged")
+    parser.add_argument("--serial", action="store_true", help="read in-process instead of a process pool")
+    parser.add_argument("--inventory", action="store_true", help="summarize how files were identified")
+    parser.add_argument("--family", action="append", help="query: stat family (repeatable)")
+    parser.add_argument("--stat", action="append", help="query: stat name (repeatable)")
+    parser.add_argument("--season", type=int, action="append", help="query: season start year (repeatable)")
+    parser.add_argument("--team", action="append", help="query: team code (repeatable)")
+    parser.add_argument("--playoffs", action="store_true", help="query the *_post tables")
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.family or args.stat:
+        stats = None
+        if args.stat:
+            # stat names keep the site's case (PTS, eFG%, ...); --stat pts finds PTS
+            stats, unknown = match_stats(args.stat, args.family)
+            if unknown:
+                print(f"Unknown stat {', '.join(unknown)}; valid stats: {', '.join(stat_names(args.family))}")
+            if not stats:
+                return
+        df = read_cube(families=args.family, split="playoffs" if args.playoffs else "regular",
+                       seasons=args.season, teams=args.team, stats=stats)
+        if df.empty:
+            print("(no rows)")
+        else:
+            print(pivot(df).sort_values(by=(stats or [df["stat"].iloc[0]])[0], ascending=False)
+                  .head(15).to_string())
+        print(f"{len(df):,} cube rows in {time.time() - start:.2f}s")
+        return
+    if args.inventory:
+        inventory = pd.read_csv(INVENTORY_FILE)
+        print(inventory.groupby(["family", "split"]).size().to_string())
+        return
+
+    rows = build(force=args.rebuild, processes=not args.serial)
+    if rows is None:
+        print(f"Cube is up to date -> {CUBE_FILE}")
+    elif rows:
+        size = CUBE_FILE.stat().st_size / 1e6
+        print(f"{rows:,} cube rows, {size:.1f} MB in {time.time() - start:.1f}s -> {CUBE_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+FIXTURE SERVER
+Serves saved pages (fixtures/boxscores/ by default) on a localhost port, for
+test_fetch.py and for comparing the fetch backends by hand: every page is
+fetched through each backend, its tables are compared with the saved file's,
+and time, CPU (Chrome included) and peak memory per page are reported.
+
+Usage:
+    python tests/fixture_server.py                                 # the fixture pages, http backend
+    python tests/fixture_server.py path/to/saved_pages --selenium  # also through Chrome
+"""
+
+import argparse
+import functools
+import http.server
+import os
+import sys
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fetch import Fetcher, Page  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "boxscores"
+
+
+# =========================
+# SERVER
+# =========================
+class FixtureHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, as the real site
+    wbufsize = 1 << 16               # one write per response, or Nagle + delayed ACKs add 40 ms a page
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureServer:
+    """A folder of pages on a localhost port; the base url while entered"""
+
+    def __init__(self, directory: Path = FIXTURES):
+        self.directory = directory
+
+    def __enter__(self) -> str:
+        handler = functools.partial(FixtureHandler, directory=str(self.directory))
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# =========================
+# BACKEND CHECK
+# =========================
+def _tree_usage() -> Tuple[float, float]:
+    """CPU seconds and RSS (MB) of this process and its descendants (Chrome included), from /proc"""
+    procs = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+            rss_kb = 0
+            for line in (stat.parent / "status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    rss_kb = int(line.split()[1])
+        except (OSError, IndexError):
+            continue
+        # fields[1] is ppid; utime/stime are fields 11/12 after the command name
+        procs[int(stat.parent.name)] = (int(fields[1]), (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK"),
+                                        rss_kb / 1024)
+    tree, frontier = {os.getpid()}, [os.getpid()]
+    while frontier:
+        parent = frontier.pop()
+        children = [pid for pid, (ppid, _, _) in procs.items() if ppid == parent and pid not in tree]
+        tree.update(children)
+        frontier.extend(children)
+    return sum(procs[p][1] for p in tree if p in procs), sum(procs[p][2] for p in tree if p in procs)
+
+
+def _frames(page: Page) -> Dict[str, pd.DataFrame]:
+    return {tid: pd.read_html(StringIO(html))[0] for html, tid in page.tables()}
+
+
+def check(directory: Path, backends: List[str]) -> List[Dict[str, object]]:
+    """Serve saved pages on localhost, fetch them through each backend and compare the extracted tables"""
+    pages = sorted(p.relative_to(directory).as_posix() for p in Path(directory).rglob("*.html"))
+
+    results = []
+    with FixtureServer(directory) as base:
+        extracted = {}
+        for backend in backends:
+            fetcher = Fetcher(backend, fallback=False)
+            fetcher.get(base + pages[0])  # warm up: connection pool / browser start-up not counted per page
+            cpu0, _ = _tree_usage()
+            start = time.time()
+            rss = 0.0
+            for name in pages:
+                extracted[(backend, name)] = _frames(fetcher.get(base + name))
+                rss = max(rss, _tree_usage()[1])
+            cpu1, _ = _tree_usage()
+            fetcher.close()
+            results.append({"backend": backend, "pages": len(pages),
+                            "seconds_per_page": (time.time() - start) / len(pages),
+                            "cpu_per_page": (cpu1 - cpu0) / len(pages), "peak_rss_mb": rss})
+
+        for name in pages:
+            # reference: the saved file itself, parsed the same way
+            reference = _frames(Page(base + name, (Path(directory) / name).read_text(encoding="utf-8"), "file"))
+            for backend in backends:
+                got = extracted[(backend, name)]
+                same = got.keys() == reference.keys() and all(got[t].equals(reference[t]) for t in reference)
+                if not same:
+                    print(f"  MISMATCH {backend} {name}: {sorted(got)} vs {sorted(reference)}")
+                for r in results:
+                    if r["backend"] == backend:
+                        r["identical"] = r.get("identical", True) and same
+                        r["tables"] = r.get("tables", 0) + len(got)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve saved pages locally and compare the fetch backends")
+    parser.add_argument("directory", type=Path, nargs="?", default=FIXTURES, help="folder of saved .html pages")
+    parser.add_argument("--selenium", action="store_true", help="also fetch through Chrome")
+    args = parser.parse_args()
+
+    backends = ["http", "selenium"] if args.selenium else ["http"]
+    results = check(args.directory, backends)
+    for r in results:
+        print(f"  {r['backend']:<9} {r['pages']:>4} pages  {r['tables']:>5} tables  "
+              f"{r['seconds_per_page'] * 1000:7.1f} ms/page  {r['cpu_per_page'] * 1000:7.1f} ms CPU/page  "
+              f"{r['peak_rss_mb']:7.0f} MB peak  identical={r['identical']}")
+    if not all(r["identical"] for r in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+BOX-SCORE PARSING TESTS
+parse_game on the fixture pages (fixtures/boxscores/): every *-basic table of
+both teams comes back with the player uid and game keys, and it runs in a
+spawn worker pool, which imports box_scores.py rather than the scraper script.
+
+Usage:
+    python -m pytest back_end/data_layer/data_scrappers/pipeline/tests
+"""
+
+import functools
+import multiprocessing
+import sys
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from box_scores import parse_game  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "boxscores"
+URL = "https://www.basketball-reference.com/boxscores/{}"
+
+
+class ParseGameTest(unittest.TestCase):
+    def test_basic_tables(self):
+        path = FIXTURES / "201910220TOR.html"
+        tables = parse_game(URL.format(path.name), path.read_text(encoding="utf-8"), season=2020)
+        ids = [tid for tid, _ in tables]
+        self.assertIn("box-NOP-game-basic", ids)
+        self.assertIn("box-TOR-game-basic", ids)
+        self.assertTrue(all("basic" in tid for tid in ids))
+        for tid, df in tables:
+            with self.subTest(table=tid):
+                self.assertIn("unnamed_0_level_0_starters", df.columns)
+                self.assertEqual(set(df["game_id"]), {"201910220TOR"})
+                self.assertEqual(set(df["game_date"]), {date(2019, 10, 22)})
+                self.assertEqual(set(df["team"]) | set(df["opponent"]), {"NOP", "TOR"})
+                self.assertTrue(df["player_uid"].str.fullmatch(r"[0-9a-f]{40}").all())
+
+    def test_spawn_workers(self):
+        parse = functools.partial(parse_game, season=2020)
+        pages = sorted(FIXTURES.glob("*.html"))
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(parse, [URL.format(p.name) for p in pages],
+                                    [p.read_text(encoding="utf-8") for p in pages]))
+        for path, tables in zip(pages, results):
+            self.assertTrue(tables, path.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+FETCH BACKEND TESTS
+The http backend must extract the same box-score tables the Selenium scraper
+read. fixtures/boxscores/ holds box-score pages in basketball-reference's
+markup (rendered from saved 2019-20 box-score CSVs): live basic, quarter and
+advanced tables, with the line score and four factors inside HTML comments as
+the site serves them. The pages are served from localhost.
+
+The reference is what Selenium saw: the site's JavaScript un-comments the
+tables, so the page with its comment markers removed is read with
+pd.read_html, table by table. With Selenium and Chrome installed the Selenium
+backend is compared with the http backend as well.
+
+Usage:
+    python -m pytest back_end/data_layer/data_scrappers/pipeline/tests
+"""
+
+import importlib.util
+import re
+import shutil
+import sys
+import unittest
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fetch import Fetcher, Page  # noqa: E402
+from fixture_server import FIXTURES, FixtureServer  # noqa: E402
+
+COMMENTED_TABLES = {"line_score", "four_factors"}
+
+
+def _reference_tables(html: str) -> dict:
+    """table id -> DataFrame, read from the page with its comments opened up"""
+    opened = re.sub(r"<!--|-->", "", html)
+    ids = re.findall(r'<table[^>]*\sid="([^"]+)"', opened)
+    return {tid: pd.read_html(StringIO(opened), attrs={"id": tid})[0] for tid in ids}
+
+
+def _extracted_tables(page: Page) -> dict:
+    return {tid: pd.read_html(StringIO(html))[0] for html, tid in page.tables()}
+
+
+def _selenium_available() -> bool:
+    return importlib.util.find_spec("selenium") is not None and bool(
+        shutil.which("chromedriver") or shutil.which("google-chrome") or shutil.which("chromium"))
+
+
+class HttpBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.pages = sorted(FIXTURES.glob("*.html"))
+        self.assertTrue(self.pages, f"no fixture pages in {FIXTURES}")
+
+    def test_same_tables_as_read_html(self):
+        with FixtureServer() as base:
+            fetcher = Fetcher("http", fallback=False)
+            try:
+                for path in self.pages:
+                    with self.subTest(page=path.name):
+                        page = fetcher.get(base + path.name)
+                        self.assertEqual(page.backend, "http")
+                        got = _extracted_tables(page)
+                        reference = _reference_tables(path.read_text(encoding="utf-8"))
+                        self.assertEqual(sorted(got), sorted(reference))
+                        for tid, df in reference.items():
+                            pd.testing.assert_frame_equal(got[tid], df, obj=tid)
+            finally:
+                fetcher.close()
+            self.assertEqual(fetcher.counts["selenium"], 0)
+
+    def test_commented_tables_are_found(self):
+        page = Page("file", self.pages[0].read_text(encoding="utf-8"), "file")
+        ids = page.table_ids()
+        self.assertTrue(COMMENTED_TABLES <= set(ids))
+        # live tables first, as the DOM lists them before JavaScript opens the comments
+        self.assertTrue(ids[0].startswith("box-"))
+        self.assertEqual(len(page.tables(prefix="box-", predicate=lambda t: t.endswith("-game-basic"))), 2)
+
+    def test_utf8_without_charset_header(self):
+        # the fixture server sends text/html without a charset; requests alone would decode it as ISO-8859-1
+        with FixtureServer() as base:
+            fetcher = Fetcher("http", fallback=False)
+            try:
+                page = fetcher.get(base + "201910220TOR.html")
+            finally:
+                fetcher.close()
+        players = page.tables(prefix="box-NOP-game-basic")[0][0]
+        self.assertIn("Nicolò Melli", players)
+        self.assertNotIn("NicolÃ", players)
+
+
+@unittest.skipUnless(_selenium_available(), "selenium and Chrome are not installed")
+class SeleniumBackendTest(unittest.TestCase):
+    def test_same_tables_as_http(self):
+        with FixtureServer() as base:
+            http_fetcher, selenium_fetcher = Fetcher("http", fallback=False), Fetcher("selenium")
+            try:
+                for path in sorted(FIXTURES.glob("*.html")):
+                    with self.subTest(page=path.name):
+                        via_http = _extracted_tables(http_fetcher.get(base + path.name))
+                        via_selenium = _extracted_tables(selenium_fetcher.get(base + path.name))
+                        self.assertEqual(sorted(via_http), sorted(via_selenium))
+                        for tid, df in via_http.items():
+                            pd.testing.assert_frame_equal(via_selenium[tid], df, obj=tid)
+            finally:
+                http_fetcher.close()
+                selenium_fetcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+SCRAPE ENGINE TESTS
+Engine and TokenBucket against the local stub server (scrape_engine.check):
+pages are fetched at the configured rate, never faster, however slow each page
+is. The adaptive host rates (AIMD): the additive increase, the cut and pause on
+a 429/503 with Retry-After, the rates saved to and loaded from the rates file,
+and a stub that throttles above a capacity, where the rate must settle under
+it without cuts below it.
+
+Usage:
+    python -m pytest back_end/data_layer/data_scrappers/pipeline/tests
+"""
+
+import json
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import scrape_engine  # noqa: E402
+from scrape_engine import DECREASE, DEFAULT_LIMIT, INCREASE_EVERY, HostRates, TokenBucket, check  # noqa: E402
+
+HOST = "stub.test"
+
+
+class HostRatesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "host_rates.json"
+        self.rates = HostRates(path=self.path, increase=5)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_additive_increase(self):
+        start = self.rates.bucket(HOST).per_minute
+        self.assertEqual(start, DEFAULT_LIMIT[0])
+        for _ in range(INCREASE_EVERY - 1):
+            self.rates.success(HOST)
+        self.assertEqual(self.rates.bucket(HOST).per_minute, start)
+        self.rates.success(HOST)
+        self.assertEqual(self.rates.bucket(HOST).per_minute, start + 5)
+
+    def test_throttle_cuts_once_and_holds_for_retry_after(self):
+        start = self.rates.bucket(HOST).per_minute
+        sent = time.monotonic()
+        self.rates.throttled(HOST, retry_after=0.5, started=sent)
+        bucket = self.rates.bucket(HOST)
+        self.assertEqual(bucket.per_minute, start * DECREASE)
+        delay, _ = bucket.reserve()
+        self.assertGreater(delay, 0.4)
+
+        # sent before the cut, at the old rate: pauses the host again but is the same signal
+        self.rates.throttled(HOST, retry_after=0.5, started=sent)
+        self.assertEqual(bucket.per_minute, start * DECREASE)
+        self.assertEqual(self.rates.cuts[HOST], [start])
+
+    def test_rates_persist(self):
+        start = self.rates.bucket(HOST).per_minute
+        for _ in range(INCREASE_EVERY):
+            self.rates.success(HOST)
+        self.rates.throttled(HOST, retry_after=0.1)
+        saved = json.loads(self.path.read_text())[HOST]
+        self.assertEqual(saved["per_minute"], (start + 5) * DECREASE)
+        self.assertEqual(saved["throttles"], 1)
+
+        # the next run starts from the learned rate
+        self.assertEqual(HostRates(path=self.path).bucket(HOST).per_minute, (start + 5) * DECREASE)
+        self.rates.reset()
+        self.assertFalse(self.path.exists())
+        self.assertEqual(self.rates.bucket(HOST).per_minute, start)
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_new_rate_drops_reservations(self):
+        bucket = TokenBucket(60, burst=1)
+        bucket.reserve()
+        delay, generation = bucket.reserve()
+        self.assertAlmostEqual(delay, 1.0, places=1)
+        self.assertTrue(bucket.current(generation))
+        # a caller spaced at 60/min is not let through after a cut to 30/min: it reserves again
+        bucket.set_rate(30)
+        self.assertFalse(bucket.current(generation))
+        delay, _ = bucket.reserve()
+        self.assertAlmostEqual(delay, 2.0, places=1)
+        delay, _ = bucket.reserve()
+        self.assertAlmostEqual(delay, 4.0, places=1)
+
+    def test_pause_drops_reservations(self):
+        bucket = TokenBucket(60, burst=1)
+        _, generation = bucket.reserve()
+        bucket.pause(0.2)
+        self.assertFalse(bucket.current(generation))
+        delay, generation = bucket.reserve()
+        self.assertGreater(delay, 0.15)
+        time.sleep(delay)
+        self.assertTrue(bucket.current(generation))
+
+
+class EngineRateTest(unittest.TestCase):
+    def test_configured_rate(self):
+        # 0.3 s pages at 120/min: a fetch-then-sleep loop would manage 92/min
+        r = check(rate=120, burst=2, pages=30, latency=0.3, concurrency=scrape_engine.CONCURRENCY)
+        self.assertEqual(r["errors"], 0)
+        self.assertLessEqual(r["busiest_10s"], r["allowed_10s"])
+        self.assertAlmostEqual(r["achieved_per_min"], r["configured_per_min"], delta=0.05 * r["configured_per_min"])
+        self.assertGreater(r["achieved_per_min"], r["sequential_per_min"])
+
+
+class AdaptiveCheckTest(unittest.TestCase):
+    def test_settles_under_capacity(self):
+        # starts above the stub's capacity: one cut brings it under, later cuts only where it climbed back to it
+        capacity = 90
+        r = check(rate=120, burst=1, pages=100, latency=0.05, concurrency=scrape_engine.CONCURRENCY,
+                  capacity=capacity, increase=20)
+        self.assertEqual(r["errors"], 0)
+        self.assertTrue(r["cuts"])
+        self.assertLessEqual(len(r["cuts"]), 6)
+        self.assertTrue(all(c >= 0.9 * capacity for c in r["cuts"]), r["cuts"])
+        self.assertGreaterEqual(r["settled_per_min"], DECREASE * capacity)
+        self.assertLessEqual(r["settled_per_min"], capacity)
+
+
+if __name__ == "__main__":
+    unittest.main()
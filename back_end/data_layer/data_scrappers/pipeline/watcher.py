@@ -0,0 +1,347 @@
+"""
+SCRAPE FOLDER WATCHER
+Keeps the Elo ratings and derived caches fresh while the scrapers run: watches
+the scraped-data tree and re-runs only the stages the changed files feed.
+
+    box scores   nba_boxscores/*.csv, nba_2025_26_boxscores/   compact -> elo -> features, matrix, percentiles, lake -> aggregates
+    team stats   nba_team_stats_YYYY/<TEAM>/                   team_cube, percentiles, lake
+    FBref        primier_leaugue_stats/                         lake
+
+Changes come from inotify (Linux, called through libc so nothing extra is
+installed) or, where that is unavailable, from polling file sizes/mtimes.
+Events are debounced: a batch runs once the tree has been quiet for
+QUIET_SECONDS, or MAX_DELAY_SECONDS after its first change while a scrape keeps
+writing, so a scrape that writes a thousand files triggers one run. Every stage
+is incremental (compact appends new game_ids, elo_incremental.py rates only new
+games, ...), so new box scores show up in the ratings well within a minute.
+
+nba_scapper.py appends each game to segment files it keeps open for the whole
+scrape (segments.py), so under segments/ every write is a change, not just
+closes and renames.
+
+Output folders (derived/, unified/, elo_output/) are not watched, so the stages
+do not trigger themselves.
+
+Usage:
+    python watcher.py            # watch (inotify, polling fallback)
+    python watcher.py --poll     # force polling
+    python watcher.py --once     # run every stage once and exit
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import time
+import traceback
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config import (BOXSCORE_DIR, DATA_DIR, DERIVED_DIR, ELO_OUTPUT_DIR, FBREF_DIR, NBA_DIR, SEASON_BOX_DIRS,
+                    TEAM_STATS_GLOB, UNIFIED_DIR)
+from segments import SEGMENTS
+from zstd_codec import logical_path
+
+# =========================
+# CONFIGURATION
+# =========================
+QUIET_SECONDS = 5
+MAX_DELAY_SECONDS = 30
+POLL_SECONDS = 10
+
+OUTPUT_DIRS = [DERIVED_DIR, UNIFIED_DIR, ELO_OUTPUT_DIR]
+IGNORED_SUFFIXES = (":Zone.Identifier", ".tmp", ".part")
+
+
+def _compact():
+    from compact import compact
+    return compact()
+
+
+def _elo():
+    from elo_incremental import update
+    return update()
+
+
+def _features():
+    from feature_store import update_store
+    return update_store()
+
+
+def _player_matrix():
+    from player_matrix import build
+    return build()
+
+
+def _percentiles():
+    from percentiles import build
+    return build()
+
+
+def _team_cube():
+    from team_cube import build
+    return build()
+
+
+def _lake():
+    from lake import build
+    return build()
+
+
+def _aggregates():
+    from aggregate_cache import refresh
+    return refresh()
+
+
+# Run order; a stage is skipped when the stage it depends on failed in the same batch
+STAGES = {
+    "compact": (_compact, None),
+    "elo": (_elo, "compact"),
+    "features": (_features, "elo"),
+    "player_matrix": (_player_matrix, None),
+    "percentiles": (_percentiles, None),
+    "team_cube": (_team_cube, None),
+    "lake": (_lake, None),
+    "aggregates": (_aggregates, "lake"),
+}
+
+BOX_SCORE_STAGES = {"compact", "elo", "features", "player_matrix", "percentiles", "lake", "aggregates"}
+TEAM_STATS_STAGES = {"team_cube", "percentiles", "lake"}
+FBREF_STAGES = {"lake"}
+
+
+# =========================
+# ROUTING
+# =========================
+def _under(path: Path, directory: Path) -> bool:
+    try:
+        path.relative_to(directory)
+        return True
+    except ValueError:
+        return False
+
+
+def ignored(path: Path) -> bool:
+    return path.name.endswith(IGNORED_SUFFIXES) or any(_under(path, d) for d in OUTPUT_DIRS)
+
+
+def stages_for(path: Path) -> Set[str]:
+    """Stages fed by one changed file"""
+    if ignored(path) or logical_path(path).suffix != ".csv":
+        return set()
+    if path.parent == BOXSCORE_DIR or any(_under(path, d) for d in SEASON_BOX_DIRS):
+        return BOX_SCORE_STAGES
+    if _under(path, NBA_DIR) and any(fnmatch.fnmatch(part, TEAM_STATS_GLOB) for part in path.parts):
+        return TEAM_STATS_STAGES
+    if path.parent == FBREF_DIR:
+        return FBREF_STAGES
+    return set()
+
+
+def run_stages(stages: Iterable[str]):
+    """Run the given stages in pipeline order"""
+    failed = set()
+    for name, (func, depends_on) in STAGES.items():
+        if name not in stages:
+            continue
+        if depends_on in failed:
+            print(f"  {name}: skipped ({depends_on} failed)")
+            failed.add(name)
+            continue
+        start = time.time()
+        try:
+            func()
+            print(f"  {name}: {time.time() - start:.1f}s")
+        except Exception:
+            traceback.print_exc()
+            print(f"  {name}: FAILED")
+            failed.add(name)
+
+
+# =========================
+# CHANGE SOURCES
+# =========================
+class InotifySource:
+    """Recursive inotify watches through libc (one watch per directory)"""
+
+    MASK = 0x00000008 | 0x00000080 | 0x00000100  # IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    SEGMENT_MASK = MASK | 0x00000002              # | IN_MODIFY: segments are appended to while open
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, root: Path = DATA_DIR):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs: Dict[int, Path] = {}
+        self.overflowed = False
+        self._add_tree(root)
+
+    def _add_tree(self, root: Path) -> List[Path]:
+        """Watch root and its subfolders; returns the files already in them"""
+        files = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirpath = Path(dirpath)
+            if ignored(dirpath):
+                dirnames[:] = []
+                continue
+            mask = self.SEGMENT_MASK if SEGMENTS in dirpath.parts else self.MASK
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), mask)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {dirpath}")
+            self.dirs[wd] = dirpath
+            files += [dirpath / f for f in filenames]
+        return files
+
+    def changes(self, timeout: float) -> List[Path]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 1 << 16)
+        changed, offset = [], 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                self.overflowed = True
+            elif wd in self.dirs and name:
+                path = self.dirs[wd] / os.fsdecode(name)
+                if mask & self.IN_ISDIR:
+                    # files can land in a new folder before its watch exists
+                    changed += self._add_tree(path)
+                else:
+                    changed.append(path)
+        # one IN_MODIFY per appended block: report each file once per read
+        return list(dict.fromkeys(changed))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingSource:
+    """Fallback: compares (size, mtime) of every file every POLL_SECONDS"""
+
+    def __init__(self, root: Path = DATA_DIR, interval: float = POLL_SECONDS):
+        self.root = root
+        self.interval = interval
+        self.overflowed = False
+        self.snapshot = self._scan()
+        self.next_scan = time.time() + interval
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        state = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirpath = Path(dirpath)
+            if ignored(dirpath):
+                dirnames[:] = []
+                continue
+            for name in filenames:
+                try:
+                    st = os.stat(dirpath / name)
+                except FileNotFoundError:
+                    continue
+                state[dirpath / name] = (st.st_size, st.st_mtime_ns)
+        return state
+
+    def changes(self, timeout: float) -> List[Path]:
+        time.sleep(max(0.0, min(timeout, self.next_scan - time.time())))
+        if time.time() < self.next_scan:
+            return []
+        current = self._scan()
+        self.next_scan = time.time() + self.interval
+        changed = [p for p, sig in current.items() if self.snapshot.get(p) != sig]
+        self.snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+
+# =========================
+# WATCH LOOP
+# =========================
+class Debouncer:
+    """Collects stages until QUIET_SECONDS without changes or MAX_DELAY_SECONDS overall"""
+
+    def __init__(self, quiet: float = QUIET_SECONDS, max_delay: float = MAX_DELAY_SECONDS):
+        self.quiet = quiet
+        self.max_delay = max_delay
+        self.pending: Set[str] = set()
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+
+    def add(self, stages: Set[str], now: float):
+        if not stages:
+            return
+        self.pending |= stages
+        self.first = self.first or now
+        self.last = now
+
+    def wait(self, now: float) -> Optional[float]:
+        """Seconds until the pending batch is due (None if nothing is pending)"""
+        if not self.pending:
+            return None
+        return max(0.0, min(self.last + self.quiet, self.first + self.max_delay) - now)
+
+    def take(self) -> Set[str]:
+        stages, self.pending, self.first, self.last = self.pending, set(), None, None
+        return stages
+
+
+def open_source(poll: bool = False):
+    if not poll:
+        try:
+            source = InotifySource()
+            print(f"Watching {len(source.dirs)} folders under {DATA_DIR} (inotify)")
+            return source
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}); polling instead")
+    source = PollingSource()
+    print(f"Polling {len(source.snapshot):,} files under {DATA_DIR} every {POLL_SECONDS}s")
+    return source
+
+
+def watch(poll: bool = False):
+    source = open_source(poll)
+    debouncer = Debouncer()
+    try:
+        while True:
+            wait = debouncer.wait(time.time())
+            changed = source.changes(POLL_SECONDS if wait is None else wait)
+            if source.overflowed:
+                print("Event queue overflowed; scheduling every stage")
+                debouncer.add(set(STAGES), time.time())
+                source.overflowed = False
+            debouncer.add(set().union(*map(stages_for, changed)), time.time())
+            if debouncer.wait(time.time()) == 0:
+                stages = debouncer.take()
+                print(f"[{time.strftime('%H:%M:%S')}] running {', '.join(s for s in STAGES if s in stages)}")
+                run_stages(stages)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run the incremental pipeline stages when scraped files change")
+    parser.add_argument("--poll", action="store_true", help="poll instead of using inotify")
+    parser.add_argument("--once", action="store_true", help="run every stage once and exit")
+    args = parser.parse_args()
+
+    if args.once:
+        run_stages(STAGES)
+    else:
+        watch(poll=args.poll)
+
+
+if __name__ == "__main__":
+    main()
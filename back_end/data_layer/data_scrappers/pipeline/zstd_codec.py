@@ -0,0 +1,311 @@
+"""
+ZSTD CSV CODEC
+Transparent zstd compression for the scraped CSV tree.
+
+A compressed file keeps its name plus ".zst"
+(nba_boxscores/quarters_202401100BOS.csv.zst) and holds one zstd frame. The
+loaders read both forms (loaders.csv_files() lists either, read_bytes()
+decompresses when it sees the zstd magic), so plain and compressed files can
+sit side by side and the tree can be migrated at any pace. Where both exist
+the compressed copy is the newer scrape and wins.
+
+The per-game tables are small and repeat the same header, team names and URLs
+in every file, which a plain zstd frame cannot exploit across files. A
+dictionary is trained per table family (catalog source/table type) from a
+sample of the existing files; a frame records the id of its dictionary, so a
+reader only needs the file and ZSTD_DICT_DIR/<dict_id>.dict. Dictionaries are
+never deleted: old files keep referring to them after a retrain.
+
+Only files catalog.py recognizes as scraped tables are compressed; checkpoint
+files the scrapers append to and the pipeline outputs stay plain CSV.
+
+Usage:
+    python zstd_codec.py --train                    # train per-family dictionaries
+    python zstd_codec.py --migrate                  # compress the tree (parallel, incremental)
+    python zstd_codec.py --migrate --decompress     # back to plain CSV
+    python zstd_codec.py --report                   # bytes on disk, plain vs zstd
+    python zstd_codec.py --bench quarters           # cold-cache read time of one table
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+import zstandard
+
+from config import DATA_DIR, MAX_WORKERS, WRITE_ZSTD, ZSTD_DICT_DIR
+from profiler import timed
+
+# =========================
+# CONFIGURATION
+# =========================
+SUFFIX = ".zst"
+MAGIC = b"\x28\xb5\x2f\xfd"
+LEVEL = 10
+DICT_INDEX = ZSTD_DICT_DIR / "dictionaries.json"  # family -> dict id used for new files
+DICT_SIZE = 64 * 1024
+MIN_SAMPLES = 50
+MAX_SAMPLES = 2000
+
+_dicts: Dict[int, zstandard.ZstdCompressionDict] = {}
+_families: Optional[Dict[str, int]] = None
+_local = threading.local()  # (de)compressor objects are not thread safe
+
+
+def _dictionary(dict_id: int) -> zstandard.ZstdCompressionDict:
+    if dict_id not in _dicts:
+        path = ZSTD_DICT_DIR / f"{dict_id}.dict"
+        if not path.exists():
+            raise FileNotFoundError(f"zstd dictionary {dict_id} is missing from {ZSTD_DICT_DIR}")
+        _dicts[dict_id] = zstandard.ZstdCompressionDict(path.read_bytes())
+    return _dicts[dict_id]
+
+
+def _family_dicts() -> Dict[str, int]:
+    global _families
+    if _families is None:
+        _families = json.loads(DICT_INDEX.read_text()) if DICT_INDEX.exists() else {}
+    return _families
+
+
+def _decompressor(dict_id: int) -> zstandard.ZstdDecompressor:
+    cache = _local.__dict__.setdefault("decompressors", {})
+    if dict_id not in cache:
+        cache[dict_id] = zstandard.ZstdDecompressor(dict_data=_dictionary(dict_id)) if dict_id else \
+            zstandard.ZstdDecompressor()
+    return cache[dict_id]
+
+
+def _compressor(dict_id: int, level: int) -> zstandard.ZstdCompressor:
+    cache = _local.__dict__.setdefault("compressors", {})
+    if (dict_id, level) not in cache:
+        cache[(dict_id, level)] = zstandard.ZstdCompressor(level=level, dict_data=_dictionary(dict_id)) \
+            if dict_id else zstandard.ZstdCompressor(level=level)
+    return cache[(dict_id, level)]
+
+
+# =========================
+# CODEC
+# =========================
+def is_compressed(data: bytes) -> bool:
+    return data[:4] == MAGIC
+
+
+def logical_path(path) -> Path:
+    """Name a file has as plain CSV: x.csv.zst -> x.csv"""
+    path = Path(path)
+    return path.with_name(path.name[:-len(SUFFIX)]) if path.name.endswith(SUFFIX) else path
+
+
+def compressed_path(path) -> Path:
+    path = Path(path)
+    return path if path.name.endswith(SUFFIX) else path.with_name(path.name + SUFFIX)
+
+
+def decompress(data: bytes) -> bytes:
+    """Plain bytes of a file's content; non-zstd data is returned as is"""
+    if not is_compressed(data):
+        return data
+    # frames written by compress() always carry their content size
+    return _decompressor(zstandard.get_frame_parameters(data).dict_id).decompress(data)
+
+
+def compress(data: bytes, family: Optional[str] = None, level: int = LEVEL) -> bytes:
+    """One zstd frame, using the family's dictionary when one has been trained"""
+    dict_id = _family_dicts().get(family, 0) if family else 0
+    return _compressor(dict_id, level).compress(data)
+
+
+def read_bytes(path) -> bytes:
+    return decompress(Path(path).read_bytes())
+
+
+def family(path) -> Optional[str]:
+    """Dictionary family of a scraped CSV ("nba_boxscores/quarters"); None if not a scraped table"""
+    from catalog import classify
+    info = classify(logical_path(path))
+    return None if info["source"] == "other" else f"{info['source']}/{info['table_type']}"
+
+
+# =========================
+# SCRAPER HOOKS
+# =========================
+def encode_csv(path, data: bytes) -> Tuple[Path, bytes]:
+    """(path, bytes) a scraper should write for CSV data: x.csv.zst and its frame
+
+    With FORESIGHT_ZSTD=0 the plain path and data are returned unchanged.
+    """
+    if not WRITE_ZSTD:
+        return Path(path), data
+    return compressed_path(path), compress(data, family(path))
+
+
+@timed("io")
+def write_csv(df: pd.DataFrame, path, encoding: str = "utf-8", **to_csv) -> Path:
+    """DataFrame.to_csv through encode_csv() (tmp + rename); returns the path written"""
+    path, data = encode_csv(path, df.to_csv(**to_csv).encode(encoding))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+    return path
+
+
+# =========================
+# DICTIONARIES / MIGRATION
+# =========================
+def _scraped_csvs(root: Path) -> Dict[str, list]:
+    """family -> paths of the scraped CSVs (plain or compressed) under root"""
+    from catalog import scan
+    by_family = defaultdict(list)
+    for path in scan(root):
+        if logical_path(path).suffix == ".csv":
+            fam = family(path)
+            if fam:
+                by_family[fam].append(path)
+    return by_family
+
+
+def train(root: Path = DATA_DIR, dict_size: int = DICT_SIZE, max_samples: int = MAX_SAMPLES) -> Dict[str, int]:
+    """Train one dictionary per family with at least MIN_SAMPLES files"""
+    global _families
+    ZSTD_DICT_DIR.mkdir(parents=True, exist_ok=True)
+    index = dict(_family_dicts())
+    rng = random.Random(0)
+    for fam, paths in sorted(_scraped_csvs(root).items()):
+        if len(paths) < MIN_SAMPLES:
+            continue
+        samples = [read_bytes(p) for p in rng.sample(paths, min(max_samples, len(paths)))]
+        try:
+            # a dictionary much larger than a tenth of its samples only memorizes them
+            size = min(dict_size, sum(map(len, samples)) // 10)
+            dictionary = zstandard.train_dictionary(size, samples, level=LEVEL)
+        except zstandard.ZstdError as e:
+            print(f"  {fam}: no dictionary ({e})")
+            continue
+        (ZSTD_DICT_DIR / f"{dictionary.dict_id()}.dict").write_bytes(dictionary.as_bytes())
+        index[fam] = dictionary.dict_id()
+        print(f"  {fam}: {len(samples):,} samples -> dictionary {dictionary.dict_id()}")
+    DICT_INDEX.write_text(json.dumps(index, indent=2, sort_keys=True))
+    _families = index
+    return index
+
+
+def _convert(args) -> Tuple[int, int]:
+    """Worker: rewrite one file compressed (or plain), keeping its mtime"""
+    path, fam, level, to_plain = args
+    data = path.read_bytes()
+    if to_plain:
+        target, out = logical_path(path), decompress(data)
+    else:
+        target, out = compressed_path(path), compress(data, fam, level)
+    st = path.stat()
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(out)
+    os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+    tmp.replace(target)
+    path.unlink()
+    return len(data), len(out)
+
+
+def migrate(root: Path = DATA_DIR, level: int = LEVEL, to_plain: bool = False,
+            processes: bool = True) -> Dict[str, int]:
+    """Compress every plain scraped CSV under root (or decompress every .zst one)"""
+    jobs, stale = [], []
+    for fam, paths in _scraped_csvs(root).items():
+        present = set(paths)
+        for path in paths:
+            compressed = path.name.endswith(SUFFIX)
+            if to_plain and compressed:
+                jobs.append((path, fam, level, True))
+            elif not to_plain and not compressed:
+                # a scraper already wrote the compressed copy of this file
+                (stale if compressed_path(path) in present else jobs).append((path, fam, level, False))
+    for path, *_ in stale:
+        path.unlink()
+
+    executor = concurrent.futures.ProcessPoolExecutor if processes else concurrent.futures.ThreadPoolExecutor
+    before = after = 0
+    with executor(max_workers=MAX_WORKERS) as pool:
+        for n_in, n_out in pool.map(_convert, jobs, chunksize=64):
+            before += n_in
+            after += n_out
+    return {"files": len(jobs), "stale_removed": len(stale), "bytes_before": before, "bytes_after": after}
+
+
+# =========================
+# REPORTS
+# =========================
+def report(root: Path = DATA_DIR):
+    """Apparent and allocated bytes of the scraped CSVs, plain vs compressed"""
+    rows = []
+    for fam, paths in _scraped_csvs(root).items():
+        for path in paths:
+            st = path.stat()
+            rows.append((fam, path.name.endswith(SUFFIX), st.st_size, st.st_blocks * 512))
+    df = pd.DataFrame(rows, columns=["family", "zstd", "bytes", "allocated"])
+    summary = df.groupby("zstd")[["bytes", "allocated"]].agg(["count", "sum"]).iloc[:, [0, 1, 3]]
+    summary.columns = ["files", "bytes", "allocated"]
+    summary[["bytes", "allocated"]] = (summary[["bytes", "allocated"]] / 1e6).round(1)
+    print(summary.rename(index={False: "plain (MB)", True: "zstd (MB)"}).to_string())
+
+
+def _evict(path: Path):
+    """Drop a file's pages from the OS cache so the next read hits the disk"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def bench(table: str):
+    from loaders import list_game_files, read_csvs
+    paths = list(list_game_files(table).values())
+    for path in paths:
+        _evict(path)
+    start = time.time()
+    df = read_csvs(paths)
+    elapsed = time.time() - start
+    size = sum(p.stat().st_size for p in paths)
+    print(f"{table}: {len(paths):,} files, {size / 1e6:.1f} MB on disk, {len(df):,} rows in {elapsed:.2f}s (cold)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="zstd compression of the scraped CSVs")
+    parser.add_argument("--train", action="store_true", help="train per-family dictionaries")
+    parser.add_argument("--migrate", action="store_true", help="compress every plain scraped CSV")
+    parser.add_argument("--decompress", action="store_true", help="with --migrate: back to plain CSV")
+    parser.add_argument("--level", type=int, default=LEVEL)
+    parser.add_argument("--threads", action="store_true", help="migrate on threads instead of processes")
+    parser.add_argument("--report", action="store_true", help="bytes on disk, plain vs zstd")
+    parser.add_argument("--bench", metavar="TABLE", help="cold-cache read time of one per-game table")
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.train:
+        train()
+    if args.migrate:
+        counts = migrate(level=args.level, to_plain=args.decompress, processes=not args.threads)
+        print(f"Rewrote {counts['files']:,} files ({counts['bytes_before'] / 1e6:.1f} MB -> "
+              f"{counts['bytes_after'] / 1e6:.1f} MB), removed {counts['stale_removed']:,} stale plain copies "
+              f"in {time.time() - start:.1f}s")
+        from catalog import rebuild
+        rebuild()
+        print("Catalog refreshed; run blobstore.py --gc to drop references to the replaced files")
+    if args.report:
+        report()
+    if args.bench:
+        bench(args.bench)
+
+
+if __name__ == "__main__":
+    main()
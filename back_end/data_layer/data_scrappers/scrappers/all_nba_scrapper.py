@@ -1,12 +1,28 @@
-import time
+import argparse
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
 import pandas as pd
 from io import StringIO
-import re
 from datetime import datetime
 import os
+import sys
+from pathlib import Path
+
+# Scraped-file catalog, zstd codec, profiler and fetch backends (../pipeline/catalog.py, zstd_codec.py, profiler.py,
+# fetch.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "pipeline"))
+from catalog import record_file
+from zstd_codec import write_csv
+from profiler import record_sleeps, span
+from fetch import BACKENDS, Fetcher, Throttled
+from scrape_engine import THROTTLE_RETRIES, polite_get
+
+record_sleeps()
+
+parser = argparse.ArgumentParser(description="Scrape box score, play-by-play and shot tables of NBA games")
+parser.add_argument("--backend", choices=BACKENDS, default="http",
+                    help="http: plain HTTP, Chrome only for pages that need it; selenium: Chrome for every page")
+ARGS = parser.parse_args()
 
 # Create folder
 SAVE_FOLDER = "./nba_data"
@@ -19,40 +35,40 @@ def get_driver():
     options.add_argument("--headless=new")
     return webdriver.Chrome(service=service, options=options)
 
-driver = get_driver()
-
-# Extract HTML table even if it's commented out
-def get_table_by_id(table_id):
-    source = driver.page_source
-
-    # Try normal
-    try:
-        el = driver.find_element(By.ID, table_id)
-        return el.get_attribute("outerHTML")
-    except:
-        pass
-
-    # Try commented HTML
-    comment_pattern = rf"<!--([\s\S]*?<table[^>]*id=\"{table_id}\"[\s\S]*?</table>)-->"
-    m = re.search(comment_pattern, source)
-    return m.group(1) if m else None
+# The pages are static HTML; the http backend starts Chrome only if a page fails or is a bot challenge
+fetcher = Fetcher(ARGS.backend, driver_factory=get_driver)
+throttled_urls = []  # still throttled after THROTTLE_RETRIES; listed at the end to scrape again later
+
+def get_page(url):
+    # basketball-reference's adaptive per-minute allowance (scrape_engine.py) instead of a fixed sleep;
+    # a throttled page is asked for again once the host's Retry-After has passed
+    for _ in range(THROTTLE_RETRIES + 1):
+        try:
+            return polite_get(fetcher, url)
+        except Throttled:
+            pass
+    print(f"⏳ Still throttled, skipped: {url}")
+    throttled_urls.append(url)
+    return None
 
 def save_df(df, game_id, name):
     current_date = datetime.now().strftime("%Y-%m-%d")
     path = os.path.join(SAVE_FOLDER, f"{game_id}_{name}_{current_date}.csv")
-    df.to_csv(path, index=False)
+    path = write_csv(df, path, index=False)
+    record_file(path, rows=len(df))
     print(f"📁 Saved: {path}")
 
 def scrape_box_score(game_id, url):
-    driver.get(url)
-    time.sleep(3)
+    page = get_page(url)
 
-    tables = re.findall(r"(<table[^>]*id=\"([^\"]+)\".*?</table>)", driver.page_source)
     dfs = {}
+    if page is None:
+        return dfs
 
-    for html, tid in tables:
+    for html, tid in page.tables():
         if "box" in tid and "game" not in tid:  # exclude team summary table
-            df = pd.read_html(StringIO(html))[0]
+            with span("parse", "read_html"):
+                df = pd.read_html(StringIO(html))[0]
             dfs[tid] = df
             save_df(df, game_id, tid)
 
@@ -60,24 +76,28 @@ def scrape_box_score(game_id, url):
 
 def scrape_pbp(game_id):
     pbp_url = f"https://www.basketball-reference.com/boxscores/pbp/{game_id}.html"
-    driver.get(pbp_url)
-    time.sleep(3)
+    page = get_page(pbp_url)
+    if page is None:
+        return None
 
-    html = get_table_by_id("pbp")
+    html = page.table("pbp")  # live or inside an HTML comment
     if html:
-        df = pd.read_html(StringIO(html))[0]
+        with span("parse", "read_html"):
+            df = pd.read_html(StringIO(html))[0]
         save_df(df, game_id, "pbp")
         return df
     return None
 
 def scrape_shots(game_id):
     shot_url = f"https://www.basketball-reference.com/boxscores/shot-chart/{game_id}.html"
-    driver.get(shot_url)
-    time.sleep(3)
+    page = get_page(shot_url)
+    if page is None:
+        return None
 
-    html = get_table_by_id("shots")
+    html = page.table("shots")
     if html:
-        df = pd.read_html(StringIO(html))[0]
+        with span("parse", "read_html"):
+            df = pd.read_html(StringIO(html))[0]
         save_df(df, game_id, "shots")
         return df
     return None
@@ -111,10 +131,9 @@ schedule_urls = [
 
 box_links = []
 for url in schedule_urls:
-    driver.get(url)
-    time.sleep(3)
-    links = driver.find_elements(By.PARTIAL_LINK_TEXT, "Box Score")
-    box_links.extend(l.get_attribute("href") for l in links)
+    page = get_page(url)
+    if page is not None:
+        box_links.extend(page.links("Box Score"))
 
 print(f"🔗 Found {len(box_links)} games")
 
@@ -128,5 +147,9 @@ for link in box_links[:5]:  # TEST on first 5 games
 
     combine_stats(game_id, box, pbp, shots)
 
-driver.quit()
+fetcher.close()
+if throttled_urls:
+    print(f"⏳ {len(throttled_urls)} pages skipped while throttled:")
+    for url in throttled_urls:
+        print("  ", url)
 print("🎯 DONE — All data collected!")
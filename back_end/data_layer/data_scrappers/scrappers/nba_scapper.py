@@ -1,20 +1,30 @@
+import argparse
+import functools
 import time
-import re
 import os
-import unicodedata
-import hashlib
 import csv
-import random
+import sys
 from datetime import datetime, timedelta
-from io import StringIO
+from pathlib import Path
 
-import pandas as pd
+import requests
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import WebDriverException
 
+# Scraped-file catalog, blob store, zstd codec, profiler, segment files, fetch backends and box-score parsing
+# (../pipeline/catalog.py, blobstore.py, zstd_codec.py, profiler.py, segments.py, fetch.py, box_scores.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "pipeline"))
+from blobstore import write_file
+from catalog import record_file
+from zstd_codec import encode_csv
+from profiler import record_sleeps, span
+from segments import SegmentWriter
+from fetch import BACKENDS, Fetcher, Throttled
+from scrape_engine import CONCURRENCY, Engine, polite_get
+from box_scores import extract_game_date_from_url, parse_game
+
 # ============================================================
 # CONFIG
 # ============================================================
@@ -26,6 +36,10 @@ CHECKPOINT_FILE = os.path.join(BASE_DIR, "checkpoint.csv")
 RESTART_DRIVER_EVERY = 25
 MAX_RETRIES = 4
 
+# "segments": append tables to BASE_DIR/segments/<kind>/ with a game_id -> offset index (segments.py)
+# "files":    one tables/<table_id>/<game_id>.csv.zst per table per game
+OUTPUT_MODE = "segments"
+
 # ---------------- DATE CONTROL ----------------
 START_DATE_STR = "2026-01-01"   # inclusive
 END_DATE_STR   = "2026-01-20"   # inclusive
@@ -40,12 +54,6 @@ MONTHS = [
     "-may", "-june"
 ]
 
-os.makedirs(BASE_DIR, exist_ok=True)
-
-if not os.path.exists(CHECKPOINT_FILE):
-    with open(CHECKPOINT_FILE, "w", newline="") as f:
-        csv.writer(f).writerow(["game_id"])
-
 # ============================================================
 # DRIVER
 # ============================================================
@@ -65,12 +73,20 @@ def get_driver():
     driver.set_page_load_timeout(30)
     return driver
 
-driver = get_driver()
+# Set up by main(): nothing runs at import, so worker processes of any start method can import this script
+fetcher = None
+segment_writer = None
 
 # ============================================================
 # CHECKPOINTING
 # ============================================================
 
+def init_checkpoint():
+    os.makedirs(BASE_DIR, exist_ok=True)
+    if not os.path.exists(CHECKPOINT_FILE):
+        with open(CHECKPOINT_FILE, "w", newline="") as f:
+            csv.writer(f).writerow(["game_id"])
+
 def load_completed_games():
     with open(CHECKPOINT_FILE, "r") as f:
         return {
@@ -87,34 +103,16 @@ def mark_game_complete(game_id):
 # ============================================================
 
 def safe_get(url):
-    global driver
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            driver.get(url)
-            time.sleep(random.uniform(2, 3))
-            return True
-        except WebDriverException:
-            try:
-                driver.quit()
-            except:
-                pass
+            # at basketball-reference's adaptive per-minute rate (scrape_engine.py)
+            return polite_get(fetcher, url)
+        except Throttled:
+            continue  # the host's rate was cut and its requests held for Retry-After; no extra backoff
+        except (WebDriverException, requests.RequestException):
+            fetcher.restart()
             time.sleep(5 * attempt)
-            driver = get_driver()
-    return False
-
-def sanitize(col):
-    col = unicodedata.normalize("NFKD", str(col)).lower()
-    col = re.sub(r"\s+", "_", col)
-    col = re.sub(r"[^a-z0-9_]", "", col)
-    return col if not col[0].isdigit() else f"c_{col}"
-
-def extract_game_date_from_url(url):
-    try:
-        return datetime.strptime(
-            url.split("/")[-1][:8], "%Y%m%d"
-        ).date()
-    except:
-        return None
+    return None
 
 def get_resume_date(completed_games):
     dates = []
@@ -125,108 +123,125 @@ def get_resume_date(completed_games):
             pass
     return max(dates) + timedelta(days=1) if dates else START_DATE
 
-def extract_tables():
-    tables = []
-    for t in driver.find_elements(By.TAG_NAME, "table"):
-        tid = t.get_attribute("id")
-        if tid and tid.startswith("box-"):
-            tables.append((t.get_attribute("outerHTML"), tid))
-    return tables
-
-def extract_home_away_teams():
-    teams = []
-    for t in driver.find_elements(By.CSS_SELECTOR, "table[id^='box-']"):
-        m = re.search(r"box-([A-Z]{3})", t.get_attribute("id"))
-        if m and m.group(1) not in teams:
-            teams.append(m.group(1))
-    return teams if len(teams) >= 2 else ("UNK", "UNK")
-
-def make_player_uid(player, team):
-    return hashlib.sha1(f"{player}_{team}_{SEASON_YEAR}".encode()).hexdigest()
-
 # ============================================================
-# TABLE SAVE
+# SAVE
 # ============================================================
 
-def save_table(html, table_id, game_id, game_date, away, home):
-    df = pd.read_html(StringIO(html))[0]
-
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = ["_".join(filter(None, map(str, c))) for c in df.columns]
-
-    df.columns = [sanitize(c) for c in df.columns]
-
-    player_col = next((c for c in df.columns if "player" in c), None)
-    if not player_col:
+def save_table(df, table_id, game_id):
+    data = df.to_csv(index=False).encode("utf-8")
+    if segment_writer is not None:
+        # one block in this run's segment; unchanged re-scrapes are not appended again
+        with span("io", "save_table"):
+            segment_writer.append(table_id, game_id, data, rows=len(df))
         return
 
-    df[player_col] = df[player_col].astype(str).str.replace(r"[*†‡§]", "", regex=True)
-    df = df[df[player_col].str.strip() != ""]
-
-    team = re.search(r"box-([A-Z]{3})", table_id).group(1)
-
-    df["player_uid"] = df[player_col].apply(lambda p: make_player_uid(p, team))
-    df["team"] = team
-    df["opponent"] = away if team == home else home
-    df["game_id"] = game_id
-    df["game_date"] = game_date
-
     out_dir = os.path.join(BASE_DIR, "tables", table_id)
     os.makedirs(out_dir, exist_ok=True)
-    df.to_csv(os.path.join(out_dir, f"{game_id}.csv"), index=False)
-
-# ============================================================
-# SCHEDULE SCRAPE
-# ============================================================
-
-box_score_links = []
+    # <game_id>.csv.zst; unchanged re-scrapes (same content apart from scraped_at) are not rewritten
+    path, data = encode_csv(os.path.join(out_dir, f"{game_id}.csv"), data)
+    with span("io", "save_table"):
+        if write_file(path, data):
+            record_file(path, rows=len(df))
 
-for m in MONTHS:
-    safe_get(
-        f"https://www.basketball-reference.com/leagues/NBA_{SEASON_YEAR}_games{m}.html"
-    )
-    for l in driver.find_elements(By.PARTIAL_LINK_TEXT, "Box Score"):
-        box_score_links.append(l.get_attribute("href"))
-
-box_score_links = sorted(set(box_score_links))
-
-completed_games = load_completed_games()
-resume_date = get_resume_date(completed_games)
-
-print(f"Resuming from: {resume_date}")
-print(f"Stopping at:   {END_DATE}")
+def save_game(url, tables):
+    game_id = url.split("/")[-1].replace(".html", "")
+    for tid, df in tables:
+        save_table(df, tid, game_id)
+    mark_game_complete(game_id)
 
 # ============================================================
-# MAIN LOOP
+# SCHEDULE SCRAPE
 # ============================================================
 
-for i, url in enumerate(box_score_links, 1):
-    game_date = extract_game_date_from_url(url)
-    if not game_date:
-        continue
-
-    if game_date < resume_date or game_date > END_DATE:
-        continue
-
-    game_id = url.split("/")[-1].replace(".html", "")
-    if game_id in completed_games:
-        continue
-
-    if i % RESTART_DRIVER_EVERY == 0:
-        driver.quit()
-        driver = get_driver()
-
-    if not safe_get(url):
-        continue
-
-    away, home = extract_home_away_teams()
-
-    for html, tid in extract_tables():
-        if "basic" in tid:
-            save_table(html, tid, game_id, game_date, away, home)
-
-    mark_game_complete(game_id)
-    time.sleep(random.uniform(1, 2))
-
-driver.quit()
-print("SCRAPE COMPLETE")
+def main():
+    global fetcher, segment_writer
+
+    parser = argparse.ArgumentParser(description="Scrape basketball-reference box scores")
+    parser.add_argument("--backend", choices=BACKENDS, default="http",
+                        help="http: concurrent plain HTTP, Chrome only for pages that need it; selenium: Chrome, one "
+                             "page at a time")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="pages in flight with --backend http")
+    args = parser.parse_args()
+
+    record_sleeps()
+    init_checkpoint()
+    # Pages are static HTML; the http backend starts Chrome only if a page fails or is a bot challenge
+    fetcher = Fetcher(args.backend, driver_factory=get_driver)
+    segment_writer = SegmentWriter(BASE_DIR) if OUTPUT_MODE == "segments" else None
+    # box_scores.parse_game runs in the engine's worker processes, which import box_scores, not this script
+    parse = functools.partial(parse_game, season=SEASON_YEAR)
+
+    schedule_urls = [
+        f"https://www.basketball-reference.com/leagues/NBA_{SEASON_YEAR}_games{m}.html" for m in MONTHS
+    ]
+    if args.backend == "http":
+        schedule_pages = [page or safe_get(url) for url, page, _ in Engine(args.concurrency).run(schedule_urls)]
+    else:
+        schedule_pages = [safe_get(url) for url in schedule_urls]
+
+    box_score_links = []
+    for page in schedule_pages:
+        if page:
+            box_score_links.extend(page.links("Box Score"))
+
+    box_score_links = sorted(set(box_score_links))
+
+    completed_games = load_completed_games()
+    resume_date = get_resume_date(completed_games)
+
+    print(f"Resuming from: {resume_date}")
+    print(f"Stopping at:   {END_DATE}")
+
+    # ============================================================
+    # MAIN LOOP
+    # ============================================================
+
+    pending = []
+    for url in box_score_links:
+        game_date = extract_game_date_from_url(url)
+        if not game_date:
+            continue
+
+        if game_date < resume_date or game_date > END_DATE:
+            continue
+
+        game_id = url.split("/")[-1].replace(".html", "")
+        if game_id in completed_games:
+            continue
+
+        pending.append(url)
+
+    failed = []
+    if args.backend == "http":
+        # pages fetched concurrently at the allowed rate, parsed in worker processes, saved here as they finish
+        def on_game(url, tables, error):
+            if error is not None:
+                print(f"  {url}: {type(error).__name__}: {error}")
+                failed.append(url)
+            else:
+                save_game(url, tables)
+
+        Engine(args.concurrency).run(pending, parse, on_game)
+        if failed:
+            print(f"Retrying {len(failed)} failed pages one at a time")
+    else:
+        failed = pending
+
+    # one page at a time, through Selenium when the backend is selenium or plain HTTP failed
+    for i, url in enumerate(failed, 1):
+        if i % RESTART_DRIVER_EVERY == 0:
+            fetcher.restart()
+
+        page = safe_get(url)
+        if not page:
+            continue
+
+        save_game(url, parse(url, page.html))
+
+    fetcher.close()
+    if segment_writer is not None:
+        segment_writer.close()
+    print("SCRAPE COMPLETE")
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,19 @@ from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from bs4 import BeautifulSoup
 import warnings
+import sys
+from pathlib import Path
+
+# Scraped-file catalog, zstd codec, profiler and adaptive per-host rate limits (../pipeline/catalog.py,
+# zstd_codec.py, profiler.py, fetch.py, scrape_engine.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "pipeline"))
+from catalog import record_file
+from zstd_codec import write_csv
+from profiler import record_sleeps, span
+from fetch import is_throttled
+from scrape_engine import feedback, limiter
+
+record_sleeps()
 warnings.filterwarnings('ignore')
 
 class ThreadSafeCounter:
@@ -316,7 +329,8 @@ class FBrefMultiLeagueScraper:
                         
                         # Save to CSV
                         output_file = os.path.join(unified_dir, f"all_leagues_{data_type}.csv")
-                        combined_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+                        output_file = write_csv(combined_df, output_file, index=False, encoding='utf-8-sig')
+                        record_file(output_file, rows=len(combined_df))
                         
                         print(f"  ✓ Saved {data_type}: {len(combined_df)} rows from {len(all_dfs)} leagues")
                         
@@ -464,13 +478,23 @@ class LeagueScraper:
         """Navigate to page with retry logic"""
         for attempt in range(max_retries):
             try:
-                self.driver.get(url)
-                time.sleep(2)
+                # The league threads share fbref.com's per-minute allowance instead of each sleeping
+                limiter(url).wait()
+                started = time.monotonic()
+                with span("network", "navigate_to_page"):
+                    self.driver.get(url)
+                    
+                    # Wait for page load
+                    WebDriverWait(self.driver, 15).until(
+                        lambda d: d.execute_script('return document.readyState') == 'complete'
+                    )
                 
-                # Wait for page load
-                WebDriverWait(self.driver, 15).until(
-                    lambda d: d.execute_script('return document.readyState') == 'complete'
-                )
+                # The browser hides the status; a "Too Many Requests" page cuts fbref.com's rate and holds it
+                if is_throttled(self.driver.page_source):
+                    feedback(url, started, throttled=True)
+                    print(f"    Attempt {attempt + 1} throttled by {url.split('/')[2]}, slowing down")
+                    continue
+                feedback(url, started)
                 return True
                 
             except WebDriverException as e:
@@ -631,8 +655,6 @@ class LeagueScraper:
                 print("    Failed to load fixtures page")
                 return None
             
-            time.sleep(2)
-            
             # Find the fixtures table
             table = self.wait.until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, "table.stats_table"))
@@ -667,8 +689,6 @@ class LeagueScraper:
                 print("    Failed to load league page")
                 return None
             
-            time.sleep(2)
-            
             # Find the standings table
             table = self.wait.until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, "table.stats_table"))
@@ -761,8 +781,6 @@ class LeagueScraper:
                 print(f"      Failed to load team page")
                 return []
             
-            time.sleep(2)
-            
             # Get page content
             page_html = self.driver.page_source
             soup = BeautifulSoup(page_html, 'html.parser')
@@ -809,8 +827,6 @@ class LeagueScraper:
                 print(f"      Failed to load team page")
                 return []
             
-            time.sleep(2)
-            
             # Get page content
             page_html = self.driver.page_source
             soup = BeautifulSoup(page_html, 'html.parser')
@@ -903,8 +919,6 @@ class LeagueScraper:
                 print(f"        Failed to load player page")
                 return []
             
-            time.sleep(2)
-            
             # Get page content
             page_html = self.driver.page_source
             soup = BeautifulSoup(page_html, 'html.parser')
@@ -959,8 +973,6 @@ class LeagueScraper:
             if not self.navigate_to_page(match_logs_url):
                 return None
             
-            time.sleep(2)
-            
             try:
                 # Find match logs table
                 table = self.wait.until(
@@ -1112,7 +1124,8 @@ class LeagueScraper:
                         
                         # Save to CSV
                         output_file = os.path.join(league_dir, f"{data_type}.csv")
-                        combined_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+                        output_file = write_csv(combined_df, output_file, index=False, encoding='utf-8-sig')
+                        record_file(output_file, rows=len(combined_df))
                         
                         print(f"      Saved {data_type}: {len(combined_df)} rows")
                 
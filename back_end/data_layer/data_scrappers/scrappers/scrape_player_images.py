@@ -1,5 +1,7 @@
 import os
+import sys
 import time
+from pathlib import Path
 import requests
 import pandas as pd
 from bs4 import BeautifulSoup
@@ -8,6 +10,11 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 
+# Scraped-file catalog and zstd codec (../pipeline/catalog.py, zstd_codec.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "pipeline"))
+from catalog import record_file
+from zstd_codec import write_csv
+
 # ---------------- CONFIG ----------------
 BASE_DIR = "nba_rosters"
 WAIT_SECONDS = 3
@@ -123,14 +130,14 @@ def scrape_team_roster(driver, team_code, team_path):
                 r.raise_for_status()
                 with open(p["file_path"], "wb") as f:
                     f.write(r.content)
+                record_file(p["file_path"])
             except Exception as e:
                 print(f"Failed {p['player']}: {e}")
 
     # save team CSV
-    pd.DataFrame(players).to_csv(
-        os.path.join(team_dir, "roster_images.csv"),
-        index=False
-    )
+    roster_file = os.path.join(team_dir, "roster_images.csv")
+    roster_file = write_csv(pd.DataFrame(players), roster_file, index=False)
+    record_file(roster_file, rows=len(players))
 
     print(f"Saved {len(players)} players for {team_name}")
     return players
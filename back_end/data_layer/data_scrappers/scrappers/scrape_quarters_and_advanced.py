@@ -1,9 +1,19 @@
+import sys
 import time
 import requests
+from io import StringIO
 import pandas as pd
 from bs4 import BeautifulSoup
 from pathlib import Path
 
+# Scraped-file catalog, zstd codec and profiler (../pipeline/catalog.py, zstd_codec.py, profiler.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "pipeline"))
+from catalog import record_file
+from zstd_codec import write_csv
+from profiler import record_sleeps, span
+
+record_sleeps()
+
 # ============================================================
 # CONFIG
 # ============================================================
@@ -46,6 +56,18 @@ def normalize_player_schema(df):
 
     return df
 
+def save_csv(df, path):
+    with span("io", "save_csv"):
+        path = write_csv(df, path, index=False)
+        record_file(path, rows=len(df))
+
+def read_page_tables(url):
+    """pd.read_html(url), with the download and the parse timed separately"""
+    with span("network", "requests.get"):
+        html = requests.get(url, headers=HEADERS).text
+    with span("parse", "read_html"):
+        return pd.read_html(StringIO(html))
+
 def split_players_and_team(df):
     df["player"] = df["player"].astype(str)
 
@@ -60,8 +82,10 @@ def split_players_and_team(df):
 
 def get_season_game_ids(season):
     url = f"{BASE}/leagues/NBA_{season}_games.html"
-    html = requests.get(url, headers=HEADERS).text
-    soup = BeautifulSoup(html, "html.parser")
+    with span("network", "requests.get"):
+        html = requests.get(url, headers=HEADERS).text
+    with span("parse", "season page"):
+        soup = BeautifulSoup(html, "html.parser")
 
     game_ids = set()
     # Grab all boxscore links directly
@@ -95,15 +119,15 @@ def save_completed(game_id):
 
 def scrape_quarters(game_id):
     url = f"{BOX_BASE}/{game_id}.html"
-    tables = pd.read_html(url)
+    tables = read_page_tables(url)
     q = tables[0]
     q["game_id"] = game_id
-    q.to_csv(OUT / f"{game_id}_quarters.csv", index=False)
+    save_csv(q, OUT / f"{game_id}_quarters.csv")
     print(f"✔ Quarters: {game_id}")
 
 def scrape_boxscores(game_id):
     url = f"{BOX_BASE}/{game_id}.html"
-    tables = pd.read_html(url)
+    tables = read_page_tables(url)
 
     basic_players, basic_team = [], []
     adv_players, adv_team = [], []
@@ -121,20 +145,12 @@ def scrape_boxscores(game_id):
             basic_team.append(t)
 
     if adv_players:
-        pd.concat(adv_players).assign(game_id=game_id).to_csv(
-            OUT / f"{game_id}_advanced_players.csv", index=False
-        )
-        pd.concat(adv_team).assign(game_id=game_id).to_csv(
-            OUT / f"{game_id}_advanced_team.csv", index=False
-        )
+        save_csv(pd.concat(adv_players).assign(game_id=game_id), OUT / f"{game_id}_advanced_players.csv")
+        save_csv(pd.concat(adv_team).assign(game_id=game_id), OUT / f"{game_id}_advanced_team.csv")
 
     if basic_players:
-        pd.concat(basic_players).assign(game_id=game_id).to_csv(
-            OUT / f"{game_id}_basic_players.csv", index=False
-        )
-        pd.concat(basic_team).assign(game_id=game_id).to_csv(
-            OUT / f"{game_id}_basic_team.csv", index=False
-        )
+        save_csv(pd.concat(basic_players).assign(game_id=game_id), OUT / f"{game_id}_basic_players.csv")
+        save_csv(pd.concat(basic_team).assign(game_id=game_id), OUT / f"{game_id}_basic_team.csv")
 
     print(f"✔ Boxscores: {game_id}")
 